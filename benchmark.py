@@ -0,0 +1,393 @@
+import argparse
+import configparser
+import gc
+import hashlib
+import importlib.util
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Benchmark the PlaceData class, usually against a dataset written by generate-synthetic-data.py:
+#
+#   python generate-synthetic-data.py --dir synthetic
+#   python benchmark.py --config synthetic/config.ini
+#
+# Every run appends wall time, RSS delta, peak RSS and a digest of the result of every stage to a history file
+# (benchmark-history.jsonl in the configured working directory) and compares the run against the last run of a
+# different commit, so both slowdowns and changed results show up. Stages that raise are recorded with their error,
+# marked FAILED and make the run exit with a non-zero status after the history is written.
+#
+# With --out-of-core the official data is read from the parquet partitions instead of memory, with --compressed it's
+# kept in memory as EncodedOfficial. Those runs are also compared against the last in-memory run of the same commit to
+# report the latency cost of the mode (the load stage's RSS delta shows the memory saved).
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark PlaceData")
+    parser.add_argument("--config", default=os.path.join(here, "synthetic", "config.ini"),
+                        help="PlaceData config file (default: %(default)s)")
+    parser.add_argument("--users", nargs="*", help="usernames to benchmark (default: the samples from "
+                        "synthetic.json)")
+    parser.add_argument("--cold", action="store_true", help="delete official.p and unofficial.p to benchmark "
+                        "loading from csv")
+    parser.add_argument("--repeat", type=int, default=1, help="repeat query stages and report the median "
+                        "(default: %(default)s)")
+    parser.add_argument("--no-images", action="store_true", help="skip the generate_* stages")
+    parser.add_argument("--out-of-core", action="store_true", help="benchmark the out-of-core mode (official data "
+                        "partitioned on disk)")
+    parser.add_argument("--compressed", action="store_true", help="benchmark the compressed encoding of the official "
+                        "data in memory")
+    parser.add_argument("--history", help="history file (default: benchmark-history.jsonl in the working dir)")
+    parser.add_argument("--compare", help="commit to compare against (default: last run of another commit)")
+    return parser.parse_args()
+
+
+def load_place_dataframes():
+    # place-dataframes.py is no valid module name, so import it by path
+    spec = importlib.util.spec_from_file_location("place_dataframes", os.path.join(here, "place-dataframes.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def current_rss():
+    # resident set size in bytes
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return peak_rss()
+
+
+def peak_rss():
+    # peak resident set size in bytes since the last reset_peak_rss()
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except Exception:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def reset_peak_rss():
+    # linux allows resetting the peak RSS, elsewhere the peak stays the high-water mark of the whole run
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except Exception:
+        return False
+
+
+def digest(result):
+    # stable fingerprint of a stage result to detect changed results across commits
+    h = hashlib.sha1()
+    if hasattr(result, "official") and hasattr(result, "unofficial"):
+        h.update(f"{len(result.official)},{len(result.unofficial.index)}".encode())
+    elif hasattr(result, "to_csv"):
+        try:
+            df = result.reset_index(drop=True)
+            df = df.sort_values(by=list(df.columns)).reset_index(drop=True) if hasattr(df, "columns") else df
+        except Exception:
+            df = result
+        h.update(df.to_csv(index=False).encode())
+    elif isinstance(result, str) and os.path.isfile(result):
+        with open(result, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    else:
+        h.update(json.dumps(result, sort_keys=True,
+                            default=lambda o: o.item() if hasattr(o, "item") else type(o).__name__).encode())
+    return h.hexdigest()[:16]
+
+
+def describe(result):
+    if hasattr(result, "official") and hasattr(result, "unofficial"):
+        return f"{len(result.official)} official, {len(result.unofficial.index)} unofficial rows"
+    if isinstance(result, dict):
+        return f"{len(result)} keys"
+    if isinstance(result, list):
+        return f"{len(result)} entries"
+    if hasattr(result, "index") and not isinstance(result, str):
+        return f"{len(result.index)} rows"
+    if hasattr(result, "__dict__"):
+        return type(result).__name__
+    return str(result)[:40]
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=here, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=here,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except Exception:
+        return "unknown", False
+
+
+def mb(b):
+    return f"{b / 1024**2:8.1f}MB"
+
+
+class Benchmark():
+    def __init__(self, repeat=1):
+        self.repeat = max(repeat, 1)
+        self.stages = {}
+
+    def run(self, stage, fn, prepare=None, result_path=None, repeat=None):
+        # run fn (after prepare, on every repetition) and record median wall time, RSS delta, peak RSS and digest
+        walls = []
+        result = None
+        error = None
+        for _ in range(repeat or self.repeat):
+            if prepare:
+                prepare()
+            gc.collect()
+            reset_peak_rss()
+            rss_before = current_rss()
+            t = time.perf_counter()
+            try:
+                result = fn()
+            except Exception as e:
+                # keep benchmarking the other stages, the run fails at the end
+                result, error = None, repr(e)
+            walls.append(time.perf_counter() - t)
+            rss_after = current_rss()
+        peak = peak_rss()
+        fingerprint = digest(result_path if result_path and not error and os.path.isfile(result_path) else result)
+        self.stages[stage] = {"wall": statistics.median(walls),
+                              "rss_delta": rss_after - rss_before,
+                              "peak_rss": peak,
+                              "result": fingerprint,
+                              "size": describe(result)}
+        if error:
+            self.stages[stage]["error"] = error
+        print(f"{stage:45s} {statistics.median(walls):9.3f}s {mb(rss_after - rss_before)} {mb(peak)} "
+              f"{f'FAILED {error}' if error else fingerprint} ({describe(result)})")
+        return result
+
+    def failed(self):
+        # stages that raised an exception
+        return [stage for stage, entry in self.stages.items() if entry.get("error")]
+
+
+def compare(history, entry, against=None, other_mode=False):
+    # print the stages of this run next to the last run of another (or the requested) commit in the same mode, or
+    # with other_mode next to the last in-memory run of the same commit
+    mode = entry.get("mode", "in-memory")
+    previous = None
+    for old in reversed(history):
+        if other_mode:
+            match = old["commit"] == entry["commit"] and old.get("mode", "in-memory") == "in-memory"
+        else:
+            match = old.get("mode", "in-memory") == mode and \
+                ((against and old["commit"].startswith(against)) or (not against and old["commit"] != entry["commit"]))
+        if match:
+            previous = old
+            break
+    if previous is None:
+        if not other_mode:
+            print(f"\nNo previous {mode} run of another commit to compare against.")
+        return
+    if other_mode:
+        print(f"\n{mode} against in-memory run of the same commit ({previous['date']}):")
+    else:
+        print(f"\nComparison against {previous['commit']} ({previous['date']}):")
+    print(f"{'stage':45s} {'before':>10s} {'after':>10s} {'change':>8s}  result")
+    for stage, now in entry["stages"].items():
+        old = previous["stages"].get(stage)
+        if old is None:
+            print(f"{stage:45s} {'-':>10s} {now['wall']:9.3f}s {'new':>8s}  {'FAILED' if now.get('error') else ''}")
+            continue
+        change = (now["wall"] - old["wall"]) / old["wall"] * 100 if old["wall"] else 0
+        same = "FAILED" if now.get("error") else "same" if old["result"] == now["result"] else "CHANGED"
+        print(f"{stage:45s} {old['wall']:9.3f}s {now['wall']:9.3f}s {change:+7.1f}%  {same}")
+
+
+def main():
+    args = parse_args()
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    cwd = config.get("global", "dir", fallback=here)
+    history_file = args.history or os.path.join(cwd, "benchmark-history.jsonl")
+
+    meta = {}
+    if os.path.isfile(os.path.join(cwd, "synthetic.json")):
+        with open(os.path.join(cwd, "synthetic.json")) as f:
+            meta = json.load(f)
+    users = args.users or list(meta.get("samples", {}).values())
+    if not users:
+        sys.exit("No usernames to benchmark: pass --users or use a dataset from generate-synthetic-data.py")
+
+    # benchmark against an empty cache that doesn't touch the real cache.p
+    cachedir = tempfile.mkdtemp(prefix="place-benchmark-")
+    config.set("global", "cachedir", cachedir)
+    if args.out_of_core:
+        config.set("global", "outofcore", "true")
+    elif args.compressed:
+        config.set("global", "encoding", "compressed")
+    config_file = os.path.join(cachedir, "config.ini")
+    with open(config_file, "w") as f:
+        config.write(f)
+    partition_dir = config.get("global", "partitions", fallback=os.path.join(cwd, "partitions"))
+
+    if args.cold:
+        for name in ["official.p", "official-encoded.p", "unofficial.p"]:
+            if os.path.isfile(os.path.join(cwd, name)):
+                os.remove(os.path.join(cwd, name))
+        if args.out_of_core:
+            shutil.rmtree(partition_dir, ignore_errors=True)
+
+    bench = Benchmark(args.repeat)
+    print(f"{'stage':45s} {'wall':>10s} {'rss delta':>10s} {'peak rss':>10s} result")
+    module = bench.run("import", load_place_dataframes, repeat=1)
+    if args.out_of_core:
+        cached, cached_file = "partitions", os.path.join(partition_dir, "manifest.json")
+    elif args.compressed:
+        cached, cached_file = "encoded pickle", os.path.join(cwd, "official-encoded.p")
+    else:
+        cached, cached_file = "pickle", os.path.join(cwd, "official.p")
+    loaded_from = cached if os.path.isfile(cached_file) else "csv"
+
+    def load():
+        # the datasets load on first access
+        data = module.PlaceData(config_file=config_file)
+        data.official
+        data.unofficial
+        return data
+
+    data = bench.run(f"load ({loaded_from})", load, repeat=1)
+    if loaded_from == "csv":
+        del data
+        data = bench.run(f"load ({cached})", load, repeat=1)
+
+    # startup for a single cached lookup: constructor only, and the command line interface in a new process
+    def startup():
+        # don't return the object, the digest would load the datasets
+        module.PlaceData(config_file=config_file)
+        return "PlaceData"
+
+    bench.run("startup: PlaceData()", startup)
+    cli = [sys.executable, os.path.join(here, "place-dataframes.py"), "--config", config_file, "hash", users[0]]
+    bench.run("startup: cli hash (cached)",
+              lambda: subprocess.run(cli, capture_output=True, text=True, check=True).stdout.strip(),
+              prepare=lambda: subprocess.run(cli, capture_output=True))
+
+    def drop(user, *datatypes):
+        return lambda: [data.cache.drop(user, datatype) for datatype in datatypes]
+
+    # the username index is built from the unofficial users file on the first run
+    bench.run("usernames: load index", lambda: data.load_username_index() and len(data.username_index), repeat=1)
+    bench.run("usernames: complete prefix", lambda: data.complete_username(data.strip_username(users[0])[:4]))
+    bench.run("usernames: suggest (one typo)", lambda: data.suggest_usernames(data.strip_username(users[0])[1:]))
+
+    # exporting most of the official data: the DataFrame of query() as JSON against Arrow record batches written to
+    # an IPC stream
+    json_file, arrow_file = os.path.join(cachedir, "export.json"), os.path.join(cachedir, "export.arrows")
+    bench.run("export: query + to_json (pre whiteout)",
+              lambda: data.query(ts_to=module.whiteout_short).to_json(json_file, orient="records"),
+              result_path=json_file)
+    bench.run("export: arrow ipc stream (pre whiteout)",
+              lambda: data.export_query(arrow_file, ts_to=module.whiteout_short), result_path=arrow_file)
+
+    if not args.out_of_core:
+        # the activity cube is built from the official data in memory (on the first run, loaded afterwards)
+        bench.run("activity: load cube", lambda: data.load_activity_cube() and data.activity_cube, repeat=1)
+        bench.run("activity: white edits during whiteout",
+                  lambda: data.get_activity(ts_from=module.whiteout_short, colors=[7]))
+        bench.run("activity: curve of the event (10 minutes)", lambda: data.get_activity_curve(minutes=10))
+        # colors of a million pixels of the canvas at random times, from the pixel histories (pixelhistory.p)
+        points = module.np.random.default_rng(0).integers(0, [module.canvas_size, module.canvas_size,
+                                                              module.whiteout_short], size=(1000000, 3)).T
+        bench.run("pixels: load histories", lambda: data.load_pixel_history() and data.pixel_history, repeat=1)
+        bench.run("pixels: colors at 1M points", lambda: data.get_colors_at(*points))
+
+    for name in users:
+        user = data.strip_username(name)
+        bench.run(f"{user}: get_official_uid_by_username",
+                  lambda: data.get_official_uid_by_username(user), prepare=lambda: data.cache.drop(user))
+        bench.run(f"{user}: get_first_pixels_by_username",
+                  lambda: data.get_first_pixels_by_username(user), prepare=drop(user, "first_pixels"))
+        bench.run(f"{user}: get_final_pixels_by_username",
+                  lambda: data.get_final_pixels_by_username(user), prepare=drop(user, "final_pixels"))
+        bench.run(f"{user}: get_json_summary",
+                  lambda: data.get_json_summary(user), prepare=drop(user, "first_pixels", "final_pixels", "hash"))
+        bench.run(f"{user}: query (user, pre whiteout)",
+                  lambda: data.query(users=data.get_official_uid_by_username(user), ts_to=module.whiteout_short))
+        if not args.out_of_core:
+            # needs the official data in memory
+            bench.run(f"{user}: get_overwrites_by_username", lambda: data.get_overwrites_by_username(user))
+            bench.run(f"{user}: get_neighbors_by_username", lambda: data.get_neighbors_by_username(user, k=10))
+        if args.no_images:
+            continue
+        for method, suffix in [("generate_first_pixels_dark", "first"),
+                               ("generate_final_pixels_dark", "final"),
+                               ("generate_all_pixels_dark_pre_whiteout", "all"),
+                               ("generate_all_pixels_dark_during_whiteout", "whiteout")]:
+            fn = getattr(data, method)
+            bench.run(f"{user}: {method}", lambda: fn(user, force=True),
+                      result_path=os.path.join(data.imgdir, f"{data.printuser(user)}-{suffix}.png"))
+
+    if not data.out_of_core and data.encoding == "pandas":
+        # live mode, last as it changes the data: tail a file of 100k new rows into the delta segment, query base and
+        # delta together and compact the delta into the base data
+        live_rows = 100000
+        rng = module.np.random.default_rng(0)
+        live_file = os.path.join(cachedir, "live.csv")
+        with open(live_file, "w") as f:
+            f.write("timestamp,user_id,pixel_color,pixel_x,pixel_y\n")
+            columns = [module.np.sort(rng.integers(0, module.whiteout_short, live_rows)),
+                       rng.integers(0, int(data.official.user_id.max()) + 1, live_rows), rng.integers(0, 32, live_rows),
+                       rng.integers(0, module.canvas_size, live_rows), rng.integers(0, module.canvas_size, live_rows)]
+            f.writelines(f"{ts},{uid},{color},{x},{y}\n" for ts, uid, color, x, y in zip(*map(list, columns)))
+        data.live_compact_rows = data.live_compact_seconds = float("inf")
+
+        def ingest():
+            data.start_live(live_file)
+            while data.live_status()["rows_ingested"] < live_rows:
+                time.sleep(0.01)
+            return data.live_status()["delta_rows"]
+
+        uid = data.get_official_uid_by_username(data.strip_username(users[0]))
+        bench.run(f"live: ingest {live_rows} rows", ingest, repeat=1)
+        bench.run("live: query (user, base + delta)", lambda: data.query(users=uid))
+        bench.run("live: compaction", data.compact_live, repeat=1)
+        data.stop_live(compact=False)
+
+    commit, dirty = git_commit()
+    entry = {"commit": commit,
+             "dirty": dirty,
+             "mode": "out-of-core" if args.out_of_core else "compressed" if args.compressed else "in-memory",
+             "date": datetime.now().isoformat(timespec="seconds"),
+             "dataset": {k: meta[k] for k in ["seed", "rows", "users"] if k in meta},
+             "stages": bench.stages}
+    history = []
+    if os.path.isfile(history_file):
+        with open(history_file) as f:
+            history = [json.loads(line) for line in f if line.strip()]
+    compare(history, entry, args.compare)
+    if entry["mode"] != "in-memory":
+        compare(history, entry, other_mode=True)
+    with open(history_file, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+    print(f"\nResults appended to {history_file}")
+    failed = bench.failed()
+    if failed:
+        sys.exit(f"{len(failed)} stage(s) failed: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import re
 import lzma
 import os
 import configparser
+import numpy as np
 import requests
 from tqdm import tqdm
 
@@ -145,14 +146,51 @@ os.makedirs(output_dir, exist_ok=True)
 start = 1648771200 * 1000  # april 1, 12am timestamp in ms
 user_map: dict[str, int] = {}
 user_i = 0
+# the snapshots overlap, so most records appear in several files: only the first appearance of every record is
+# written, the 64 bit keys of all written records are kept in sorted runs (8 bytes per distinct record), merged
+# whenever a run isn't much smaller than the one before (like a log-structured merge tree, at most log2(n) runs)
+seen_runs: list[np.ndarray] = []
+records_total = 0
+records_written = 0
+
+
+def record_keys(ts, user, x, y):
+    # 64 bit keys of the records (splitmix64 over the packed fields), equal records have equal keys
+    def mix(h):
+        h = (h + np.uint64(0x9E3779B97F4A7C15)) ^ (h >> np.uint64(30))
+        h = (h * np.uint64(0xBF58476D1CE4E5B9)) ^ (h >> np.uint64(27))
+        h = (h * np.uint64(0x94D049BB133111EB)) ^ (h >> np.uint64(31))
+        return h
+
+    packed_a = (ts.astype(np.uint64) << np.uint64(32)) | user.astype(np.uint64)
+    packed_b = (x.astype(np.uint64) << np.uint64(16)) | y.astype(np.uint64)
+    return mix(mix(packed_a) ^ packed_b)
+
+
+def unseen(keys):
+    # positions of the first appearance of every record that wasn't written before, in their original order
+    # (the keys are added to the seen runs)
+    unique, first = np.unique(keys, return_index=True)
+    for run in seen_runs:
+        pos = np.minimum(np.searchsorted(run, unique), len(run) - 1)
+        new = run[pos] != unique
+        unique, first = unique[new], first[new]
+    if len(unique):
+        seen_runs.append(unique)
+    while len(seen_runs) > 1 and len(seen_runs[-2]) <= 2 * len(seen_runs[-1]):
+        run = seen_runs.pop()
+        seen_runs[-1] = np.sort(np.concatenate([seen_runs[-1], run]), kind="stable")
+    return np.sort(first)
 
 
 def parse_stream(r, filename):
     global user_map
     global user_i
+    global records_total
+    global records_written
 
     basename, _ = os.path.splitext(filename)
-    out = ["timestamp,user_id,pixel_x,pixel_y"]
+    records = []
     for line in tqdm(r, position=1, leave=False, desc=f"Processing {filename}..."):
         new_line = re.sub(r',', '|', line.rstrip(), count=3)
         new_line = re.sub(r'\\', '', new_line)
@@ -185,12 +223,18 @@ def parse_stream(r, filename):
                     ts = float(j["data"][elem]["data"][0]["data"]["lastModifiedTimestamp"])
                     new_time = int(ts - start)
 
-                    out.append(f"{new_time},{new_user},{int(x)},{int(y)}")
+                    records.append((new_time, new_user, int(x), int(y)))
                 except Exception:
                     continue
         except Exception:
             continue
 
+    records = np.array(records, dtype=np.int64).reshape(-1, 4)
+    keep = unseen(record_keys(*records.T)) if len(records) else []
+    records_total += len(records)
+    records_written += len(keep)
+    out = ["timestamp,user_id,pixel_x,pixel_y"]
+    out.extend(",".join(map(str, record)) for record in records[keep].tolist())
     with open(os.path.join(output_dir, basename), "w+") as f:
         f.write("\n".join(out))
 
@@ -216,3 +260,7 @@ for filename in tqdm(INTERNET_ARCHIVE_FILES, desc="Processing unofficial files",
 
 with open(os.path.join(output_dir, "users"), "w+") as f:
     json.dump(user_map, f, indent=4)
+
+duplicates = records_total - records_written
+print(f"{records_total} records, {records_written} distinct: dropped {duplicates} duplicates "
+      f"({duplicates / max(records_total, 1):.1%})")
@@ -0,0 +1,321 @@
+import argparse
+import base64
+import json
+import os
+import numpy as np
+import pandas as pd
+from PIL import Image, ImageColor
+from tqdm import tqdm
+
+# Generate a synthetic r/place 2022 dataset in the same compressed format the download-and-compress-*.py scripts
+# produce, so PlaceData can be run and benchmarked without the real 160M row dataset.
+#
+# The output directory will contain:
+#   official-compressed/NN.csv + users          (timestamp,user_id,pixel_color,pixel_x,pixel_y)
+#   unofficial-compressed/details-*.csv + users (timestamp,user_id,pixel_x,pixel_y)
+#   final_place.png                             (rendered from the generated edits right before the whiteout)
+#   config.ini                                  (ready to use with PlaceData(config_file=...))
+#   synthetic.json                              (parameters and some sample usernames for the benchmark)
+
+start = 1648771200 * 1000  # 2022-04-01 00:00:00 GMT in ms
+whiteout = 1649112460186  # 2022-04-04 22:47:40.186 GMT in ms - last non-white pixel in dataset: 341260185
+whiteout_short = whiteout - start
+
+# all times below are relative to start in ms, approximated from the real event
+event_begin = 45_900_000  # 2022-04-01 12:45 GMT
+event_end = 346_500_000  # 2022-04-05 00:15 GMT
+expansion_x = 145_500_000  # 2022-04-02 16:25 GMT: canvas grows to 2000x1000
+expansion_y = 241_380_000  # 2022-04-03 19:03 GMT: canvas grows to 2000x2000
+unofficial_first = 1648846499954 - start  # first and last snapshot of the unofficial dataset
+unofficial_last = 1649108974796 - start
+cooldown = 300_000  # 5 minutes between pixels
+
+hexcolors = ["#000000", "#FFB470", "#2450A4", "#FFA800", "#D4D7D9", "#493AC1", "#00756F", "#FFFFFF",
+             "#6D482F", "#FFF8B8", "#3690EA", "#00CCC0", "#51E9F4", "#9C6926", "#B44AC0", "#009EAA",
+             "#FF4500", "#BE0039", "#811E9F", "#00A368", "#FF3881", "#6A5CFF", "#FFD635", "#E4ABFF",
+             "#DE107F", "#FF99AA", "#515252", "#94B3FF", "#7EED56", "#00CC78", "#898D90", "#6D001A"]
+white = 7
+
+adjectives = ["ancient", "angry", "blue", "brave", "calm", "clever", "crispy", "dank", "eager", "fancy", "fuzzy",
+              "gentle", "grumpy", "happy", "hidden", "hungry", "icy", "jolly", "lazy", "lucky", "mighty", "odd",
+              "proud", "quiet", "rapid", "salty", "shiny", "silent", "sleepy", "spicy", "tiny", "wild"]
+nouns = ["badger", "banana", "bear", "cactus", "cat", "comet", "dragon", "duck", "falcon", "ferret", "fox",
+         "goose", "hamster", "koala", "lemon", "llama", "moose", "narwhal", "otter", "owl", "panda", "pickle",
+         "pigeon", "potato", "raccoon", "robot", "shark", "sloth", "squid", "taco", "turtle", "walrus"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a synthetic r/place 2022 dataset for PlaceData")
+    parser.add_argument("--dir", default="synthetic", help="output directory (default: %(default)s)")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="approximate number of official pixel "
+                        "placements (default: %(default)s, the real dataset has ~160M)")
+    parser.add_argument("--users", type=int, default=100_000, help="number of users (default: %(default)s)")
+    parser.add_argument("--artworks", type=int, default=300, help="number of contested artworks / factions "
+                        "(default: %(default)s)")
+    parser.add_argument("--official-files", type=int, default=8, help="number of official csv files "
+                        "(default: %(default)s)")
+    parser.add_argument("--snapshots", type=int, default=40, help="number of unofficial snapshot files "
+                        "(default: %(default)s)")
+    parser.add_argument("--snapshot-fraction", type=float, default=0.1, help="fraction of the edited pixels "
+                        "contained in each unofficial snapshot (default: %(default)s)")
+    parser.add_argument("--quirk-rate", type=float, default=0.5, help="fraction of unofficial records on the "
+                        "expanded canvas written without the +1000 coordinate offset (default: %(default)s)")
+    parser.add_argument("--keep-duplicates", action="store_true", help="write every unofficial snapshot in full, "
+                        "repeating the records of earlier snapshots (like the downloader before deduplication)")
+    parser.add_argument("--bot-rate", type=float, default=0.005, help="fraction of users placing at an exact "
+                        "cooldown cadence (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=2022, help="random seed (default: %(default)s)")
+    return parser.parse_args()
+
+
+def make_hashes(rng, n):
+    # reddit supplied user hashes are 88 character base64 strings
+    raw = rng.integers(0, 256, size=(n, 64), dtype=np.uint8)
+    return [base64.b64encode(row.tobytes()).decode() for row in raw]
+
+
+def make_usernames(rng, n):
+    names = set()
+    while len(names) < n:
+        adj = rng.choice(adjectives, size=n)
+        noun = rng.choice(nouns, size=n)
+        num = rng.integers(0, 10000, size=n)
+        style = rng.integers(0, 3, size=n)
+        for a, b, c, s in zip(adj, noun, num, style):
+            if s == 0:
+                names.add(f"{a}_{b}{c}")
+            elif s == 1:
+                names.add(f"{a.capitalize()}{b.capitalize()}{c}")
+            else:
+                names.add(f"{b}-{a}-{c}")
+            if len(names) >= n:
+                break
+    return sorted(names)
+
+
+def generate_placements(rng, args):
+    # returns DataFrame of (timestamp, user, pixel_color, pixel_x, pixel_y) sorted by timestamp, with user being the
+    # index of the user in the generated user list
+    n_users = args.users
+
+    # zipf-ish activity: few heavy placers, a long tail of users placing just a handful of pixels
+    weights = 1.0 / np.arange(1, n_users + 1) ** 0.8
+    weights = rng.permutation(weights)
+    counts = rng.multinomial(args.rows, weights / weights.sum())
+    counts = np.maximum(counts, 1)
+    total = int(counts.sum())
+    users = np.repeat(np.arange(n_users, dtype=np.int64), counts)
+
+    # time between placements: the 5 minute cooldown plus some human delay, bots hit the cooldown exactly
+    bots = rng.random(n_users) < args.bot_rate
+    delay = rng.exponential(600_000, size=total)
+    delay = np.where(bots[users], rng.integers(0, 1000, size=total), delay)
+    intervals = (cooldown + delay).astype(np.int64)
+    group_start = np.cumsum(counts) - counts
+    first = np.zeros(total, dtype=bool)
+    first[group_start] = True
+    intervals[first] = 0
+    offsets = np.cumsum(intervals)
+    offsets -= np.repeat(offsets[group_start], counts)
+
+    # every user starts at a random point of the event, such that the activity fits into it where possible
+    duration = event_end - event_begin
+    span = offsets[group_start + counts - 1]
+    latest = np.maximum(duration - span, 1)
+    user_begin = event_begin + (rng.random(n_users) * latest).astype(np.int64)
+    timestamps = np.repeat(user_begin, counts) + offsets
+    keep = timestamps < event_end
+    users = users[keep]
+    timestamps = timestamps[keep]
+    total = len(users)
+
+    # every user belongs to a faction defending an artwork with its own small palette, a few big artworks draw most
+    # of the factions and thus most of the contention
+    n_art = args.artworks
+    art_x = rng.integers(0, 2000, size=n_art)
+    art_y = rng.integers(0, 2000, size=n_art)
+    art_size = rng.uniform(3, 40, size=n_art)
+    art_palette = rng.integers(0, 32, size=(n_art, 4))
+    art_weights = 1.0 / np.arange(1, n_art + 1) ** 1.1
+    faction = rng.choice(n_art, size=n_users, p=art_weights / art_weights.sum())
+    row_faction = faction[users]
+
+    x = np.rint(art_x[row_faction] + rng.normal(0, 1, size=total) * art_size[row_faction]).astype(np.int64)
+    y = np.rint(art_y[row_faction] + rng.normal(0, 1, size=total) * art_size[row_faction]).astype(np.int64)
+    stray = rng.random(total) < 0.1
+    x[stray] = rng.integers(0, 2000, size=int(stray.sum()))
+    y[stray] = rng.integers(0, 2000, size=int(stray.sum()))
+    x = np.clip(x, 0, 1999)
+    y = np.clip(y, 0, 1999)
+    # the canvas only grew during the event
+    x = np.where(timestamps < expansion_x, x % 1000, x)
+    y = np.where(timestamps < expansion_y, y % 1000, y)
+
+    colors = art_palette[row_faction, rng.integers(0, 4, size=total)]
+    colors = np.where(rng.random(total) < 0.05, rng.integers(0, 32, size=total), colors)
+
+    # whiteout: only white pixels from here on, and lots of people joining in on it
+    colors = np.where(timestamps >= whiteout_short, white, colors)
+    n_whiteout = max(total // 50, 1)
+    wo_users = rng.choice(n_users, size=n_whiteout)
+    wo_ts = rng.integers(whiteout_short, event_end, size=n_whiteout)
+    users = np.concatenate([users, wo_users])
+    timestamps = np.concatenate([timestamps, wo_ts])
+    x = np.concatenate([x, rng.integers(0, 2000, size=n_whiteout)])
+    y = np.concatenate([y, rng.integers(0, 2000, size=n_whiteout)])
+    colors = np.concatenate([colors, np.full(n_whiteout, white)])
+
+    df = pd.DataFrame({"timestamp": timestamps, "user": users, "pixel_color": colors, "pixel_x": x, "pixel_y": y})
+    df = df.sort_values(by="timestamp", kind="stable").reset_index(drop=True)
+    return df, bots
+
+
+def write_official(df, args, outdir):
+    os.makedirs(outdir, exist_ok=True)
+
+    # the official compressor assigns user ids in order of first appearance
+    _, first_idx = np.unique(df.user.values, return_index=True)
+    appearance = df.user.values[np.sort(first_idx)]
+    official_uid = np.full(args.users, -1, dtype=np.int64)
+    official_uid[appearance] = np.arange(len(appearance))
+
+    out = pd.DataFrame({"timestamp": df.timestamp.values,
+                        "user_id": official_uid[df.user.values],
+                        "pixel_color": df.pixel_color.values,
+                        "pixel_x": df.pixel_x.values,
+                        "pixel_y": df.pixel_y.values})
+    for i, part in enumerate(tqdm(np.array_split(np.arange(len(out)), args.official_files),
+                                  desc="Writing official files", leave=False)):
+        out.iloc[part].to_csv(os.path.join(outdir, f"{i:02d}.csv"), index=False)
+    return official_uid
+
+
+def write_unofficial(rng, df, usernames, args, outdir):
+    # the unofficial dataset consists of overlapping snapshots of the canvas, each holding the user and the last
+    # modification time of a sample of pixels at the time of the snapshot
+    # like the downloader, only the first appearance of every record is written unless args.keep_duplicates
+    os.makedirs(outdir, exist_ok=True)
+    pixel = df.pixel_y.values * 2000 + df.pixel_x.values
+    order = np.lexsort((df.timestamp.values, pixel))
+    keys = pixel[order] * (1 << 30) + df.timestamp.values[order]
+    edited = np.unique(pixel)
+
+    user_map = {}
+    snapshot_times = np.sort(rng.integers(unofficial_first, unofficial_last, size=args.snapshots))
+    snapshot_times[-1] = unofficial_last
+    records = 0
+    duplicates = 0
+    written = np.zeros(len(df), dtype=bool)
+    for ts in tqdm(snapshot_times, desc="Writing unofficial snapshots", leave=False):
+        sample = edited[rng.random(len(edited)) < args.snapshot_fraction]
+        idx = np.searchsorted(keys, sample * (1 << 30) + ts, side="right") - 1
+        found = idx >= 0
+        rows = order[np.where(found, idx, 0)]
+        rows = rows[found & (pixel[rows] == sample)]
+        duplicates += int(written[rows].sum())
+        if not args.keep_duplicates:
+            rows = rows[~written[rows]]
+        written[rows] = True
+        if len(rows) == 0:
+            continue
+
+        x = df.pixel_x.values[rows]
+        y = df.pixel_y.values[rows]
+        # inconsistent canvas expansion coordinates: some records on the expanded canvas lack the +1000 offset
+        x = np.where((x >= 1000) & (rng.random(len(rows)) < args.quirk_rate), x - 1000, x)
+        y = np.where((y >= 1000) & (rng.random(len(rows)) < args.quirk_rate), y - 1000, y)
+
+        uids = []
+        for user in df.user.values[rows]:
+            name = usernames[user]
+            uid = user_map.get(name)
+            if uid is None:
+                uid = len(user_map)
+                user_map[name] = uid
+            uids.append(uid)
+
+        out = pd.DataFrame({"timestamp": df.timestamp.values[rows], "user_id": uids, "pixel_x": x, "pixel_y": y})
+        out.to_csv(os.path.join(outdir, f"details-{ts + start}.csv"), index=False)
+        records += len(out)
+
+    with open(os.path.join(outdir, "users"), "w+") as f:
+        json.dump(user_map, f, indent=4)
+    return user_map, records, duplicates
+
+
+def write_final_place(df, path):
+    # render the canvas right before the whiteout
+    before = df[df.timestamp < whiteout_short]
+    last = before.drop_duplicates(subset=["pixel_x", "pixel_y"], keep="last")
+    palette = np.array([ImageColor.getrgb(c) + (255,) for c in hexcolors], dtype=np.uint8)
+    canvas = np.full((2000, 2000, 4), 255, dtype=np.uint8)
+    canvas[last.pixel_y.values, last.pixel_x.values] = palette[last.pixel_color.values]
+    Image.fromarray(canvas, "RGBA").save(path, "PNG")
+
+
+def main():
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+    outdir = os.path.abspath(args.dir)
+    official_dir = os.path.join(outdir, "official-compressed")
+    unofficial_dir = os.path.join(outdir, "unofficial-compressed")
+    os.makedirs(outdir, exist_ok=True)
+
+    print(f"Generate ~{args.rows} placements by {args.users} users ...")
+    df, bots = generate_placements(rng, args)
+    usernames = make_usernames(rng, args.users)
+    usernames = [usernames[i] for i in rng.permutation(len(usernames))]
+
+    official_uid = write_official(df, args, official_dir)
+    hashes = make_hashes(rng, args.users)
+    official_users = {hashes[user]: int(official_uid[user]) for user in np.argsort(official_uid)
+                      if official_uid[user] >= 0}
+    with open(os.path.join(official_dir, "users"), "w+") as f:
+        json.dump(official_users, f, indent=4)
+
+    user_map, records, duplicates = write_unofficial(rng, df, usernames, args, unofficial_dir)
+    write_final_place(df, os.path.join(outdir, "final_place.png"))
+
+    with open(os.path.join(outdir, "config.ini"), "w+") as f:
+        f.write("[global]\n"
+                f"dir = {outdir}\n"
+                f"imgdir = {os.path.join(outdir, 'images')}\n"
+                "uidworkers = 2\n"
+                "pixelworkers = 4\n\n"
+                "[original]\n"
+                f"unofficial = {os.path.join(outdir, 'unofficial')}\n\n"
+                "[compressed]\n"
+                f"official = {official_dir}\n"
+                f"unofficial = {unofficial_dir}\n")
+
+    # sample users for the benchmark: the heaviest placer plus typical users that can be matched via the
+    # unofficial data
+    placed = np.bincount(df.user.values, minlength=args.users)
+    known = np.array([usernames[user] in user_map for user in range(args.users)])
+    candidates = np.flatnonzero(known & (official_uid > 0))
+    by_count = candidates[np.argsort(placed[candidates])[::-1]]
+    samples = {"heavy": usernames[by_count[0]],
+               "median": usernames[by_count[len(by_count) // 2]],
+               "light": usernames[by_count[-1]]}
+    meta = {"seed": args.seed,
+            "rows": int(len(df)),
+            "users": args.users,
+            "artworks": args.artworks,
+            "bots": int(bots.sum()),
+            "unofficial_records": int(records),
+            "unofficial_duplicates": int(duplicates),
+            "unofficial_users": len(user_map),
+            "quirk_rate": args.quirk_rate,
+            "expansion_x": expansion_x,
+            "expansion_y": expansion_y,
+            "samples": samples,
+            "sample_pixels": {k: int(placed[usernames.index(v)]) for k, v in samples.items()}}
+    with open(os.path.join(outdir, "synthetic.json"), "w+") as f:
+        json.dump(meta, f, indent=4)
+    print(f"Wrote {len(df)} official and {records} unofficial rows to {outdir} ({duplicates} duplicate unofficial "
+          f"records {'kept' if args.keep_duplicates else 'dropped'})")
+    print(f"Use it with: PlaceData(config_file=\"{os.path.join(outdir, 'config.ini')}\")")
+
+
+if __name__ == "__main__":
+    main()
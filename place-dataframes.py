@@ -1,22 +1,62 @@
 import glob
-import dask.dataframe as dd
-import pandas as pd
-import numpy as np
 import pickle
 import logging
 import sys
 import configparser
 import os
 import json
-from colory.color import Color
+import zlib
+import time
+import multiprocessing
+import bisect
+import functools
+import threading
+import argparse
+import importlib
+import heapq
+import itertools
+import queue
 from datetime import datetime
-from dateutil.relativedelta import relativedelta
 from concurrent.futures import ThreadPoolExecutor
 from concurrent import futures
-from PIL import Image, ImageColor, ImageEnhance
 from collections import Counter
-from tqdm import tqdm
-from dask.diagnostics import ProgressBar
+
+
+class LazyModule():
+    # stand-in for a module (or one attribute of it) which is imported on first use, so starting up for a cached
+    # lookup doesn't pay for importing dask, pandas, numpy and PIL
+
+    def __init__(self, module, attribute=None):
+        self._module = module
+        self._attribute = attribute
+        self._target = None
+
+    def _load(self):
+        if self._target is None:
+            target = importlib.import_module(self._module)
+            self._target = getattr(target, self._attribute) if self._attribute else target
+            # replace the stand-in by the real thing, so later lookups don't go through __getattr__
+            for name, value in list(globals().items()):
+                if value is self:
+                    globals()[name] = self._target
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+
+dd = LazyModule("dask.dataframe")
+pd = LazyModule("pandas")
+np = LazyModule("numpy")
+Image = LazyModule("PIL.Image")
+ImageColor = LazyModule("PIL.ImageColor")
+ImageEnhance = LazyModule("PIL.ImageEnhance")
+relativedelta = LazyModule("dateutil.relativedelta", "relativedelta")
+tqdm = LazyModule("tqdm", "tqdm")
+ProgressBar = LazyModule("dask.diagnostics", "ProgressBar")
 
 # Enable logging
 logFormat = ('[%(asctime)s] [%(filename)s:%(lineno)3d] [%(levelname).1s] %(message)s')
@@ -26,16 +66,294 @@ logger = logging.getLogger(__name__)
 start = 1648771200 * 1000  # 2022-04-01 00:00:00 GMT in ms
 whiteout = 1649112460186  # 2022-04-04 22:47:40.186 GMT in ms - last non-white pixel in dataset: 341260185
 whiteout_short = whiteout - start
+canvas_size = 2000  # final canvas is 2000x2000 pixels
+expansion_x = 145500000  # 2022-04-02 16:25 GMT in ms after start: the canvas grew to 2000x1000
+expansion_y = 241380000  # 2022-04-03 19:03 GMT in ms after start: the canvas grew to 2000x2000
+image_size = 16000  # generated images are scaled up to 16000x16000 pixels
+# names of the 32 palette colors from https://xkcd.com/color/rgb/ (the closest xkcd color, as found by colory)
+palette_names = ["Black", "Apricot", "Dusk Blue", "Orange Yellow", "Light Grey", "Blue With A Hint Of Purple",
+                 "Dark Aquamarine", "White", "Purple Brown", "Light Beige", "Dark Sky Blue", "Aquamarine",
+                 "Robin'S Egg", "Sepia", "Pinky Purple", "Teal Blue", "Blood Orange", "Rose Red", "Purple",
+                 "Bluish Green", "Barbie Pink", "Cornflower", "Sun Yellow", "Light Violet", "Cerise", "Pinky",
+                 "Gunmetal", "Carolina Blue", "Lighter Green", "Seaweed", "Grey", "Claret"]
+
+
+def current_rss():
+    # resident set size of this process in bytes (0 where /proc is not available)
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return 0
+
+
+def instrumented(stage):
+    # decorator for PlaceData methods: record calls as the given stage in self.metrics
+    # when metrics are disabled, this costs a single attribute lookup per call
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not self.metrics.enabled:
+                return func(self, *args, **kwargs)
+            with self.metrics.stage(stage):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class Metrics():
+    # per-stage instrumentation of the PlaceData class: latency histograms, rows scanned, cache hits and RSS deltas
+    # available as a dict via stats() and as Prometheus text format via prometheus()
+
+    buckets = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300]
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+            self.cache = {}
+            self.gauges = {}
+
+    def _stage_entry(self, stage):
+        # must be called with self.lock held
+        if stage not in self.stages:
+            self.stages[stage] = {"count": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                  "buckets": [0] * (len(self.buckets) + 1),
+                                  "rows_scanned": 0, "rows_returned": 0,
+                                  "rss_delta": 0, "max_rss_delta": 0}
+        return self.stages[stage]
+
+    def stage(self, name):
+        return _MetricsStage(self, name)
+
+    def observe(self, stage, seconds, rss_delta=0):
+        with self.lock:
+            entry = self._stage_entry(stage)
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["buckets"][bisect.bisect_left(self.buckets, seconds)] += 1
+            entry["rss_delta"] += rss_delta
+            entry["max_rss_delta"] = max(entry["max_rss_delta"], rss_delta)
+
+    def add_rows(self, stage, scanned, returned=0):
+        if not self.enabled:
+            return
+        with self.lock:
+            entry = self._stage_entry(stage)
+            entry["rows_scanned"] += int(scanned)
+            entry["rows_returned"] += int(returned)
+
+    def set_gauge(self, name, value):
+        # current value of a gauge, e.g. the ingest lag of live mode
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[name] = value
+
+    def cache_access(self, datatype, hit):
+        if not self.enabled:
+            return
+        with self.lock:
+            hits, misses = self.cache.get(datatype, (0, 0))
+            self.cache[datatype] = (hits + 1, misses) if hit else (hits, misses + 1)
+
+    def stats(self):
+        # return all recorded metrics as dict
+        with self.lock:
+            stages = {}
+            for stage, entry in self.stages.items():
+                cumulative = 0
+                histogram = {}
+                for le, count in zip(self.buckets + ["+Inf"], entry["buckets"]):
+                    cumulative += count
+                    histogram[str(le)] = cumulative
+                stages[stage] = {"count": entry["count"],
+                                 "total_seconds": entry["seconds"],
+                                 "mean_seconds": entry["seconds"] / entry["count"] if entry["count"] else 0.0,
+                                 "max_seconds": entry["max_seconds"],
+                                 "histogram": histogram,
+                                 "rows_scanned": entry["rows_scanned"],
+                                 "rows_returned": entry["rows_returned"],
+                                 "rss_delta_bytes": entry["rss_delta"],
+                                 "max_rss_delta_bytes": entry["max_rss_delta"]}
+            cache = {}
+            for datatype, (hits, misses) in self.cache.items():
+                cache[datatype] = {"hits": hits, "misses": misses,
+                                   "hit_ratio": hits / (hits + misses) if hits + misses else 0.0}
+            gauges = dict(self.gauges)
+        return {"enabled": self.enabled, "rss_bytes": current_rss(), "stages": stages, "cache": cache,
+                "gauges": gauges}
+
+    def prometheus(self):
+        # return all recorded metrics in the Prometheus text exposition format
+        stats = self.stats()
+        lines = ["# HELP place_stage_duration_seconds Duration of PlaceData stages.",
+                 "# TYPE place_stage_duration_seconds histogram"]
+        for stage, entry in stats["stages"].items():
+            for le, count in entry["histogram"].items():
+                lines.append(f'place_stage_duration_seconds_bucket{{stage="{stage}",le="{le}"}} {count}')
+            lines.append(f'place_stage_duration_seconds_sum{{stage="{stage}"}} {entry["total_seconds"]}')
+            lines.append(f'place_stage_duration_seconds_count{{stage="{stage}"}} {entry["count"]}')
+        for name, key, text in [("place_stage_rows_scanned_total", "rows_scanned", "Rows scanned by stage."),
+                                ("place_stage_rows_returned_total", "rows_returned", "Rows returned by stage."),
+                                ("place_stage_rss_delta_bytes_total", "rss_delta_bytes",
+                                 "Sum of RSS changes during stage.")]:
+            lines += [f"# HELP {name} {text}", f"# TYPE {name} counter"]
+            for stage, entry in stats["stages"].items():
+                lines.append(f'{name}{{stage="{stage}"}} {entry[key]}')
+        lines += ["# HELP place_cache_requests_total Cache lookups by datatype and result.",
+                  "# TYPE place_cache_requests_total counter"]
+        for datatype, entry in stats["cache"].items():
+            lines.append(f'place_cache_requests_total{{datatype="{datatype}",result="hit"}} {entry["hits"]}')
+            lines.append(f'place_cache_requests_total{{datatype="{datatype}",result="miss"}} {entry["misses"]}')
+        for name, value in stats["gauges"].items():
+            lines += [f"# TYPE place_{name} gauge", f"place_{name} {value}"]
+        lines += ["# HELP place_rss_bytes Resident set size of the process.",
+                  "# TYPE place_rss_bytes gauge",
+                  f"place_rss_bytes {stats['rss_bytes']}"]
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsStage():
+    # context manager timing one stage for Metrics.stage()
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.rss = current_rss()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, current_rss() - self.rss)
+        return False
+
+
+def parse_size(value):
+    # number of bytes of a size like "24G", "512M", "300k" or a plain number of bytes
+    value = str(value).strip().upper().rstrip("B")
+    factor = 1
+    for unit, multiple in [("K", 1 << 10), ("M", 1 << 20), ("G", 1 << 30), ("T", 1 << 40)]:
+        if value.endswith(unit):
+            value, factor = value[:-1], multiple
+    return int(float(value) * factor)
+
+
+def physical_memory():
+    # total RAM of the machine in bytes (0 if unknown)
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+
+class MemoryScheduler():
+    # admission control for the worker threads of PlaceData: a job only starts while the RSS of this process plus
+    # the estimated memory of the already running jobs stays under the RAM budget, so the number of concurrent jobs
+    # follows the headroom instead of fixed worker counts
+    # every pool always runs at least one job, so nested pools (a job submitting jobs) can't deadlock
+
+    # bytes per candidate row of a query: positions, the filtered columns and the returned DataFrame
+    row_bytes = 64
+
+    def __init__(self, budget=0):
+        # budget: bytes, 0 for no limit
+        self.budget = budget
+        self.condition = threading.Condition()
+        self.reserved = 0
+        self.running = 0
+        self.max_running = 0
+        self.jobs = 0
+        self.waits = 0
+
+    def pool(self, max_workers=None):
+        # executor whose jobs are admitted by this scheduler, up to max_workers (default: number of CPUs) at once
+        return SchedulerPool(self, max_workers or os.cpu_count() or 1)
+
+    def _fits(self, estimate):
+        # must be called with self.condition held
+        return not self.budget or current_rss() + self.reserved + estimate <= self.budget
+
+    def acquire(self, pool, estimate):
+        # block until the job with the estimated memory may start
+        with self.condition:
+            if pool.running and not self._fits(estimate):
+                self.waits += 1
+                logger.debug(f"Job ({estimate // 2**20}MB) waits for memory, {self.running} jobs running, "
+                             f"{current_rss() // 2**20}MB RSS, {self.reserved // 2**20}MB reserved")
+                while pool.running and not self._fits(estimate):
+                    # RSS can also drop without a job finishing, so check again after a while
+                    self.condition.wait(timeout=0.2)
+            self.reserved += estimate
+            self.running += 1
+            pool.running += 1
+            self.jobs += 1
+            self.max_running = max(self.max_running, self.running)
+
+    def release(self, pool, estimate):
+        with self.condition:
+            self.reserved -= estimate
+            self.running -= 1
+            pool.running -= 1
+            self.condition.notify_all()
+
+    def stats(self):
+        # admission counters since the start
+        with self.condition:
+            return {"budget_bytes": self.budget, "rss_bytes": current_rss(), "reserved_bytes": self.reserved,
+                    "running": self.running, "max_running": self.max_running, "jobs": self.jobs, "waits": self.waits}
+
+
+class SchedulerPool():
+    # thread pool for MemoryScheduler.pool(), submit() takes the estimated memory of the job
+
+    def __init__(self, scheduler, max_workers):
+        self.scheduler = scheduler
+        self.running = 0
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _run(self, estimate, fn, args, kwargs):
+        self.scheduler.acquire(self, estimate)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.scheduler.release(self, estimate)
+
+    def submit(self, fn, *args, estimate=0, **kwargs):
+        return self.executor.submit(self._run, estimate, fn, args, kwargs)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+        return False
 
 
 class Cache():
     # cache results of expensive operations from the PlaceData class
+    # DataFrames are kept as pickled bytes, so loading cache.p doesn't need to import pandas
 
-    def __init__(self, cwd=None):
+    def __init__(self, cwd=None, metrics=None, persist=True):
         if not cwd:
             self.cwd = os.path.dirname(os.path.abspath(__file__))
         else:
             self.cwd = cwd
+        self.metrics = metrics
+        # persist=False keeps changes in memory only, e.g. for worker processes sharing one cache.p
+        self.persist = persist
+        # set() and drop() can be called from several worker threads at once
+        self.lock = threading.RLock()
 
         logger.info("Initialize Cache ...")
         self.datatypes = ["ouid", "uuid", "hash", "first_pixels", "final_pixels"]
@@ -55,13 +373,28 @@ class Cache():
             raise ValueError(f"Invalid datatype {datatype} requested from cache! Valid types: {self.datatypes}")
         if cachename not in self.data:
             logger.debug(f"{cachename} not in cache")
+            self._count(datatype, False)
             return False
         elif datatype not in self.data[cachename]:
             logger.debug(f"{datatype} not in cache for {cachename}")
+            self._count(datatype, False)
             return False
         else:
-            logger.debug(f"Return {datatype} data from {cachename} cache: {self.data[cachename][datatype]}")
-            return self.data[cachename][datatype]
+            data = self.data[cachename][datatype]
+            if isinstance(data, bytes):
+                data = pickle.loads(data)
+            logger.debug(f"Return {datatype} data from {cachename} cache")
+            self._count(datatype, True)
+            return data
+
+    def _dump(self):
+        if self.persist:
+            pickle.dump(self.data, open(os.path.join(self.cwd, "cache.p"), "wb"))
+
+    def _count(self, datatype, hit):
+        # report cache hits and misses to the metrics, if any
+        if self.metrics is not None:
+            self.metrics.cache_access(datatype, hit)
 
     def set(self, cachename=None, datatype=None, data=None):
         if cachename is None or datatype is None or data is None:
@@ -75,14 +408,17 @@ class Cache():
                 raise ValueError(f"{type(data)} is invalid for {datatype} cache - requires int")
         elif datatype == "hash" and not isinstance(data, str):
             raise ValueError(f"{type(data)} is invalid for {datatype} cache - requires str")
-        elif (datatype in ["final_pixels", "first_pixels"]
-                and not (isinstance(data, dd.DataFrame) or isinstance(data, pd.DataFrame))):
-            raise ValueError(f"{type(data)} is invalid for final_pixels cache - requires DataFrame")
-        if cachename not in self.data:
-            self.data[cachename] = {}
-        self.data[cachename][datatype] = data
-        logger.debug(f"Added {datatype} to {cachename} cache: {self.data[cachename][datatype]}")
-        pickle.dump(self.data, open(os.path.join(self.cwd, "cache.p"), "wb"))
+        elif datatype in ["final_pixels", "first_pixels"]:
+            if not (isinstance(data, pd.DataFrame) or isinstance(data, dd.DataFrame)):
+                raise ValueError(f"{type(data)} is invalid for final_pixels cache - requires DataFrame")
+            logger.debug(f"Add {datatype} to {cachename} cache: {data}")
+            data = pickle.dumps(data, protocol=4)
+        with self.lock:
+            if cachename not in self.data:
+                self.data[cachename] = {}
+            self.data[cachename][datatype] = data
+            logger.debug(f"Added {datatype} to {cachename} cache: {self.data[cachename][datatype]}")
+            self._dump()
         return True
 
     def drop(self, cachename=None, datatype=None):
@@ -90,60 +426,1764 @@ class Cache():
             return False
         if datatype is not None and datatype not in self.datatypes:
             raise ValueError(f"Invalid datatype {datatype}! Valid types: {self.datatypes}")
-        if datatype:
-            if cachename in self.data and datatype in self.data[cachename]:
-                del self.data[cachename][datatype]
-                pickle.dump(self.data, open(os.path.join(self.cwd, "cache.p"), "wb"))
-                return True
+        with self.lock:
+            if datatype:
+                if cachename in self.data and datatype in self.data[cachename]:
+                    del self.data[cachename][datatype]
+                    self._dump()
+                    return True
+                else:
+                    return False
             else:
-                return False
+                if cachename in self.data:
+                    del self.data[cachename]
+                    self._dump()
+                    return True
+                else:
+                    return False
+
+
+def ranges_to_positions(starts, ends):
+    # concatenate the integer ranges [starts[i], ends[i]) into one array without a python loop
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(ends, dtype=np.int64) - starts
+    keep = lengths > 0
+    starts = starts[keep]
+    lengths = lengths[keep]
+    if len(lengths) == 0:
+        return np.empty(0, dtype=np.int64)
+    shift = starts - (np.cumsum(lengths) - lengths)
+    return np.repeat(shift, lengths) + np.arange(lengths.sum())
+
+
+class TileIndex():
+    # spatial index of the official data: rows are ordered by tiles of tilesize x tilesize pixels, by pixel within
+    # each tile and by timestamp per pixel, so the rows of every tile, every pixel and every line of pixels within a
+    # tile are one contiguous range of self.order, found via self.offsets
+
+    def __init__(self, x, y, ts, tilesize=32, fingerprint=None):
+        self.tilesize = tilesize
+        self.tiles_per_row = -(-canvas_size // tilesize)
+        self.nslots = self.tiles_per_row ** 2 * tilesize ** 2
+        self.fingerprint = fingerprint
+
+        slot = self.slot(np.asarray(x), np.asarray(y))
+        # sort by one combined key instead of lexsort, timestamps are < 2^32 ms after start
+        key = (slot << 32) | np.asarray(ts, dtype=np.int64)
+        order = np.argsort(key, kind="stable")
+        del key
+        self.order = order.astype(np.int32) if len(order) < 2**31 else order
+        del order
+        counts = np.bincount(slot, minlength=self.nslots)
+        self.offsets = np.zeros(self.nslots + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+
+    def slot(self, x, y):
+        # position of pixel(s) x, y in the tile-ordered pixel space
+        x = np.asarray(x, dtype=np.int64)
+        y = np.asarray(y, dtype=np.int64)
+        tile = (y // self.tilesize) * self.tiles_per_row + x // self.tilesize
+        return tile * self.tilesize ** 2 + (y % self.tilesize) * self.tilesize + x % self.tilesize
+
+    def pixel_positions(self, x, y):
+        # row positions of all edits of pixel x, y in timestamp order
+        if not (0 <= x < canvas_size and 0 <= y < canvas_size):
+            return np.empty(0, dtype=np.int64)
+        slot = int(self.slot(x, y))
+        return self.order[self.offsets[slot]:self.offsets[slot + 1]]
+
+    def rectangle_ranges(self, xa, ya, xb, yb, skip=None):
+        # start and end offsets into self.order for all rows within the rectangle: one range per covered line of
+        # pixels in every covered tile, so no row outside of the rectangle is touched
+        # skip: optional boolean array [tile_y, tile_x] of tiles to leave out
+        xa, ya = max(int(xa), 0), max(int(ya), 0)
+        xb, yb = min(int(xb), canvas_size - 1), min(int(yb), canvas_size - 1)
+        if xa > xb or ya > yb:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        t = self.tilesize
+        tx = np.arange(xa // t, xb // t + 1, dtype=np.int64)
+        lx0 = np.maximum(xa, tx * t)
+        lx1 = np.minimum(xb, tx * t + t - 1)
+        lines = np.arange(ya, yb + 1, dtype=np.int64)
+        first = self.slot(lx0[None, :], lines[:, None]).ravel()
+        last = self.slot(lx1[None, :], lines[:, None]).ravel()
+        if skip is not None:
+            keep = ~skip[(lines // t)[:, None], tx[None, :]].ravel()
+            first = first[keep]
+            last = last[keep]
+        return self.offsets[first], self.offsets[last + 1]
+
+    def rectangle_positions(self, xa, ya, xb, yb):
+        # row positions of all rows within the rectangle (grouped by pixel, not in original order)
+        return self.order[ranges_to_positions(*self.rectangle_ranges(xa, ya, xb, yb))]
+
+    def tile_counts(self):
+        # number of rows per tile as 2D array [tile_y, tile_x]
+        per_tile = np.diff(self.offsets[::self.tilesize ** 2])
+        return per_tile.reshape(self.tiles_per_row, self.tiles_per_row)
+
+    def inserted(self, at, slots, positions):
+        # new index with the rows at positions (in the pixel slots slots, sorted by slot and timestamp) inserted into
+        # the order before the entries at, in one pass instead of a new sort, see PlaceData.compact_live()
+        index = TileIndex.__new__(TileIndex)
+        index.__dict__.update(self.__dict__)
+        order = self.order if len(self.order) + len(positions) < 2**31 else self.order.astype(np.int64)
+        index.order = np.insert(order, at, positions)
+        index.offsets = self.offsets.copy()
+        index.offsets[1:] += np.cumsum(np.bincount(slots, minlength=self.nslots))
+        return index
+
+
+def hash64(values):
+    # splitmix64 finalizer: well mixed 64 bit hashes of integer values
+    z = np.asarray(values).astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+class UserIndex():
+    # official row positions ordered by user id, the rows of user u are order[offsets[u]:offsets[u + 1]] (in their
+    # original order)
+
+    def __init__(self, user_id, fingerprint=None):
+        self.fingerprint = fingerprint
+        user_id = np.asarray(user_id)
+        nusers = int(user_id.max()) + 1 if len(user_id) else 0
+        order = np.argsort(user_id, kind="stable")
+        self.order = order.astype(np.int32) if len(order) < 2**31 else order
+        del order
+        self.offsets = np.zeros(nusers + 1, dtype=np.int64)
+        np.cumsum(np.bincount(user_id, minlength=nusers), out=self.offsets[1:])
+
+    def _ranges(self, users):
+        users = np.asarray(users, dtype=np.int64)
+        users = users[(users >= 0) & (users < len(self.offsets) - 1)]
+        return self.offsets[users], self.offsets[users + 1]
+
+    def count(self, users):
+        # number of rows of the given user ids
+        starts, ends = self._ranges(users)
+        return int((ends - starts).sum())
+
+    def positions(self, users):
+        # row positions of all rows of the given user ids
+        return self.order[ranges_to_positions(*self._ranges(users))]
+
+    def appended(self, user_id, first):
+        # new index with the rows first, first + 1, ... of the given user ids added after the rows of their users, in
+        # one pass instead of a new sort, see PlaceData.compact_live()
+        user_id = np.asarray(user_id, dtype=np.int64)
+        nusers = max(len(self.offsets) - 1, int(user_id.max()) + 1)
+        offsets = np.concatenate([self.offsets, np.full(nusers + 1 - len(self.offsets), self.offsets[-1])])
+        order = np.argsort(user_id, kind="stable")
+        index = UserIndex.__new__(UserIndex)
+        index.fingerprint = self.fingerprint
+        merged = self.order if len(self.order) + len(order) < 2**31 else self.order.astype(np.int64)
+        index.order = np.insert(merged, offsets[user_id[order] + 1], first + order)
+        index.offsets = offsets
+        index.offsets[1:] += np.cumsum(np.bincount(user_id, minlength=nusers))
+        return index
+
+
+class Query():
+    # structured query on the official data, rows have to match all given conditions:
+    # x, y: pixel_x / pixel_y as single value or inclusive (low, high) range, ts_from <= timestamp < ts_to,
+    # users: user id(s), colors: color index(es), pixels: list of (x, y) tuples
+    # PlaceData.query() plans how to find the matching rows, PlaceData.explain() shows the plan
+
+    def __init__(self, x=None, y=None, ts_from=None, ts_to=None, users=None, colors=None, pixels=None):
+        self.x = self._range(x)
+        self.y = self._range(y)
+        self.ts_from = None if ts_from is None else int(ts_from)
+        self.ts_to = None if ts_to is None else int(ts_to)
+        self.users = None if users is None else np.unique(np.asarray(users, dtype=np.int64).ravel())
+        self.colors = None if colors is None else np.unique(np.asarray(colors, dtype=np.int64).ravel())
+        self.pixels = None if pixels is None else list(dict.fromkeys((int(px), int(py)) for px, py in pixels))
+
+    def pixel_list(self):
+        # the pixels the query is restricted to: the given pixels, or the one pixel of single x and y values
+        if self.pixels is None and self.x and self.y and self.x[0] == self.x[1] and self.y[0] == self.y[1]:
+            return [(self.x[0], self.y[0])]
+        return self.pixels
+
+    @staticmethod
+    def _range(value):
+        if value is None:
+            return None
+        if isinstance(value, tuple):
+            return int(value[0]), int(value[1])
+        return int(value), int(value)
+
+    def mask(self, column, rows):
+        # boolean mask of the rows matching all conditions, column(name) returns the values of one column of the rows
+        # as int64 array
+        keep = np.ones(rows, dtype=bool)
+        for name, bounds in [("pixel_x", self.x), ("pixel_y", self.y)]:
+            if bounds:
+                keep &= (column(name) >= bounds[0]) & (column(name) <= bounds[1])
+        if self.ts_from is not None:
+            keep &= column("timestamp") >= self.ts_from
+        if self.ts_to is not None:
+            keep &= column("timestamp") < self.ts_to
+        if self.users is not None:
+            keep &= np.isin(column("user_id"), self.users)
+        if self.colors is not None:
+            keep &= np.isin(column("pixel_color"), self.colors)
+        if self.pixels is not None:
+            keys = np.array([px << 16 | py for px, py in self.pixels], dtype=np.int64)
+            keep &= np.isin(column("pixel_x") << 16 | column("pixel_y"), keys)
+        return keep
+
+    def conditions(self):
+        # human readable list of the conditions
+        conditions = []
+        for name, bounds in [("pixel_x", self.x), ("pixel_y", self.y)]:
+            if bounds and bounds[0] == bounds[1]:
+                conditions.append(f"{name} == {bounds[0]}")
+            elif bounds:
+                conditions.append(f"{bounds[0]} <= {name} <= {bounds[1]}")
+        if self.ts_from is not None:
+            conditions.append(f"timestamp >= {self.ts_from}")
+        if self.ts_to is not None:
+            conditions.append(f"timestamp < {self.ts_to}")
+        for name, values in [("user_id", self.users), ("pixel_color", self.colors)]:
+            if values is not None:
+                conditions.append(f"{name} in {values.tolist()}")
+        if self.pixels is not None:
+            conditions.append(f"(pixel_x, pixel_y) in {self.pixels}")
+        return conditions
+
+    def __repr__(self):
+        return f"Query({', '.join(self.conditions())})"
+
+
+class UserSketches():
+    # approximate distinct user counts per tile: a HyperLogLog sketch of 2^precision one byte registers for every
+    # tile with many users, the exact sorted user ids for tiles with few users (up to 2^precision / 4, so an exact
+    # tile never needs more memory than a sketch). Sketches of several tiles merge by taking the register maximum.
+
+    def __init__(self, x, y, user_id, tilesize=32, error=0.02, fingerprint=None):
+        self.tilesize = tilesize
+        self.tiles_per_row = -(-canvas_size // tilesize)
+        self.ntiles = self.tiles_per_row ** 2
+        self.error = error
+        self.precision = self.precision_for(error)
+        self.m = 1 << self.precision
+        self.exact_limit = self.m // 4
+        self.fingerprint = fingerprint
+
+        # distinct (tile, user) pairs, sorted by tile
+        tile = (np.asarray(y, dtype=np.int64) // tilesize) * self.tiles_per_row + np.asarray(x) // tilesize
+        pairs = np.unique((tile << 32) | np.asarray(user_id, dtype=np.int64))
+        tile = pairs >> 32
+        users = (pairs & 0xFFFFFFFF).astype(np.int64)
+        del pairs
+        self.distinct = np.bincount(tile, minlength=self.ntiles)
+
+        exact = self.distinct[tile] <= self.exact_limit
+        self.exact_offsets = np.zeros(self.ntiles + 1, dtype=np.int64)
+        np.cumsum(np.where(self.distinct <= self.exact_limit, self.distinct, 0), out=self.exact_offsets[1:])
+        self.exact_users = users[exact].astype(np.int32)
+
+        # tile -> row in self.registers, -1 for exact tiles
+        large = np.flatnonzero(self.distinct > self.exact_limit)
+        self.sketch_row = np.full(self.ntiles, -1, dtype=np.int64)
+        self.sketch_row[large] = np.arange(len(large))
+        self.registers = np.zeros((len(large), self.m), dtype=np.uint8)
+        register, rank = self.register_ranks(users[~exact])
+        np.maximum.at(self.registers.ravel(), self.sketch_row[tile[~exact]] * self.m + register, rank)
+
+    @staticmethod
+    def precision_for(error):
+        # HyperLogLog standard error is 1.04 / sqrt(2^precision)
+        return int(min(max(np.ceil(np.log2((1.04 / error) ** 2)), 4), 18))
+
+    def register_ranks(self, users):
+        # register index (first precision bits of the hash) and rank (position of the first 1 bit in the rest)
+        h = hash64(users)
+        register = (h >> np.uint64(64 - self.precision)).astype(np.int64)
+        rest = h & np.uint64((1 << (64 - self.precision)) - 1)
+        bits = np.zeros(len(rest), dtype=np.int64)
+        for shift in [32, 16, 8, 4, 2, 1]:
+            high = rest >= np.uint64(1 << shift)
+            bits[high] += shift
+            rest = np.where(high, rest >> np.uint64(shift), rest)
+        bits += rest > 0
+        return register, (64 - self.precision - bits + 1).astype(np.uint8)
+
+    def estimate(self, registers):
+        # HyperLogLog estimate with linear counting for small cardinalities
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m ** 2 / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(registers == 0))
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * np.log(self.m / zeros)
+        return int(round(estimate))
+
+    def count(self, tiles, extra_users=None):
+        # distinct users over the given tile ids plus the given user ids (e.g. from partially covered tiles),
+        # exact as long as no sketched tile is involved
+        tiles = np.asarray(tiles, dtype=np.int64)
+        rows = self.sketch_row[tiles]
+        exact_tiles = tiles[rows < 0]
+        users = [self.exact_users[ranges_to_positions(self.exact_offsets[exact_tiles],
+                                                      self.exact_offsets[exact_tiles + 1])]]
+        if extra_users is not None:
+            users.append(np.asarray(extra_users))
+        users = np.unique(np.concatenate(users))
+        rows = rows[rows >= 0]
+        if len(rows) == 0:
+            return len(users)
+        merged = self.registers[rows].max(axis=0)
+        register, rank = self.register_ranks(users)
+        np.maximum.at(merged, register, rank)
+        return self.estimate(merged)
+
+    def memory_usage(self):
+        # bytes used by registers and exact user lists
+        return self.registers.nbytes + self.exact_users.nbytes + self.exact_offsets.nbytes + self.sketch_row.nbytes
+
+
+class UserAggregates():
+    # one row per official user id with pixel count, first/last timestamp, whiteout-phase pixel count (white pixels
+    # during the whiteout), number of pixels the user edited first, number of pixels the user owned right before the
+    # whiteout, plus a histogram of the 32 palette colors in self.colors (one row per user id)
+
+    columns = ["pixel_count", "first_timestamp", "last_timestamp", "whiteout_count", "first_pixel_count",
+               "surviving_pixel_count"]
+
+    def __init__(self, user_id, ts, color, tile_index, fingerprint=None):
+        self.fingerprint = fingerprint
+        user_id = np.asarray(user_id, dtype=np.int64)
+        ts = np.asarray(ts)
+        color = np.asarray(color, dtype=np.int64)
+        nusers = int(user_id.max()) + 1 if len(user_id) else 0
+
+        first_ts = np.full(nusers, -1, dtype=np.int64)
+        last_ts = np.full(nusers, -1, dtype=np.int64)
+        span = pd.Series(ts).groupby(user_id).agg(["min", "max"])
+        first_ts[span.index.values] = span["min"].values
+        last_ts[span.index.values] = span["max"].values
+        del span
+        during = ts >= whiteout_short
+        whiteout_count = np.bincount(user_id[during & (color == 7)], minlength=nusers)
+        self.colors = np.minimum(np.bincount(user_id * 32 + color, minlength=nusers * 32),
+                                 np.iinfo(np.uint16).max).astype(np.uint16).reshape(nusers, 32)
+
+        # per pixel the first edit and the last edit before the whiteout, rows are ordered by timestamp per pixel
+        starts = tile_index.offsets[:-1]
+        edited = np.flatnonzero(np.diff(tile_index.offsets) > 0)
+        first_pixel_count = np.bincount(user_id[tile_index.order[starts[edited]]], minlength=nusers)
+        sorted_pre = (~during[tile_index.order]).astype(np.int32)
+        pre_count = np.add.reduceat(sorted_pre, starts[edited]) if len(edited) else np.empty(0, dtype=np.int32)
+        del sorted_pre
+        survived = edited[pre_count > 0]
+        last_pre = tile_index.order[starts[survived] + pre_count[pre_count > 0] - 1]
+        surviving_pixel_count = np.bincount(user_id[last_pre], minlength=nusers)
+
+        pixel_count = np.bincount(user_id, minlength=nusers)
+        self.table = pd.DataFrame({"pixel_count": pixel_count.astype(np.int32),
+                                   "first_timestamp": first_ts.astype(np.int32),
+                                   "last_timestamp": last_ts.astype(np.int32),
+                                   "whiteout_count": whiteout_count.astype(np.int32),
+                                   "first_pixel_count": first_pixel_count.astype(np.int32),
+                                   "surviving_pixel_count": surviving_pixel_count.astype(np.int32)})
+        self.table.index.name = "user_id"
+
+    def top(self, column="pixel_count", k=10):
+        # top k users by one of the columns or by a palette color index (number of pixels in that color)
+        if isinstance(column, int):
+            values = self.colors[:, column]
+        elif column in self.columns:
+            values = self.table[column].values
         else:
-            if cachename in self.data:
-                del self.data[cachename]
-                pickle.dump(self.data, open(os.path.join(self.cwd, "cache.p"), "wb"))
-                return True
+            raise ValueError(f"Invalid leaderboard column {column}! Valid: {self.columns} or a color index 0-31")
+        k = min(k, len(values))
+        if k <= 0:
+            return self.table.iloc[0:0]
+        best = np.argpartition(values, len(values) - k)[len(values) - k:]
+        best = best[np.lexsort((best, -values[best].astype(np.int64)))]
+        return self.table.iloc[best]
+
+
+class UserRegularity():
+    # inter-placement interval statistics of every official user id, to spot bots: a table (one row per user id)
+    # with the number of edits, median interval (seconds), coefficient of variation of the intervals, share of
+    # intervals hitting the cooldown exactly (within the tolerance), distinct hours of the event with edits and the
+    # longest session (hours of edits at most gap apart), plus a histogram of the intervals in self.histogram
+    # (one row per user id, bins in self.bins)
+    # score: 0-1, half the cooldown share, a quarter each the regularity of the intervals (1 - cv) and the longest
+    # session relative to a day; flags: bit mask of the flag_names, only for users with at least min_edits edits
+
+    columns = ["edits", "median_interval", "interval_cv", "cooldown_share", "active_hours", "longest_session", "score",
+               "flags"]
+    flag_names = ["cooldown", "regular", "sleepless"]
+    # cooldown share, coefficient of variation and longest session (hours) thresholds of the flags
+    cooldown_share = 0.5
+    regular_cv = 0.1
+    sleepless_hours = 18
+
+    def __init__(self, parts, nusers, cooldown=300000, tolerance=1000, gap=1800000, min_edits=20, fingerprint=None):
+        # parts: (first user id, table, histogram) of consecutive user id ranges, see measure()
+        self.fingerprint = fingerprint
+        self.cooldown = cooldown
+        self.tolerance = tolerance
+        self.gap = gap
+        self.min_edits = min_edits
+        self.bins = self.interval_bins(cooldown, tolerance)
+        parts = sorted(parts, key=lambda part: part[0])
+        self.table = pd.concat([table for first, table, histogram in parts], ignore_index=True) if parts else \
+            pd.DataFrame({column: [] for column in self.columns[:-2]})
+        self.histogram = np.concatenate([histogram for first, table, histogram in parts]) if parts else \
+            np.zeros((0, len(self.bins)), dtype=np.uint16)
+        self.table = self.table.iloc[:nusers]
+        self.histogram = self.histogram[:nusers]
+
+        cv = self.table.interval_cv.fillna(1).clip(upper=1).values
+        session = self.table.longest_session.values
+        score = 0.5 * self.table.cooldown_share.values + 0.25 * (1 - cv) + 0.25 * np.minimum(session / 24, 1)
+        self.table["score"] = np.where(self.table.edits.values > 1, score, 0).astype(np.float32)
+        flags = (self.table.cooldown_share.values >= self.cooldown_share).astype(np.uint8) | \
+                (self.table.interval_cv.fillna(1).values <= self.regular_cv).astype(np.uint8) << 1 | \
+                (session >= self.sleepless_hours).astype(np.uint8) << 2
+        self.table["flags"] = np.where(self.table.edits.values >= min_edits, flags, 0).astype(np.uint8)
+        self.table.index.name = "user_id"
+
+    @staticmethod
+    def interval_bins(cooldown, tolerance):
+        # lower edges of the interval histogram bins in ms: below a minute, below the cooldown, at the cooldown,
+        # up to twice the cooldown, an hour, six hours and beyond
+        return np.array([0, 60000, cooldown - tolerance, cooldown + tolerance, 2 * cooldown, 3600000, 21600000],
+                        dtype=np.int64)
+
+    @staticmethod
+    def measure(counts, ts, cooldown=300000, tolerance=1000, gap=1800000):
+        # statistics of consecutive user ids in one vectorized pass: counts are the number of edits per user id, ts
+        # the timestamps of their edits grouped by user id in that order (within a user in any order)
+        # returns the table (without score and flags) and the interval histogram
+        nusers = len(counts)
+        owner = np.repeat(np.arange(nusers, dtype=np.int64), counts)
+        key = owner << 32 | np.asarray(ts, dtype=np.int64)
+        if len(key) > 1 and not (key[1:] >= key[:-1]).all():
+            key.sort()
+        ts = key & 0xFFFFFFFF
+        del key
+        bins = UserRegularity.interval_bins(cooldown, tolerance)
+
+        same = owner[1:] == owner[:-1]
+        intervals = np.diff(ts)[same]
+        interval_owner = owner[1:][same]
+        n = np.bincount(interval_owner, minlength=nusers)
+        # the bin of cooldown-exact intervals is cooldown - tolerance <= interval < cooldown + tolerance
+        histogram = np.bincount(interval_owner * len(bins) + np.searchsorted(bins, intervals, side="right") - 1,
+                                minlength=nusers * len(bins)).reshape(nusers, len(bins))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.bincount(interval_owner, weights=intervals, minlength=nusers) / n
+            variance = np.bincount(interval_owner, weights=intervals.astype(np.float64) ** 2, minlength=nusers) / n - \
+                mean ** 2
+            cv = np.sqrt(np.maximum(variance, 0)) / mean
+            exact = histogram[:, 2] / n
+        histogram = np.minimum(histogram, np.iinfo(np.uint16).max).astype(np.uint16)
+
+        # medians: the middle of each user's sorted intervals
+        ordered = np.sort(interval_owner << 32 | intervals) & 0xFFFFFFFF
+        first = np.cumsum(n) - n
+        has = n > 0
+        median = np.full(nusers, np.nan)
+        median[has] = (ordered[first[has] + (n[has] - 1) // 2] + ordered[first[has] + n[has] // 2]) / 2000
+        del ordered
+
+        # distinct hours and sessions: a new one starts with the first edit of a user, or after an hour change / gap
+        new_user = np.ones(len(ts), dtype=bool)
+        new_user[1:] = ~same
+        hour = ts // 3600000
+        new_hour = new_user.copy()
+        new_hour[1:] |= hour[1:] != hour[:-1]
+        active_hours = np.bincount(owner[new_hour], minlength=nusers)
+        new_session = new_user.copy()
+        new_session[1:] |= np.diff(ts) > gap
+        session_start = np.flatnonzero(new_session)
+        session_end = np.append(session_start[1:], len(ts)) - 1
+        duration = ts[session_end] - ts[session_start]
+        session_owner = owner[session_start]
+        longest = np.zeros(nusers, dtype=np.int64)
+        if len(session_start):
+            user_first = np.flatnonzero(np.r_[True, session_owner[1:] != session_owner[:-1]])
+            longest[session_owner[user_first]] = np.maximum.reduceat(duration, user_first)
+
+        table = pd.DataFrame({"edits": np.asarray(counts, dtype=np.int32),
+                              "median_interval": median.astype(np.float32),
+                              "interval_cv": cv.astype(np.float32),
+                              "cooldown_share": np.nan_to_num(exact).astype(np.float32),
+                              "active_hours": active_hours.astype(np.int16),
+                              "longest_session": (longest / 3600000).astype(np.float32)})
+        return table, histogram
+
+    def flag_list(self, flags):
+        # names of the flags set in a bit mask
+        return [name for bit, name in enumerate(self.flag_names) if int(flags) >> bit & 1]
+
+    def top(self, k=None, min_score=0.0, flagged=True):
+        # users by descending score, only flagged ones or all with at least min_score
+        table = self.table[self.table.score.values >= min_score]
+        if flagged:
+            table = table[table["flags"].values > 0]
+        table = table.sort_values(by=["score", "edits"], ascending=False, kind="stable")
+        return table if k is None else table.head(k)
+
+
+class EditLinks():
+    # previous and next edit of the same pixel for every official row (row positions, -1 if there is none),
+    # computed with one shift over the rows ordered by pixel and timestamp
+
+    def __init__(self, tile_index, fingerprint=None):
+        self.fingerprint = fingerprint
+        order = tile_index.order
+        n = len(order)
+        dtype = np.int32 if n < 2**31 else np.int64
+        # a sorted row starts a new pixel if it's the first row of its slot
+        new_pixel = np.zeros(n + 1, dtype=bool)
+        new_pixel[tile_index.offsets] = True
+        self.next_edit = np.full(n, -1, dtype=dtype)
+        self.prev_edit = np.full(n, -1, dtype=dtype)
+        if n:
+            self.next_edit[order[:-1]] = np.where(new_pixel[1:n], -1, order[1:])
+            self.prev_edit[order[1:]] = np.where(new_pixel[1:n], -1, order[:-1])
+
+
+class PixelHistory():
+    # timestamps of the official rows in the order of the tile index (by pixel, then by time), so the edits of a pixel
+    # up to any point in time are found by a binary search within the range of the pixel
+
+    def __init__(self, tile_index, ts, fingerprint=None):
+        self.tilesize = tile_index.tilesize
+        self.fingerprint = fingerprint
+        self.timestamps = np.asarray(ts)[tile_index.order]
+
+    def search(self, tile_index, slots, ts):
+        # position in the order of the tile index of the first edit after ts[i] (ms after start) of every pixel slot,
+        # i.e. one past its last edit at or before ts[i]
+        # all searches bisect the ranges of their pixels in lockstep, those that are done drop out
+        lo = tile_index.offsets[slots]
+        hi = tile_index.offsets[slots + 1]
+        ts = np.broadcast_to(np.asarray(ts, dtype=np.int64), lo.shape)
+        active = np.flatnonzero(lo < hi)
+        while len(active):
+            low, high = lo[active], hi[active]
+            mid = (low + high) >> 1
+            after = self.timestamps[mid] > ts[active]
+            lo[active] = np.where(after, low, mid + 1)
+            hi[active] = np.where(after, mid, high)
+            active = active[lo[active] < hi[active]]
+        return lo
+
+    def inserted(self, at, ts):
+        # new histories with the timestamps ts inserted before the entries at, see TileIndex.inserted()
+        history = PixelHistory.__new__(PixelHistory)
+        history.__dict__.update(self.__dict__)
+        ts = np.asarray(ts)
+        history.timestamps = np.insert(self.timestamps.astype(LiveSegment.fitting_dtype(self.timestamps.dtype, ts),
+                                                              copy=False), at, ts)
+        return history
+
+
+class EditSurvival():
+    # survival time in ms of every official row: time until the pixel was edited next, capped at the start of the
+    # whiteout for edits placed before it; edits placed during the whiteout that were never overwritten are -1
+
+    # default histogram bins in ms: 1 minute, 10 minutes, 1 hour, 6 hours, 1 day and everything longer
+    bins = [0, 60000, 600000, 3600000, 21600000, 86400000]
+
+    def __init__(self, ts, next_edit, fingerprint=None):
+        self.fingerprint = fingerprint
+        ts = np.asarray(ts, dtype=np.int64)
+        overwritten = next_edit >= 0
+        until = np.full(len(ts), whiteout_short, dtype=np.int64)
+        until[overwritten] = ts[next_edit[overwritten]]
+        before = ts < whiteout_short
+        until[before] = np.minimum(until[before], whiteout_short)
+        self.survival = (until - ts).astype(np.int32)
+        self.survival[~before & ~overwritten] = -1
+
+    def histogram(self, positions=None, bins=None):
+        # number of edits per survival bin (left-inclusive, the last bin is open), edits without survival time skipped
+        bins = np.asarray(bins if bins is not None else self.bins, dtype=np.int64)
+        values = self.survival if positions is None else self.survival[positions]
+        values = values[(values >= 0) & (values >= bins[0])]
+        counts = np.bincount(np.searchsorted(bins, values, side="right") - 1, minlength=len(bins))
+        return pd.Series(counts, index=bins, name="edits")
+
+
+class PixelHeat():
+    # per-pixel edit counts of the official data over the whole canvas, kept as summed-area tables so the number
+    # of edits within any rectangle is answered with four lookups
+    kinds = ["all", "pre_whiteout", "whiteout"]
+
+    def __init__(self, x, y, ts, fingerprint=None):
+        self.fingerprint = fingerprint
+        x = np.asarray(x, dtype=np.int64)
+        y = np.asarray(y, dtype=np.int64)
+        ts = np.asarray(ts)
+        pixel = y * canvas_size + x
+        during = ts >= whiteout_short
+        dtype = np.int32 if len(pixel) < 2**31 else np.int64
+        self.tables = {}
+        for kind, mask in [("all", None), ("pre_whiteout", ~during), ("whiteout", during)]:
+            counts = np.bincount(pixel if mask is None else pixel[mask], minlength=canvas_size ** 2)
+            table = np.zeros((canvas_size + 1, canvas_size + 1), dtype=dtype)
+            table[1:, 1:] = counts.reshape(canvas_size, canvas_size).cumsum(axis=0).cumsum(axis=1)
+            self.tables[kind] = table
+
+    def count(self, xa, ya, xb, yb, kind="all"):
+        # number of edits within the rectangle (inclusive coordinates, clipped to the canvas)
+        table = self.tables[kind]
+        xa, ya = max(int(xa), 0), max(int(ya), 0)
+        xb, yb = min(int(xb), canvas_size - 1) + 1, min(int(yb), canvas_size - 1) + 1
+        if xa >= xb or ya >= yb:
+            return 0
+        return int(table[yb, xb]) - int(table[ya, xb]) - int(table[yb, xa]) + int(table[ya, xa])
+
+    def counts(self, kind="all"):
+        # per-pixel edit counts as 2D array [y, x]
+        return np.diff(np.diff(self.tables[kind], axis=0), axis=1)
+
+
+class ActivityCube():
+    # edit counts of the official data by time bucket, palette color and tile, stored sparse: one entry per non-empty
+    # (color, tile, bucket) cell, sorted by the cell key (color * tiles + tile) * buckets + bucket, with the running
+    # total of the counts in this order. The edits of one (color, tile) row within a time window are the difference
+    # of two running totals found by binary search, so any time window, color set and tile rectangle is answered by
+    # two searchsorted calls over the selected rows (~8 bytes per non-empty cell)
+
+    def __init__(self, x, y, color, ts, tilesize=100, bucket_minutes=1, fingerprint=None):
+        self.fingerprint = fingerprint
+        self.tilesize = tilesize
+        self.bucket_ms = bucket_minutes * 60000
+        self.tiles_per_row = -(-canvas_size // tilesize)
+        self.colors = len(palette_names)
+        ts = np.asarray(ts)
+        self.buckets = int(ts.max()) // self.bucket_ms + 1 if len(ts) else 1
+        cells = self.colors * self.tiles_per_row ** 2 * self.buckets
+        key = np.asarray(color).astype(np.int64) * self.tiles_per_row ** 2
+        key += (np.asarray(y) // tilesize).astype(np.int64) * self.tiles_per_row
+        key += np.asarray(x) // tilesize
+        key *= self.buckets
+        key += ts // self.bucket_ms
+        keys, counts = np.unique(key, return_counts=True)
+        del key
+        self.keys = keys.astype(np.uint32 if cells < 2**32 else np.int64)
+        del keys
+        self.totals = np.zeros(len(counts) + 1, dtype=np.uint32 if len(ts) < 2**32 else np.int64)
+        np.cumsum(counts, out=self.totals[1:])
+
+    def tiles(self, xa=0, ya=0, xb=canvas_size - 1, yb=canvas_size - 1):
+        # ids of the tiles touching the rectangle (inclusive pixel coordinates, clipped to the canvas)
+        xa, ya = max(int(xa), 0), max(int(ya), 0)
+        xb, yb = min(int(xb), canvas_size - 1), min(int(yb), canvas_size - 1)
+        if xa > xb or ya > yb:
+            return np.empty(0, dtype=np.int64)
+        t = self.tilesize
+        columns = np.arange(xa // t, xb // t + 1)
+        rows = np.arange(ya // t, yb // t + 1)
+        return (rows[:, None] * self.tiles_per_row + columns[None, :]).ravel()
+
+    def window(self, ts_from=None, ts_to=None):
+        # first and end bucket of the time window ts_from <= timestamp < ts_to, rounded outwards to whole buckets
+        first = 0 if ts_from is None else min(max(int(ts_from) // self.bucket_ms, 0), self.buckets)
+        end = self.buckets if ts_to is None else min(max(-(-int(ts_to) // self.bucket_ms), 0), self.buckets)
+        return first, max(first, end)
+
+    def _ranges(self, tiles, colors, first, end):
+        # entry ranges of the selected (color, tile) rows within the buckets [first, end)
+        colors = np.arange(self.colors) if colors is None else np.asarray(colors, dtype=np.int64)
+        rows = (colors[:, None] * self.tiles_per_row ** 2 + np.asarray(tiles, dtype=np.int64)[None, :]).ravel()
+        rows = rows * self.buckets
+        starts = np.searchsorted(self.keys, (rows + first).astype(self.keys.dtype))
+        ends = np.searchsorted(self.keys, (rows + end).astype(self.keys.dtype))
+        return starts, ends
+
+    def count(self, tiles, colors=None, ts_from=None, ts_to=None):
+        # number of edits in the given tiles with the given colors (default: all) within the time window
+        first, end = self.window(ts_from, ts_to)
+        starts, ends = self._ranges(tiles, colors, first, end)
+        return int((self.totals[ends].astype(np.int64) - self.totals[starts]).sum())
+
+    def curve(self, tiles, colors=None, ts_from=None, ts_to=None):
+        # number of edits per bucket in the given tiles with the given colors within the time window
+        # returns first bucket and array of counts
+        first, end = self.window(ts_from, ts_to)
+        starts, ends = self._ranges(tiles, colors, first, end)
+        positions = ranges_to_positions(starts, ends)
+        counts = self.totals[positions + 1].astype(np.int64) - self.totals[positions]
+        buckets = (self.keys[positions] % self.buckets).astype(np.int64) - first
+        return first, np.bincount(buckets, weights=counts, minlength=end - first).astype(np.int64)
+
+
+class SpaceTimeGrid():
+    # official row positions grouped by space-time cell (cellsize x cellsize pixels, time buckets of seconds): the
+    # rows of a cell are order[start:end], with start and end found by binary search in the sorted cell keys, so only
+    # non-empty cells cost memory (~8 bytes per row)
+
+    def __init__(self, x, y, ts, cellsize=16, seconds=60, fingerprint=None):
+        self.fingerprint = fingerprint
+        self.cellsize = cellsize
+        self.bucket_ms = seconds * 1000
+        self.cells_per_row = -(-canvas_size // cellsize)
+        ts = np.asarray(ts)
+        self.buckets = int(ts.max()) // self.bucket_ms + 1 if len(ts) else 1
+        key = (np.asarray(y) // cellsize).astype(np.int64) * self.cells_per_row + np.asarray(x) // cellsize
+        key *= self.buckets
+        key += ts // self.bucket_ms
+        order = np.argsort(key, kind="stable")
+        cells = self.cells_per_row ** 2 * self.buckets
+        self.keys = key[order].astype(np.uint32 if cells < 2**32 else np.int64)
+        del key
+        self.order = order.astype(np.int32) if len(order) < 2**31 else order
+
+    def neighbor_ranges(self, x, y, ts, radius, window_ms):
+        # entry ranges of the cells which can hold rows within radius pixels and window_ms of the given points
+        # returns the index of the point per range, starts and ends
+        x, y, ts = (np.asarray(v, dtype=np.int64) for v in (x, y, ts))
+        dimensions = [(x, radius, self.cellsize, self.cells_per_row), (y, radius, self.cellsize, self.cells_per_row),
+                      (ts, window_ms, self.bucket_ms, self.buckets)]
+        low = [np.clip((v - distance) // size, 0, limit - 1) for v, distance, size, limit in dimensions]
+        high = [np.clip((v + distance) // size, 0, limit - 1) for v, distance, size, limit in dimensions]
+        # same number of candidate cells for every point, the ones beyond a point's upper bound are dropped
+        spans = [int((h - l).max()) + 1 if len(l) else 0 for l, h in zip(low, high)]
+        points = np.arange(len(x))[:, None, None, None]
+        cx = low[0][:, None, None, None] + np.arange(spans[0])[None, :, None, None]
+        cy = low[1][:, None, None, None] + np.arange(spans[1])[None, None, :, None]
+        cb = low[2][:, None, None, None] + np.arange(spans[2])[None, None, None, :]
+        valid = (cx <= high[0][:, None, None, None]) & (cy <= high[1][:, None, None, None]) & \
+                (cb <= high[2][:, None, None, None])
+        keys = ((cy * self.cells_per_row + cx) * self.buckets + cb)[valid]
+        points = np.broadcast_to(points, valid.shape)[valid]
+        starts = np.searchsorted(self.keys, keys.astype(self.keys.dtype))
+        ends = np.searchsorted(self.keys, (keys + 1).astype(self.keys.dtype))
+        return points, starts, ends
+
+
+class ResultStore():
+    # precomputed JSON summaries in a sharded, compressed append-only layout: every record is zlib compressed JSON
+    # in one of the shard-NN.bin files, the index file maps keys ("user:<username>", "ouid:<id>") to shard, offset
+    # and length of the record, so serving a summary is one seek and read. The index is appended and flushed after
+    # every record, which makes it the checkpoint of precompute_summaries().
+
+    def __init__(self, directory, shards=16, fingerprint=None):
+        self.directory = directory
+        # None if opened without checking the store against the official data
+        self.fingerprint = fingerprint
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        meta_file = os.path.join(directory, "meta.json")
+        meta = {}
+        if os.path.isfile(meta_file):
+            with open(meta_file) as f:
+                meta = json.load(f)
+        if meta and fingerprint is not None and meta.get("fingerprint") != list(fingerprint):
+            logger.warning(f"Result store {directory} was built from other data, start over ...")
+            for name in os.listdir(directory):
+                if name.startswith("shard-") or name == "index":
+                    os.remove(os.path.join(directory, name))
+            meta = {}
+        self.shards = meta.get("shards", shards)
+        if fingerprint is not None or not meta:
+            with open(meta_file, "w") as f:
+                json.dump({"shards": self.shards, "fingerprint": list(fingerprint) if fingerprint else None}, f)
+
+        self.index = {}
+        index_file = os.path.join(directory, "index")
+        if os.path.isfile(index_file):
+            with open(index_file) as f:
+                for line in f:
+                    try:
+                        key, shard, offset, length = line.rstrip("\n").split("\t")
+                        self.index[key] = (int(shard), int(offset), int(length))
+                    except ValueError:
+                        # partially written line of an interrupted run
+                        continue
+        self.index_file = open(index_file, "a")
+
+    def _shard_file(self, shard):
+        return os.path.join(self.directory, f"shard-{shard:02d}.bin")
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def get(self, key):
+        # return the stored value for key, or None if there is none
+        location = self.index.get(key)
+        if location is None:
+            return None
+        shard, offset, length = location
+        with open(self._shard_file(shard), "rb") as f:
+            f.seek(offset)
+            return json.loads(zlib.decompress(f.read(length)))
+
+    def put(self, keys, value):
+        # store value (anything JSON serializable) under all of the given keys
+        data = zlib.compress(json.dumps(value).encode(), 6)
+        shard = zlib.crc32(keys[0].encode()) % self.shards
+        with self.lock:
+            with open(self._shard_file(shard), "ab") as f:
+                offset = f.tell()
+                f.write(data)
+            for key in keys:
+                self.index[key] = (shard, offset, len(data))
+                self.index_file.write(f"{key}\t{shard}\t{offset}\t{len(data)}\n")
+            self.index_file.flush()
+
+    def close(self):
+        self.index_file.close()
+
+
+class UsernameIndex():
+    # all usernames of the unofficial users file, lowercased and sorted by length and name, as memory-mapped
+    # fixed-width byte strings (names.npy) with their unofficial user ids (uids.npy) and the length of the common
+    # prefix with the previous name of the same length (lcp.npy), described by manifest.json (size and mtime of the
+    # users file it was built from, first position of every name length)
+    # the names of one length are an implicit trie: the names with a common prefix are a contiguous range, found by
+    # binary search, and its children start where the common prefix with the previous name is shorter than theirs
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        self.source = manifest["source"]
+        self.offsets = np.array(manifest["offsets"], dtype=np.int64)
+        for name in ["names", "uids", "lcp"]:
+            setattr(self, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r"))
+        self.width = self.names.dtype.itemsize
+        # child boundaries of the large trie levels, see _children()
+        self.bounds = {}
+
+    @staticmethod
+    def source_of(users_file):
+        # size and mtime of the users file, to tell if an index is outdated
+        stat = os.stat(users_file)
+        return [stat.st_size, int(stat.st_mtime)]
+
+    @classmethod
+    def build(cls, users_file, directory, block=1 << 20):
+        # read the users file ({"username": uid, ...} with one username per line, as written by the downloader) and
+        # write the index files, usernames differing only in case keep the order of the users file
+        names = []
+        uids = []
+        with open(users_file, "r") as f:
+            for line in f:
+                if ":" not in line:
+                    continue
+                name, uid = line.rsplit(":", 1)
+                names.append(name.strip().strip("\"").lower().encode())
+                uids.append(int(uid.strip().rstrip(",")))
+        width = max((len(name) for name in names), default=1)
+        names = np.array(names, dtype=f"S{width}")
+        uids = np.array(uids, dtype=np.int32)
+        order = np.argsort(names, kind="stable")
+        order = order[np.argsort(np.char.str_len(names[order]), kind="stable")]
+        names = names[order]
+        uids = uids[order]
+        del order
+        lengths = np.char.str_len(names)
+        chars = names.view(np.uint8).reshape(-1, width)
+        lcp = np.zeros(len(names), dtype=np.uint8)
+        for first in range(1, len(names), block):
+            same = chars[first:first + block] == chars[first - 1:first - 1 + block][:len(chars[first:first + block])]
+            lcp[first:first + len(same)] = np.where(same.all(axis=1), width, np.argmin(same, axis=1))
+        offsets = np.searchsorted(lengths, np.arange(width + 2))
+        # no common prefix across lengths
+        lcp[offsets[offsets < len(names)]] = 0
+        os.makedirs(directory, exist_ok=True)
+        for name, values in [("names", names), ("uids", uids), ("lcp", lcp)]:
+            np.save(os.path.join(directory, f"{name}.npy"), values)
+        with open(os.path.join(directory, "manifest.json"), "w+") as f:
+            json.dump({"source": cls.source_of(users_file), "offsets": offsets.tolist()}, f)
+        return cls(directory)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _range(self, prefix, length):
+        # range of the names of the given length starting with prefix (bytes)
+        if length > self.width or len(prefix) > length:
+            return 0, 0
+        lo, hi = int(self.offsets[length]), int(self.offsets[length + 1])
+        names = self.names[lo:hi]
+        if len(prefix) == length:
+            return lo + int(np.searchsorted(names, prefix, side="left")), \
+                lo + int(np.searchsorted(names, prefix, side="right"))
+        return lo + int(np.searchsorted(names, prefix, side="left")), \
+            lo + int(np.searchsorted(names, prefix + b"\xff", side="left"))
+
+    def lookup(self, username):
+        # unofficial user id of a (lowercase) username, None if unknown
+        name = username.encode()
+        first, end = self._range(name, len(name))
+        return int(self.uids[first]) if first < end else None
+
+    def complete(self, prefix, k=10):
+        # up to k (username, uid) starting with the (lowercase) prefix, shortest first
+        prefix = prefix.encode()
+        found = []
+        for length in range(len(prefix), self.width + 1):
+            first, end = self._range(prefix, length)
+            found.extend((self.names[i].decode(), int(self.uids[i])) for i in range(first, min(end, first + k -
+                                                                                                  len(found))))
+            if len(found) >= k:
+                break
+        return found
+
+    def _children(self, starts, ends, depth, length):
+        # first positions of the children (the names where the first depth + 1 bytes change) of the prefixes of
+        # the given ranges of names of one length, for large levels from the cached boundaries of all of them
+        if (ends - starts).sum() <= (self.offsets[length + 1] - self.offsets[length]) // 16:
+            cover = ranges_to_positions(starts, ends)
+            return cover[self.lcp[cover] <= depth]
+        if (length, depth) not in self.bounds:
+            lo = self.offsets[length]
+            self.bounds[(length, depth)] = lo + np.flatnonzero(self.lcp[lo:self.offsets[length + 1]] <= depth)
+        bounds = self.bounds[(length, depth)]
+        return bounds[ranges_to_positions(np.searchsorted(bounds, starts), np.searchsorted(bounds, ends))]
+
+    def suggest(self, username, max_distance=2, k=10):
+        # up to k (username, uid, distance) within max_distance edits (Levenshtein distance) of the (lowercase)
+        # username, closest first
+        # walks the trie of every name length within max_distance of the username one prefix length at a time, for
+        # all prefixes of that length at once: every prefix keeps its row of the edit distance matrix against the
+        # username, prefixes are dropped with all names below them once no cell of the row plus the difference of
+        # the remaining lengths is within max_distance
+        target = np.frombuffer(username.encode(), dtype=np.uint8).astype(np.int16)
+        cap = max_distance + 1
+        chars = self.names.view(np.uint8).reshape(-1, self.width)
+        remaining = len(target) - np.arange(len(target) + 1, dtype=np.int16)
+        found = []
+        for length in range(max(len(target) - max_distance, 1), min(len(target) + max_distance, self.width) + 1):
+            starts = self.offsets[length:length + 1].copy()
+            ends = self.offsets[length + 1:length + 2].copy()
+            if starts[0] == ends[0]:
+                continue
+            rows = np.minimum(np.arange(len(target) + 1, dtype=np.int16), cap)[None, :]
+            for depth in range(length):
+                if not len(starts):
+                    break
+                child = self._children(starts, ends, depth, length)
+                parent = np.searchsorted(starts, child, side="right") - 1
+                child_end = np.append(child[1:], 0)
+                last = np.append(parent[1:] != parent[:-1], True)
+                child_end[last] = ends[parent[last]]
+                previous = rows[parent]
+                cost = target[None, :] != chars[child, depth].astype(np.int16)[:, None]
+                diagonal = np.minimum(previous[:, 1:] + 1, previous[:, :-1] + cost)
+                rows = np.empty_like(previous)
+                rows[:, 0] = np.minimum(previous[:, 0] + 1, cap)
+                for i in range(1, len(target) + 1):
+                    rows[:, i] = np.minimum(np.minimum(diagonal[:, i - 1], rows[:, i - 1] + 1), cap)
+                keep = (rows + np.abs(length - depth - 1 - remaining)).min(axis=1) <= max_distance
+                starts, ends, rows = child[keep], child_end[keep], rows[keep]
+            hit = rows[:, -1] <= max_distance
+            positions = ranges_to_positions(starts[hit], ends[hit])
+            found.append((positions, np.repeat(rows[hit, -1], (ends - starts)[hit])))
+
+        if not found:
+            return []
+        positions = np.concatenate([positions for positions, distances in found])
+        distances = np.concatenate([distances for positions, distances in found])
+        names = self.names[positions]
+        best = np.lexsort((names, distances))[:k]
+        return [(names[i].decode(), int(self.uids[positions[i]]), int(distances[i])) for i in best]
+
+
+class EncodedOfficial():
+    # compressed in-memory encoding of the official data in its original row order, in blocks of 2^block_bits rows:
+    # pixel_x, pixel_y (11 bits each) and pixel_color (5 bits) bit-packed into one uint32, the user id as dense uint32
+    # (codes into self.user_ids if the ids aren't dense already) and the timestamps per block as deltas to the previous
+    # row (time-sorted blocks) or offsets to the block minimum (other blocks), in the smallest unsigned type that fits.
+    # Columns decode vectorized per block, predicates run on the packed values and skip blocks by their time range.
+
+    columns = ["timestamp", "user_id", "pixel_color", "pixel_x", "pixel_y"]
+    # bit offset and width of the packed columns
+    fields = {"pixel_x": (0, 11), "pixel_y": (11, 11), "pixel_color": (22, 5)}
+
+    def __init__(self, df, block_bits=14, fingerprint=None):
+        self.fingerprint = fingerprint
+        self.block_bits = block_bits
+        self.rows = len(df.index)
+        self.blocks = -(-self.rows // (1 << block_bits))
+        self.dtypes = {col: df[col].dtype for col in self.columns}
+
+        self.packed = np.zeros(self.rows, dtype=np.uint32)
+        for col, (shift, bits) in self.fields.items():
+            values = df[col].values
+            if len(values) and (values.min() < 0 or values.max() >= 1 << bits):
+                raise ValueError(f"Unable to encode {col}: values need to be within 0-{(1 << bits) - 1}")
+            self.packed |= values.astype(np.uint32) << np.uint32(shift)
+
+        user_id = df.user_id.values
+        self.user_ids = np.unique(user_id)
+        if len(self.user_ids) and self.user_ids[0] >= 0 and self.user_ids[-1] < 2 * len(self.user_ids):
+            # dense enough to use the ids as codes
+            self.user_ids = None
+            self.user_codes = user_id.astype(np.uint32)
+        else:
+            self.user_codes = np.searchsorted(self.user_ids, user_id).astype(np.uint32)
+
+        ts = df.timestamp.values.astype(np.int64)
+        self.ts_base = np.zeros(self.blocks, dtype=np.int64)
+        self.ts_min = np.zeros(self.blocks, dtype=np.int64)
+        self.ts_max = np.zeros(self.blocks, dtype=np.int64)
+        self.ts_sorted = np.zeros(self.blocks, dtype=bool)
+        self.ts_blocks = []
+        for block in range(self.blocks):
+            part = ts[self._slice(block)]
+            self.ts_min[block], self.ts_max[block] = part.min(), part.max()
+            deltas = np.diff(part, prepend=part[0])
+            self.ts_sorted[block] = deltas.min() >= 0
+            if self.ts_sorted[block]:
+                self.ts_base[block], values = part[0], deltas
             else:
-                return False
+                self.ts_base[block], values = self.ts_min[block], part - self.ts_min[block]
+            self.ts_blocks.append(values.astype(np.min_scalar_type(int(values.max()))))
+
+    def __len__(self):
+        return self.rows
+
+    def _slice(self, block):
+        size = 1 << self.block_bits
+        return slice(block * size, min((block + 1) * size, self.rows))
+
+    def _timestamps(self, block):
+        # decode the timestamps of one block
+        values = self.ts_blocks[block]
+        if self.ts_sorted[block]:
+            return self.ts_base[block] + np.cumsum(values, dtype=np.int64)
+        return self.ts_base[block] + values.astype(np.int64)
+
+    def _decode(self, name, packed=None, codes=None):
+        # decode a packed column or the user ids
+        if name == "user_id":
+            return codes if self.user_ids is None else self.user_ids[codes]
+        shift, bits = self.fields[name]
+        return (packed >> np.uint32(shift)) & np.uint32((1 << bits) - 1)
+
+    def column(self, name, block=None):
+        # decode a whole column, or one block of it, to the original dtype
+        if name == "timestamp":
+            blocks = range(self.blocks) if block is None else [block]
+            values = np.concatenate([self._timestamps(b) for b in blocks]) if len(blocks) else np.empty(0, np.int64)
+        else:
+            rows = slice(None) if block is None else self._slice(block)
+            values = self._decode(name, self.packed[rows], self.user_codes[rows])
+        return values.astype(self.dtypes[name], copy=False)
+
+    def values(self, name, positions):
+        # decode the values of a column at the given row positions, only touching the blocks that contain them
+        positions = np.asarray(positions, dtype=np.int64)
+        if name != "timestamp":
+            packed = self.packed[positions] if name in self.fields else None
+            codes = self.user_codes[positions] if name == "user_id" else None
+            return self._decode(name, packed, codes).astype(self.dtypes[name], copy=False)
+        values = np.empty(len(positions), dtype=np.int64)
+        blocks = positions >> self.block_bits
+        order = np.argsort(blocks, kind="stable")
+        touched, starts = np.unique(blocks[order], return_index=True)
+        for block, lo, hi in zip(touched, starts, np.append(starts[1:], len(order))):
+            rows = order[lo:hi]
+            values[rows] = self._timestamps(block)[positions[rows] - (int(block) << self.block_bits)]
+        return values.astype(self.dtypes[name], copy=False)
+
+    def take(self, positions):
+        # decode the rows at the given positions to a DataFrame indexed by position
+        positions = np.asarray(positions, dtype=np.int64)
+        return pd.DataFrame({col: self.values(col, positions) for col in self.columns}, index=positions)
+
+    def frame(self, block):
+        # decode one block to a DataFrame indexed by position
+        rows = self._slice(block)
+        return pd.DataFrame({col: self.column(col, block) for col in self.columns},
+                            index=np.arange(rows.start, rows.stop))
+
+    def select(self, xa=None, ya=None, xb=None, yb=None, ts_from=None, ts_to=None, user_ids=None):
+        # row positions matching all given conditions (bounds inclusive, ts_to exclusive), evaluated block-wise on
+        # the encoded columns; blocks outside of the time window aren't touched
+        blocks = np.arange(self.blocks)
+        if ts_from is not None:
+            blocks = blocks[self.ts_max[blocks] >= ts_from]
+        if ts_to is not None:
+            blocks = blocks[self.ts_min[blocks] < ts_to]
+        codes = None
+        if user_ids is not None:
+            user_ids = np.asarray(user_ids if isinstance(user_ids, list) else [user_ids], dtype=np.int64)
+            if self.user_ids is None:
+                codes = user_ids[(user_ids >= 0) & (user_ids <= np.iinfo(np.uint32).max)]
+            else:
+                codes = np.searchsorted(self.user_ids, user_ids)
+                codes = codes[(codes < len(self.user_ids)) & (self.user_ids[np.minimum(codes, len(self.user_ids) - 1)]
+                                                              == user_ids)]
+            if not len(codes):
+                return np.empty(0, dtype=np.int64)
+        pixel = xa is not None and xa == xb and ya is not None and ya == yb and 0 <= xa < 2048 and 0 <= ya < 2048
+        positions = []
+        for block in blocks:
+            rows = self._slice(block)
+            mask = np.ones(rows.stop - rows.start, dtype=bool)
+            if codes is not None:
+                mask &= np.isin(self.user_codes[rows], codes) if len(codes) > 1 else self.user_codes[rows] == codes[0]
+            if pixel:
+                # one comparison on the packed coordinates
+                mask &= (self.packed[rows] & np.uint32((1 << 22) - 1)) == np.uint32(int(xa) | int(ya) << 11)
+            elif xa is not None or xb is not None or ya is not None or yb is not None:
+                packed = self.packed[rows]
+                for name, low, high in [("pixel_x", xa, xb), ("pixel_y", ya, yb)]:
+                    if low is not None or high is not None:
+                        values = self._decode(name, packed).astype(np.int64)
+                        if low is not None:
+                            mask &= values >= low
+                        if high is not None:
+                            mask &= values <= high
+            if ts_from is not None or ts_to is not None:
+                ts = self._timestamps(block)
+                if ts_from is not None:
+                    mask &= ts >= ts_from
+                if ts_to is not None:
+                    mask &= ts < ts_to
+            positions.append(np.flatnonzero(mask) + rows.start)
+        return np.concatenate(positions) if positions else np.empty(0, dtype=np.int64)
+
+    def memory_usage(self):
+        # bytes used by the encoded columns
+        return (self.packed.nbytes + self.user_codes.nbytes + sum(b.nbytes for b in self.ts_blocks)
+                + (self.user_ids.nbytes if self.user_ids is not None else 0) + 4 * 8 * self.blocks)
+
+
+class OfficialPartitions():
+    # the official data on disk as parquet files, one per spatial block of block x block pixels and time period,
+    # described by manifest.json (row count and min/max of every column per partition) and blooms.npz (a Bloom filter
+    # of the user ids per partition), so queries only read the partitions that can contain matching rows
+
+    columns = {"timestamp": "int32", "user_id": "int32", "pixel_color": "int8", "pixel_x": "int16",
+               "pixel_y": "int16"}
+    bloom_hashes = 7
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        self.block = manifest["block"]
+        self.period = manifest["period"]
+        self.fingerprint = tuple(manifest["fingerprint"])
+        self.partitions = manifest["partitions"]
+        self.rows = sum(p["rows"] for p in self.partitions)
+        # (partitions, 2) arrays of min and max per column
+        self.stats = {col: np.array([p[col] for p in self.partitions], dtype=np.int64).reshape(-1, 2)
+                      for col in self.columns}
+        with np.load(os.path.join(directory, "blooms.npz")) as blooms:
+            self.blooms = [blooms[p["file"]] for p in self.partitions]
+
+    @classmethod
+    def build(cls, files, directory, block=250, period_hours=12, progress=True):
+        # stream the official csv files one by one into the partition files, so only one csv file is in memory
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        os.makedirs(directory, exist_ok=True)
+        period = int(period_hours * 3600000)
+        blocks_per_row = -(-canvas_size // block)
+        schema = pa.schema([(col, pa.from_numpy_dtype(np.dtype(dtype))) for col, dtype in cls.columns.items()])
+        writers = {}
+        stats = {}
+        fingerprint = [0, 0, 0, 0, 0]
+        try:
+            for f in tqdm(files, desc="Partition official data ...", disable=not progress):
+                df = pd.read_csv(f).astype(cls.columns)[list(cls.columns)]
+                fingerprint[0] += len(df.index)
+                for i, col in enumerate(["timestamp", "user_id", "pixel_x", "pixel_y"]):
+                    fingerprint[i + 1] += int(df[col].values.sum(dtype=np.int64))
+                key = ((np.maximum(df.timestamp.values, 0) // period).astype(np.int64) * blocks_per_row ** 2
+                       + (df.pixel_y.values // block) * blocks_per_row + df.pixel_x.values // block)
+                order = np.argsort(key, kind="stable")
+                keys, starts = np.unique(key[order], return_index=True)
+                for k, lo, hi in zip(keys, starts, np.append(starts[1:], len(order))):
+                    part = df.iloc[order[lo:hi]]
+                    if k not in writers:
+                        name = f"part-{k // blocks_per_row ** 2:03d}-{k % blocks_per_row ** 2:03d}.parquet"
+                        writers[k] = (name, pq.ParquetWriter(os.path.join(directory, name), schema))
+                        stats[k] = {col: [int(part[col].min()), int(part[col].max())] for col in cls.columns}
+                        stats[k]["rows"] = 0
+                    writers[k][1].write_table(pa.Table.from_pandas(part, schema=schema, preserve_index=False))
+                    for col in cls.columns:
+                        stats[k][col] = [min(stats[k][col][0], int(part[col].min())),
+                                         max(stats[k][col][1], int(part[col].max()))]
+                    stats[k]["rows"] += len(part.index)
+        finally:
+            for name, writer in writers.values():
+                writer.close()
+
+        # second pass over the user ids of every partition for the Bloom filters
+        partitions = []
+        blooms = {}
+        for k in sorted(writers):
+            name = writers[k][0]
+            user_ids = np.unique(pq.read_table(os.path.join(directory, name), columns=["user_id"])
+                                 .column(0).to_numpy())
+            blooms[name] = cls.bloom_filter(user_ids)
+            partitions.append({"file": name, **stats[k]})
+        np.savez(os.path.join(directory, "blooms.npz"), **blooms)
+        with open(os.path.join(directory, "manifest.json"), "w") as f:
+            json.dump({"block": block, "period": period, "fingerprint": fingerprint, "partitions": partitions}, f)
+        return cls(directory)
+
+    @classmethod
+    def _bloom_positions(cls, values, nbits):
+        # bit positions of the values in a Bloom filter of nbits (power of 2) bits, by double hashing
+        h = hash64(values)
+        h1, h2 = h & np.uint64(0xFFFFFFFF), (h >> np.uint64(32)) | np.uint64(1)
+        k = np.arange(cls.bloom_hashes, dtype=np.uint64)
+        return (h1[:, None] + k[None, :] * h2[:, None]) & np.uint64(nbits - 1)
+
+    @classmethod
+    def bloom_filter(cls, values):
+        # packed Bloom filter with ~10 bits per value (about 1% false positives)
+        nbits = max(64, 1 << int(np.ceil(np.log2(max(len(values), 1) * 10))))
+        bits = np.zeros(nbits, dtype=bool)
+        bits[cls._bloom_positions(values, nbits).ravel().astype(np.int64)] = True
+        return np.packbits(bits)
+
+    def may_contain(self, partition, values):
+        # False if none of the values is in the partition, True if any of them might be
+        bloom = self.blooms[partition]
+        positions = self._bloom_positions(np.asarray(values), len(bloom) * 8).astype(np.int64)
+        hits = (bloom[positions >> 3] >> (7 - (positions & 7))) & 1
+        return bool(hits.all(axis=1).any())
+
+    def candidates(self, xa=None, ya=None, xb=None, yb=None, ts_from=None, ts_to=None, user_ids=None):
+        # indexes of the partitions which can contain rows matching all given conditions (bounds inclusive, ts_to
+        # exclusive)
+        keep = np.ones(len(self.partitions), dtype=bool)
+        for col, low, high in [("pixel_x", xa, xb), ("pixel_y", ya, yb),
+                               ("timestamp", ts_from, None if ts_to is None else ts_to - 1)]:
+            if low is not None:
+                keep &= self.stats[col][:, 1] >= low
+            if high is not None:
+                keep &= self.stats[col][:, 0] <= high
+        if user_ids is not None:
+            user_ids = np.asarray(user_ids)
+            user_stats = self.stats["user_id"]
+            keep &= (user_stats[:, 1] >= user_ids.min()) & (user_stats[:, 0] <= user_ids.max())
+            for partition in np.flatnonzero(keep):
+                keep[partition] = self.may_contain(partition, user_ids)
+        return np.flatnonzero(keep)
+
+    @staticmethod
+    def filters(xa=None, ya=None, xb=None, yb=None, ts_from=None, ts_to=None, user_ids=None):
+        # the conditions as parquet row filters (None without conditions)
+        if user_ids is not None:
+            user_ids = [int(u) for u in (user_ids if isinstance(user_ids, list) else [user_ids])]
+        filters = []
+        for col, low, high in [("pixel_x", xa, xb), ("pixel_y", ya, yb), ("timestamp", ts_from, None)]:
+            if low is not None:
+                filters.append((col, ">=", low))
+            if high is not None:
+                filters.append((col, "<=", high))
+        if ts_to is not None:
+            filters.append(("timestamp", "<", ts_to))
+        if user_ids is not None:
+            filters.append(("user_id", "in", user_ids))
+        return filters or None
+
+    def read(self, xa=None, ya=None, xb=None, yb=None, ts_from=None, ts_to=None, user_ids=None):
+        # read the rows matching all given conditions from the candidate partitions, ordered by timestamp
+        # returns DataFrame and the number of rows of the partitions that were read
+        import pyarrow.parquet as pq
+
+        partitions = self.candidates(xa, ya, xb, yb, ts_from, ts_to, user_ids)
+        if not len(partitions):
+            return pd.DataFrame({col: np.empty(0, dtype=dtype) for col, dtype in self.columns.items()}), 0
+        paths = [os.path.join(self.directory, self.partitions[i]["file"]) for i in partitions]
+        filters = self.filters(xa, ya, xb, yb, ts_from, ts_to, user_ids)
+        df = pq.ParquetDataset(paths, filters=filters).read().to_pandas()
+        scanned = sum(self.partitions[i]["rows"] for i in partitions)
+        return df.sort_values(by="timestamp", kind="stable").reset_index(drop=True), scanned
+
+    def batches(self, columns=None, batch_rows=1 << 20, xa=None, ya=None, xb=None, yb=None, ts_from=None, ts_to=None,
+                user_ids=None):
+        # scan the candidate partitions for the rows matching all given conditions as Arrow RecordBatches of up to
+        # batch_rows rows (not sorted), reading only a few batches at a time
+        # returns the iterator of the batches and the number of rows of the partitions it reads
+        import pyarrow.dataset as ds
+
+        partitions = self.candidates(xa, ya, xb, yb, ts_from, ts_to, user_ids)
+        expression = None
+        for col, op, value in self.filters(xa, ya, xb, yb, ts_from, ts_to, user_ids) or []:
+            field = ds.field(col)
+            condition = {">=": field >= value, "<=": field <= value, "<": field < value}[op] if op != "in" \
+                else field.isin(value)
+            expression = condition if expression is None else expression & condition
+        if not len(partitions):
+            return iter([]), 0
+        paths = [os.path.join(self.directory, self.partitions[i]["file"]) for i in partitions]
+        dataset = ds.dataset(paths, format="parquet")
+        return (dataset.to_batches(columns=columns, filter=expression, batch_size=batch_rows),
+                sum(self.partitions[i]["rows"] for i in partitions))
+
+    def collection(self):
+        # all partitions as lazy dask DataFrame
+        return dd.read_parquet([os.path.join(self.directory, p["file"]) for p in self.partitions])
+
+
+# PlaceData object shared with forked worker processes, see PlaceData.precompute_summaries()
+_worker_data = None
+
+
+def _summary_worker(username):
+    # compute the JSON summary of one username in a worker process
+    try:
+        summary = _worker_data._compute_json_summary(username)
+    except Exception as e:
+        logger.warning(f"Unable to compute summary for {username}: {e}")
+        return username, None, None
+    if not summary:
+        return username, False, False
+    return username, _worker_data.get_official_uid_by_username(username), summary
+
+
+def _render_init():
+    # the render worker processes must not write cache.p or show progress bars
+    _worker_data.cache.persist = False
+    _worker_data.progress = False
+    if _worker_data.live is not None:
+        # forked while the parent held the lock of the delta segment, see RenderQueue._dispatch()
+        _worker_data.live.lock = threading.RLock()
+
+
+def _render_worker(method, username, force):
+    # render one image in a worker process of the RenderQueue, returns the result of the generate_* method
+    return getattr(_worker_data, method)(username, force=force)
+
+
+def _regularity_worker(task):
+    # interval statistics of the official user ids first <= uid < end in a worker process, see
+    # PlaceData.load_user_regularity()
+    first, end = task
+    data = _worker_data
+    index = data.user_index
+    positions = index.order[index.offsets[first]:index.offsets[end]]
+    table, histogram = UserRegularity.measure(np.diff(index.offsets[first:end + 1]),
+                                              data._column_at("timestamp", positions), data.cooldown * 1000,
+                                              data.cooldown_tolerance * 1000, data.session_gap * 60000)
+    return first, table, histogram
+
+
+def _neighbor_worker(task):
+    # the top k neighbors of a chunk of official user ids in a worker process, see PlaceData.get_all_neighbors()
+    uids, radius, window, k = task
+    return _worker_data._neighbors_of_each(uids, radius, window, k)
+
+
+class RenderQueue():
+    # renders images in the background in a pool of forked worker processes (sharing the loaded data)
+    # jobs are deduplicated by filename while queued or rendering, interactive jobs start before batch jobs, and the
+    # image files are written atomically by PlaceData._save_png()
+
+    priorities = {"interactive": 0, "batch": 1}
+
+    def __init__(self, data, processes):
+        self.data = data
+        self.processes = processes
+        self.lock = threading.Condition()
+        self.pool = None
+        self.heap = []
+        self.sequence = itertools.count()
+        # queued and rendering jobs by filename
+        self.jobs = {}
+        self.running = 0
+        # finished jobs without an image (no pixels) and failed jobs with their error
+        self.empty = set()
+        self.errors = {}
+        # set by close(), late callbacks of the terminated pool are ignored afterwards
+        self.closed = False
+        # set by refresh(): the workers were forked with outdated data and are replaced once their jobs are done
+        self.stale = False
+
+    def submit(self, filename, method, username, priority="batch", force=False):
+        # queue rendering the image filename by data.<method>(username, force=force)
+        # a job for the same filename is only queued once, an interactive request moves a queued batch job ahead
+        if priority not in self.priorities:
+            raise ValueError(f"Invalid priority {priority}! Valid priorities: {list(self.priorities)}")
+        rank = self.priorities[priority]
+        with self.lock:
+            if self.closed:
+                raise ValueError("The render queue is closed")
+            job = self.jobs.get(filename)
+            if job is None:
+                job = {"method": method, "username": username, "force": force, "priority": rank, "status": "queued"}
+                self.jobs[filename] = job
+                self.empty.discard(filename)
+                self.errors.pop(filename, None)
+            elif job["status"] == "queued" and rank < job["priority"]:
+                # the outdated heap entry is skipped by _dispatch()
+                job["priority"] = rank
+            else:
+                return "pending"
+            heapq.heappush(self.heap, (rank, next(self.sequence), filename))
+            self._dispatch()
+        return "pending"
+
+    def _dispatch(self):
+        # start queued jobs while workers are free, must be called with self.lock held
+        if self.closed:
+            return
+        if self.stale and self.pool is not None:
+            if self.running:
+                return
+            # no blocking terminate(), this may run in the result handler thread of the pool
+            self.pool.close()
+            self.pool = None
+        self.stale = False
+        if self.pool is None and self.heap:
+            global _worker_data
+            previous, _worker_data = _worker_data, self.data
+            # fork while no live append or compaction swap is in progress, so the workers get a consistent delta
+            # segment (and a fresh lock in _render_init())
+            live = self.data.live
+            if live is not None:
+                live.lock.acquire()
+            try:
+                self.pool = multiprocessing.get_context("fork").Pool(self.processes, initializer=_render_init)
+            finally:
+                _worker_data = previous
+                if live is not None:
+                    live.lock.release()
+        while self.running < self.processes and self.heap:
+            rank, _, filename = heapq.heappop(self.heap)
+            job = self.jobs.get(filename)
+            if job is None or job["status"] != "queued" or job["priority"] != rank:
+                continue
+            job["status"] = "rendering"
+            self.running += 1
+            self.pool.apply_async(_render_worker, (job["method"], job["username"], job["force"]),
+                                  callback=functools.partial(self._finish, filename),
+                                  error_callback=functools.partial(self._fail, filename))
+
+    def _finish(self, filename, result):
+        # called by the pool when a job is done
+        with self.lock:
+            if self.closed:
+                # close() already dropped the job and reset the counters
+                return
+            self.running -= 1
+            self.jobs.pop(filename, None)
+            if result is False:
+                self.empty.add(filename)
+            self._dispatch()
+            self.lock.notify_all()
+
+    def _fail(self, filename, error):
+        logger.warning(f"Rendering {filename} failed: {error}")
+        with self.lock:
+            self.errors[filename] = str(error)
+        self._finish(filename, None)
+
+    def refresh(self):
+        # replace the workers by ones forked with the current data (e.g. after a live compaction), once the jobs
+        # they are rendering are done - queued jobs wait for the new workers
+        with self.lock:
+            self.stale = True
+            self._dispatch()
+
+    def status(self, filename):
+        # "pending" (queued or rendering), "ready", "empty" (no pixels to show), "failed" or "missing"
+        with self.lock:
+            if filename in self.jobs:
+                return "pending"
+            if filename in self.errors:
+                return "failed"
+            if filename in self.empty:
+                return "empty"
+        return "ready" if os.path.isfile(os.path.join(self.data.imgdir, filename)) else "missing"
+
+    def pending(self):
+        # number of queued and rendering jobs
+        with self.lock:
+            return len(self.jobs)
+
+    def wait(self, timeout=None):
+        # block until all jobs are done, returns False if the timeout (seconds) passed before
+        with self.lock:
+            return self.lock.wait_for(lambda: not self.jobs, timeout)
+
+    def close(self):
+        # stop the worker processes, dropping all queued jobs (the queue can't be used afterwards)
+        with self.lock:
+            self.closed = True
+            pool, self.pool = self.pool, None
+            self.heap = []
+            self.jobs = {}
+            self.running = 0
+            self.lock.notify_all()
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+class LiveSegment():
+    # delta segment of live mode: official rows appended after the base data was loaded, as growing int64 columns
+    # (the capacity doubles), indexed by pixel (sorted keys pixel << 32 | timestamp) and by user (sorted keys
+    # user_id << 32 | row) - every appended batch is merged into the sorted keys, so they are always up to date
+    # row r of the segment becomes row base_rows + r of the official data when the segment is compacted into it, see
+    # PlaceData.start_live()
+
+    columns = list(OfficialPartitions.columns)
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.data = {col: np.empty(0, dtype=np.int64) for col in self.columns}
+        self.rows = 0
+        self.pixel_keys = np.empty(0, dtype=np.int64)
+        self.pixel_rows = np.empty(0, dtype=np.int64)
+        self.user_keys = np.empty(0, dtype=np.int64)
+        self.ts_sorted = True
+        self.ts_max = None
+        # incremented before and after every compaction swaps the base data and the segment, see consistent()
+        self.generation = 0
+
+    @staticmethod
+    def fitting_dtype(dtype, values):
+        # dtype, widened if needed to hold the values
+        if not len(values):
+            return dtype
+        return np.result_type(dtype, np.min_scalar_type(int(values.min())), np.min_scalar_type(int(values.max())))
+
+    def append(self, rows):
+        # append a batch of rows (dict of int64 arrays per column), returns the number of rows in the segment
+        ts = rows["timestamp"]
+        keys = (rows["pixel_x"] * canvas_size + rows["pixel_y"]) << 32 | ts
+        by_key = np.argsort(keys, kind="stable")
+        with self.lock:
+            first, end = self.rows, self.rows + len(ts)
+            if end > len(self.data["timestamp"]):
+                for col in self.columns:
+                    grown = np.empty(max(1024, 2 * end), dtype=np.int64)
+                    grown[:first] = self.data[col][:first]
+                    self.data[col] = grown
+            for col in self.columns:
+                self.data[col][first:end] = rows[col]
+            at = np.searchsorted(self.pixel_keys, keys[by_key], side="right")
+            self.pixel_keys = np.insert(self.pixel_keys, at, keys[by_key])
+            self.pixel_rows = np.insert(self.pixel_rows, at, first + by_key)
+            user_keys = np.sort(rows["user_id"] << 32 | np.arange(first, end))
+            self.user_keys = np.insert(self.user_keys, np.searchsorted(self.user_keys, user_keys), user_keys)
+            if len(ts):
+                self.ts_sorted = self.ts_sorted and bool((ts[1:] >= ts[:-1]).all()) and \
+                    (self.ts_max is None or ts[0] >= self.ts_max)
+                self.ts_max = int(ts.max()) if self.ts_max is None else max(self.ts_max, int(ts.max()))
+            # last, so a snapshot never contains a partially written row
+            self.rows = end
+            return end
+
+    def snapshot(self):
+        # the rows appended so far and their indexes, unaffected by later appends
+        with self.lock:
+            return {"rows": self.rows, "columns": {col: values[:self.rows] for col, values in self.data.items()},
+                    "pixel_keys": self.pixel_keys, "pixel_rows": self.pixel_rows, "user_keys": self.user_keys,
+                    "ts_sorted": self.ts_sorted}
+
+    def trim(self, rows):
+        # drop the first rows (compacted into the base data), must be called with self.lock held
+        for col in self.columns:
+            self.data[col] = self.data[col][rows:self.rows].copy()
+        self.rows -= rows
+        keep = self.pixel_rows >= rows
+        self.pixel_keys = self.pixel_keys[keep]
+        self.pixel_rows = self.pixel_rows[keep] - rows
+        self.user_keys = self.user_keys[(self.user_keys & 0xFFFFFFFF) >= rows] - rows
+        ts = self.data["timestamp"][:self.rows]
+        self.ts_sorted = bool((ts[1:] >= ts[:-1]).all())
+
+    def consistent(self, fn):
+        # run fn() until no compaction swapped the base data and the segment while it ran, so it sees every row
+        # exactly once (like a seqlock: an odd generation means a swap is in progress)
+        while True:
+            generation = self.generation
+            if generation % 2:
+                time.sleep(0.001)
+                continue
+            try:
+                result = fn()
+            except Exception:
+                if self.generation != generation:
+                    continue
+                raise
+            if self.generation == generation:
+                return result
+
+    @staticmethod
+    def select(view, q):
+        # rows of a snapshot matching Query q: the candidates from the pixel keys for pixels and x ranges, from the
+        # user keys for users or from the time window if the timestamps are sorted, filtered vectorized
+        columns = view["columns"]
+        pixel_keys = view["pixel_keys"]
+        candidates = None
+        pixels = q.pixel_list()
+        if pixels is not None:
+            keys = np.array([px * canvas_size + py for px, py in pixels
+                             if 0 <= px < canvas_size and 0 <= py < canvas_size], dtype=np.int64) << 32
+            candidates = view["pixel_rows"][ranges_to_positions(np.searchsorted(pixel_keys, keys),
+                                                                np.searchsorted(pixel_keys, keys + (1 << 32)))]
+        elif q.x is not None:
+            ya, yb = q.y or (0, canvas_size - 1)
+            xs = np.arange(max(q.x[0], 0), min(q.x[1], canvas_size - 1) + 1, dtype=np.int64) * canvas_size
+            ya, yb = max(ya, 0), min(yb, canvas_size - 1)
+            if ya > yb:
+                xs = xs[:0]
+            candidates = view["pixel_rows"][ranges_to_positions(np.searchsorted(pixel_keys, (xs + ya) << 32),
+                                                                np.searchsorted(pixel_keys, (xs + yb + 1) << 32))]
+        elif q.users is not None:
+            user_keys = view["user_keys"]
+            candidates = user_keys[ranges_to_positions(np.searchsorted(user_keys, q.users << 32),
+                                                       np.searchsorted(user_keys, (q.users + 1) << 32))] & 0xFFFFFFFF
+        elif (q.ts_from is not None or q.ts_to is not None) and view["ts_sorted"]:
+            ts = columns["timestamp"]
+            lo = 0 if q.ts_from is None else int(np.searchsorted(ts, q.ts_from, side="left"))
+            hi = len(ts) if q.ts_to is None else int(np.searchsorted(ts, q.ts_to, side="left"))
+            candidates = np.arange(lo, max(lo, hi), dtype=np.int64)
+        positions = np.arange(view["rows"], dtype=np.int64) if candidates is None else np.sort(candidates)
+        return positions[q.mask(lambda name: columns[name][positions], len(positions))]
+
+    @classmethod
+    def frame(cls, view, positions, dtypes, base_rows):
+        # DataFrame of the rows of a snapshot at positions, with the dtypes of the base data where the values fit and
+        # indexed by their row positions after compaction (base_rows + positions)
+        return pd.DataFrame({col: view["columns"][col][positions].astype(cls.fitting_dtype(dtypes[col],
+                                                                                            view["columns"][col]))
+                             for col in dtypes.index}, index=base_rows + positions)
+
+    @staticmethod
+    def last_edits(view, x, y, ts):
+        # row of the last edit at or before ts[i] of every pixel x[i], y[i] (within the canvas), -1 if there is none
+        pixel_keys = view["pixel_keys"]
+        if not len(pixel_keys):
+            return np.full(len(x), -1, dtype=np.int64)
+        pixel = x * canvas_size + y
+        at = np.maximum(np.searchsorted(pixel_keys, pixel << 32 | ts, side="right") - 1, 0)
+        found = (pixel_keys[at] >> 32 == pixel) & ((pixel_keys[at] & 0xFFFFFFFF) <= ts)
+        return np.where(found, view["pixel_rows"][at], -1)
 
 
 class PlaceData():
-    def __init__(self, config_file="config.ini"):
-        pbar = ProgressBar()
-        pbar.register()
+    # images of analyze_user(json=True): key in the response, generate_* method and filename suffix
+    user_images = [("first_img", "generate_first_pixels_dark", "first"),
+                   ("final_img", "generate_final_pixels_dark", "final"),
+                   ("all_pixels_pre_whiteout_img", "generate_all_pixels_dark_pre_whiteout", "all"),
+                   ("all_pixels_during_whiteout_img", "generate_all_pixels_dark_during_whiteout", "whiteout")]
 
+    def __init__(self, config_file="config.ini"):
         # load config
         config = configparser.ConfigParser()
         config.read(config_file)
 
+        self.metrics = Metrics(enabled=config.getboolean("global", "metrics", fallback=False))
+        # show tqdm progress bars of single queries
+        self.progress = True
+
         self.cwd = config.get("global", "dir", fallback=os.path.dirname(os.path.abspath(__file__)))
         self.imgdir = config.get("global", "imgdir", fallback=os.path.join(self.cwd, "images"))
         os.makedirs(self.imgdir, exist_ok=True)
 
         self.imgurl = config.get("global", "imgurl", fallback=None)
-        self.uidworkers = int(config.get("global", "uidworkers", fallback=2))
-        self.pixelworkers = int(config.get("global", "pixelworkers", fallback=4))
+        # RAM budget for the worker threads (default: 80% of the RAM), see MemoryScheduler
+        budget = config.get("global", "memorybudget", fallback="")
+        self.scheduler = MemoryScheduler(parse_size(budget) if budget else int(physical_memory() * 0.8))
+        # upper limits of concurrent jobs, the scheduler starts fewer if the budget doesn't allow more
+        self.uidworkers = int(config.get("global", "uidworkers", fallback=os.cpu_count() or 1))
+        self.pixelworkers = int(config.get("global", "pixelworkers", fallback=os.cpu_count() or 1))
+        self.imageworkers = int(config.get("global", "imageworkers", fallback=4))
+        # render the images of analyze_user(json=True) in the background, in up to renderworkers processes (fewer if
+        # the memory budget doesn't fit as many images), see RenderQueue
+        self.use_render_queue = config.getboolean("global", "renderqueue", fallback=True)
+        self.renderworkers = int(config.get("global", "renderworkers", fallback=2))
+        self.render_queue = None
+        self.use_tile_index = config.getboolean("global", "tileindex", fallback=True)
+        # index the official data by user id for fast user queries (saved to userindex.p, ~4 bytes per row)
+        self.use_user_index = config.getboolean("global", "userindex", fallback=True)
+        self.user_index = None
+        # whether the official timestamps are sorted, checked on first use by a time query
+        self.timestamps_sorted = None
+        self.tilesize = int(config.get("global", "tilesize", fallback=32))
+        self.tile_index = None
+        self.pixel_heat = None
+        self.sketch_error = float(config.get("global", "sketcherror", fallback=0.02))
+        # edit counts by time bucket (minutes), color and tile for get_activity() (saved to activity.p)
+        self.cube_tilesize = int(config.get("global", "cubetilesize", fallback=100))
+        self.cube_minutes = int(config.get("global", "cubeminutes", fallback=1))
+        self.activity_cube = None
+        # cells of the space-time grid for get_neighbors_by_username() in pixels and seconds (saved to spacetime.p)
+        self.neighbor_cellsize = int(config.get("global", "neighborcell", fallback=16))
+        self.neighbor_seconds = int(config.get("global", "neighborseconds", fallback=60))
+        self.space_time_grid = None
+        # inter-placement interval statistics of every user to flag bots in the summaries (saved to regularity.p):
+        # the cooldown and tolerance of cooldown-exact intervals in seconds, the gap ending a session in minutes and
+        # the minimum number of edits for flags
+        self.use_regularity = config.getboolean("global", "regularity", fallback=True)
+        self.cooldown = float(config.get("global", "cooldown", fallback=300))
+        self.cooldown_tolerance = float(config.get("global", "cooldowntolerance", fallback=1))
+        self.session_gap = float(config.get("global", "sessiongap", fallback=30))
+        self.bot_min_edits = int(config.get("global", "botminedits", fallback=20))
+        self.user_regularity = None
+        # look usernames up in a sorted, memory-mapped index of the unofficial users file (in the usernames dir of the
+        # working dir), which also completes prefixes and suggests similar usernames, see UsernameIndex
+        self.use_username_index = config.getboolean("global", "usernameindex", fallback=True)
+        self.username_index = None
+        self.user_sketches = None
+        self.user_aggregates = None
+        self.edit_links = None
+        self.pixel_history = None
+        self.edit_survival = None
+        self.result_dir = config.get("global", "resultstore", fallback=os.path.join(self.cwd, "results"))
+        self.result_shards = int(config.get("global", "resultshards", fallback=16))
+        self.result_store = None
+        self.index_lock = threading.RLock()
+        # keep the official data on disk, partitioned by pixel block and time (see OfficialPartitions)
+        self.out_of_core = config.getboolean("global", "outofcore", fallback=False)
+        self.partition_dir = config.get("global", "partitions", fallback=os.path.join(self.cwd, "partitions"))
+        self.partition_block = int(config.get("global", "partitionblock", fallback=250))
+        self.partition_hours = float(config.get("global", "partitionhours", fallback=12))
+        self.partitions = None
+        # live mode, see start_live(): lines per appended batch, seconds between polls of a file at its end, and when
+        # the delta segment is compacted into the base data (at livecompactrows rows or after livecompactseconds)
+        self.live_batch = int(config.get("global", "livebatch", fallback=10000))
+        self.live_poll = float(config.get("global", "livepoll", fallback=0.2))
+        self.live_compact_rows = int(config.get("global", "livecompactrows", fallback=1000000))
+        self.live_compact_seconds = float(config.get("global", "livecompactseconds", fallback=300))
+        self.live = None
+        self.live_threads = []
+        self.live_stop = threading.Event()
+        self.live_queue = queue.Queue()
+        self.live_compact_lock = threading.Lock()
+        self.live_stats = {"rows_ingested": 0, "rows_compacted": 0, "compactions": 0,
+                           "malformed_lines": 0, "ingest_lag_seconds": 0.0, "max_ingest_lag_seconds": 0.0,
+                           "event_lag_seconds": None}
+        # rows per Arrow record batch of query_batches() and export_query()
+        self.export_batch_rows = int(config.get("global", "exportbatchrows", fallback=1 << 20))
+        # "pandas" or "compressed" (keep the official data in memory as EncodedOfficial)
+        self.encoding = config.get("global", "encoding", fallback="pandas")
+        if self.out_of_core:
+            # the tile and user index need the official data in memory
+            self.use_tile_index = False
+            self.use_user_index = False
 
         self.official_compressed = config.get("compressed", "official",
                                               fallback=os.path.join(self.cwd, "official_compressed"))
         self.unofficial_compressed = config.get("compressed", "unofficial",
                                                 fallback=os.path.join(self.cwd, "unofficial_compressed"))
 
-        # loading from csv will drop the data objects to have more RAM available, thus we need this
-        # weird loop to make sure we can finally load both from pickle
-        both_loaded = False
-        while not both_loaded:
-            self.load_official(f"{self.official_compressed}/*.csv")
-            self.load_unofficial(f"{self.unofficial_compressed}/*.csv")
-            try:
-                self.official
-                self.unofficial
-            except Exception:
-                # try again
-                pass
-            else:
-                both_loaded = True
+        # both datasets are loaded on first access, see the official and unofficial properties
+        # loading one of them from csv drops the other one to have more RAM available, it's loaded again when needed
+        self._official = None
+        self._unofficial = None
+        self.load_lock = threading.RLock()
 
-        self.cache = Cache()
+        self.cache = Cache(cwd=config.get("global", "cachedir", fallback=None), metrics=self.metrics)
 
         hexmap = {
             "#000000": 0,
@@ -180,8 +2220,49 @@ class PlaceData():
             "#6D001A": 31,
         }
         self.hexmap = {v: k for k, v in hexmap.items()}
-        self.colormap = {v: Color(k, "xkcd") for k, v in hexmap.items()}
-        pbar.unregister()
+        self.colornames = dict(enumerate(palette_names))
+
+    @property
+    def official(self):
+        # the official data, loaded on first access: a DataFrame, EncodedOfficial (encoding = compressed) or a lazy
+        # dask DataFrame of the partitions (outofcore = true)
+        if self._official is None:
+            with self.load_lock:
+                if self._official is None:
+                    with ProgressBar():
+                        if self.out_of_core:
+                            self.load_official_partitions(f"{self.official_compressed}/*.csv")
+                        elif self.encoding == "compressed":
+                            self.load_official_encoded(f"{self.official_compressed}/*.csv")
+                        else:
+                            self.load_official(f"{self.official_compressed}/*.csv")
+        return self._official
+
+    @official.setter
+    def official(self, value):
+        self._official = value
+
+    @official.deleter
+    def official(self):
+        self._official = None
+
+    @property
+    def unofficial(self):
+        # the unofficial data, loaded on first access (only needed to match usernames to official user ids)
+        if self._unofficial is None:
+            with self.load_lock:
+                if self._unofficial is None:
+                    with ProgressBar():
+                        self.load_unofficial(f"{self.unofficial_compressed}/*.csv")
+        return self._unofficial
+
+    @unofficial.setter
+    def unofficial(self, value):
+        self._unofficial = value
+
+    @unofficial.deleter
+    def unofficial(self):
+        self._unofficial = None
 
     # https://gist.github.com/enamoria/fa9baa906f23d1636c002e7186516a7b
     # This function is used to reduce memory of a pandas dataframe
@@ -225,6 +2306,7 @@ class PlaceData():
         logger.info('Decreased by {:.1f}%'.format(100 * (start_mem - end_mem) / start_mem))
         return df
 
+    @instrumented("load_official")
     def load_official(self, file_glob=None):
         # load official data from pickle file or initialize from files
         try:
@@ -246,21 +2328,96 @@ class PlaceData():
         else:
             logger.info("dump official data to official.p ...")
             pickle.dump(self.official, open(os.path.join(self.cwd, "official.p"), "wb"))
+            if os.path.isfile(os.path.join(self.cwd, "official-encoded.p")):
+                # encoded from the previous official.p
+                os.remove(os.path.join(self.cwd, "official-encoded.p"))
+            return True
+
+    @instrumented("load_official")
+    def load_official_encoded(self, file_glob=None):
+        # load the compressed encoding of the official data from pickle file, or encode the official data
+        # only the attributes are pickled, like in _load_or_build
+        try:
+            logger.info("try to load encoded official data from pickle file ...")
+            dump = pickle.load(open(os.path.join(self.cwd, "official-encoded.p"), "rb"))
+            self.official = EncodedOfficial.__new__(EncodedOfficial)
+            self.official.__dict__.update(dump["state"])
+            logger.info("Encoded official data loaded from pickle file!")
             return True
+        except Exception as e:
+            logger.warning(f"Unable to load encoded official data pickle file ({e}).. initialize!")
+
+        self.load_official(file_glob)
+        logger.info("Encode official data ...")
+        self.official = EncodedOfficial(self.official)
+        logger.info(f"Encoded official data uses {self.official.memory_usage() / 1024**2:.2f} MB")
+        logger.info("dump encoded official data to official-encoded.p ...")
+        pickle.dump({"class": "EncodedOfficial", "state": self.official.__dict__},
+                    open(os.path.join(self.cwd, "official-encoded.p"), "wb"), protocol=4)
+        return True
+
+    @instrumented("load_official")
+    def load_official_partitions(self, file_glob=None):
+        # open the partitioned official data, or partition the csv files first
+        # self.official becomes a lazy dask DataFrame of all partitions
+        if self.partitions is None:
+            try:
+                self.partitions = OfficialPartitions(self.partition_dir)
+                logger.info(f"Official data partitions loaded from {self.partition_dir}!")
+            except Exception as e:
+                logger.warning(f"Unable to load official data partitions ({e}).. initialize!")
+                files = sorted(glob.glob(file_glob)) if file_glob else []
+                if not files:
+                    raise ValueError(f"Unable to partition official data from this glob: {file_glob} - is your "
+                                     "[compressed] official folder correctly configured and did you run the "
+                                     "downloader?")
+                self.partitions = OfficialPartitions.build(files, self.partition_dir, self.partition_block,
+                                                           self.partition_hours, self.progress)
+        self.official = self.partitions.collection()
+        return True
 
+    def _partitioned(self):
+        # True if the official data is kept on disk as OfficialPartitions (outofcore = true), opens them if needed
+        if not self.out_of_core:
+            return False
+        self.official
+        return True
+
+    def _read_partitions(self, stage, **conditions):
+        # read matching rows from the official data partitions, see OfficialPartitions.read()
+        df, scanned = self.partitions.read(**conditions)
+        self.metrics.add_rows(stage, scanned, len(df.index))
+        return df
+
+    @instrumented("load_unofficial")
     def load_unofficial(self, file_glob=None):
         # load unofficial data from pickle file or initialize from files
         try:
             logger.info("try to load unofficial data from pickle file ....")
-            self.unofficial = pickle.load(open(os.path.join(self.cwd, "unofficial.p"), "rb"))
+            unofficial = pickle.load(open(os.path.join(self.cwd, "unofficial.p"), "rb"))
             logger.info("Unofficial data loaded from pickle file!")
+            if "ambiguous" in unofficial.columns:
+                self.unofficial = unofficial
+                return True
+            # pickled before the coordinates were resolved, or right after ingesting the csv files
+            self.unofficial = self._resolve_unofficial(unofficial)
+            logger.info("dump unofficial data to unofficial.p ...")
+            pickle.dump(self.unofficial, open(os.path.join(self.cwd, "unofficial.p"), "wb"))
             return True
         except Exception as e:
             logger.warning(f"Unable to load unofficial data pickle file ({e}).. initialize!")
 
         if not file_glob:
             raise ValueError("Missing file_glob for unofficial compressed files!")
-        self.unofficial = self.load_csv(file_glob, reduce_mem=True)
+        unofficial = self.load_csv(file_glob, reduce_mem=True)
+        if unofficial is not None:
+            # the snapshots overlap, files written before the downloader dropped duplicates repeat most records
+            rows = len(unofficial.index)
+            unofficial = unofficial.drop_duplicates(ignore_index=True)
+            logger.info(f"Dropped {rows - len(unofficial.index)} duplicate unofficial records "
+                        f"({(rows - len(unofficial.index)) / max(rows, 1):.1%})")
+            unofficial = self._resolve_unofficial(unofficial)
+        self.unofficial = unofficial
         try:
             self.unofficial
         except Exception:
@@ -269,13 +2426,72 @@ class PlaceData():
         else:
             logger.info("dump unofficial data to unofficial.p ...")
             pickle.dump(self.unofficial, open(os.path.join(self.cwd, "unofficial.p"), "wb"))
-            return True
+            # resolve the coordinates in a separate pass from the pickle file, it needs the official data and its
+            # indexes, which shouldn't add up with the memory peak of the csv ingest
+            del unofficial
+            del self.unofficial
+            return self.load_unofficial()
+
+    def _resolve_unofficial(self, unofficial):
+        # canonical coordinates of the unofficial records: the coordinates of the canvas expansions are inconsistent,
+        # a coordinate below 1000 placed after the expansion of its axis could actually be coordinate + 1000
+        # (records up to an hour before the expansions count as after, in case the clocks differ)
+        # such records are checked against the official data: if exactly one of the candidate pixels was edited
+        # within the same second, that's the pixel, otherwise the record stays ambiguous
+        # returns the records with resolved pixel_x / pixel_y and a column ambiguous: bit 1 if pixel_x may be
+        # pixel_x + 1000, bit 2 if pixel_y may be pixel_y + 1000
+        ts = unofficial.timestamp.values.astype(np.int64)
+        x = unofficial.pixel_x.values.astype(np.int64)
+        y = unofficial.pixel_y.values.astype(np.int64)
+        ambiguous = (((ts >= expansion_x - 3600000) & (x < 1000)).astype(np.int8) |
+                     ((ts >= expansion_y - 3600000) & (y < 1000)).astype(np.int8) << 1)
+        todo = np.flatnonzero(ambiguous)
+        logger.info(f"{len(todo)} of {len(ts)} unofficial records have ambiguous coordinates")
+        if len(todo) and self._partitioned():
+            logger.warning("Unable to check ambiguous unofficial coordinates against the official data in "
+                           "out-of-core mode, they stay ambiguous")
+        elif len(todo):
+            # the official data and indexes loaded just for this are dropped again afterwards
+            loaded = [name for name in ["_official", "tile_index", "pixel_history"] if getattr(self, name) is not None]
+            ts_from = ts[todo] // 1000 * 1000
+            candidates = []
+            for dx, dy in [(0, 0), (1000, 0), (0, 1000), (1000, 1000)]:
+                possible = ((dx == 0) | (ambiguous[todo] & 1 > 0)) & ((dy == 0) | (ambiguous[todo] & 2 > 0))
+                edited = self._count_edits(x[todo] + dx, y[todo] + dy, ts_from, ts_from + 1000) > 0
+                candidates.append(possible & edited)
+            found = np.sum(candidates, axis=0)
+            unique = found == 1
+            which = np.argmax(candidates, axis=0)
+            resolved = todo[unique]
+            x[resolved] += np.array([0, 1000, 0, 1000])[which[unique]]
+            y[resolved] += np.array([0, 0, 1000, 1000])[which[unique]]
+            ambiguous[resolved] = 0
+            logger.info(f"Resolved {len(resolved)} of them via the official data")
+            for name in ["_official", "tile_index", "pixel_history"]:
+                if name not in loaded:
+                    setattr(self, name, None)
+        return unofficial.assign(pixel_x=x.astype(unofficial.pixel_x.dtype), pixel_y=y.astype(unofficial.pixel_y.dtype),
+                                 ambiguous=ambiguous)
+
+    def _count_edits(self, x, y, ts_from, ts_to):
+        # number of official edits of every pixel x[i], y[i] with ts_from[i] <= timestamp < ts_to[i], vectorized as
+        # the difference of two searches in the pixel histories (0 outside of the canvas)
+        x, y = np.asarray(x, dtype=np.int64), np.asarray(y, dtype=np.int64)
+        ts_from, ts_to = np.broadcast_to(ts_from, x.shape), np.broadcast_to(ts_to, x.shape)
+        index = self._tile_index_or_build()
+        history = self._get_pixel_history()
+        counts = np.zeros(len(x), dtype=np.int64)
+        inside = np.flatnonzero((x >= 0) & (x < canvas_size) & (y >= 0) & (y < canvas_size))
+        slots = index.slot(x[inside], y[inside])
+        counts[inside] = (history.search(index, slots, ts_to[inside].astype(np.int64) - 1) -
+                          history.search(index, slots, ts_from[inside].astype(np.int64) - 1))
+        return counts
 
     def load_csv(self, file_glob=None, reduce_mem=False):
         # load multiple csv files to dask DataFrames and concat them
 
         # this needs a LOT of RAM, so drop everything that's eating it up ...
-        # there's a loop in __init__ to make sure everything is loaded in the end
+        # the dropped data is loaded again (from pickle) on its next access
         try:
             del self.official
             del self.unofficial
@@ -295,15 +2511,16 @@ class PlaceData():
         else:
             return dd.concat(dfs).compute()
 
-    def get_rows_by_username(self, username=None):
+    def get_rows_by_username(self, username=None, ts_from=None, ts_to=None):
         # wrapper to get_rows_by_uid to get rows by one or multiple username(s)
+        # optionally restricted to the time window ts_from <= timestamp < ts_to (ms after start)
         if isinstance(username, list):
             ouid = []
             for user in username:
                 ouid.append(self.__internal_get_ouid(user))
         else:
             ouid = self.__internal_get_ouid(username)
-        return self._get_rows_by_uid(ouid)
+        return self._get_rows_by_uid(ouid, ts_from, ts_to)
 
     def get_color_ranking_by_username(self, username=None):
         # returns DataFrame containing the ranking of colors most used by the user(s)
@@ -320,28 +2537,647 @@ class PlaceData():
             self.cache.set(username, "ouid", ouid)
         return ouid
 
-    def _get_rows_by_uid(self, uid=None):
-        # returns dataframe of official data rows for one or multiple user ids
-        if isinstance(uid, list):
-            return self.official[self.official.user_id.isin(uid)].sort_values(by="timestamp") if uid else pd.DataFrame()
+    def _official_fingerprint(self):
+        # cheap fingerprint of the official data, to detect indexes built for another version of it
+        if self._partitioned():
+            return self.partitions.fingerprint
+        fingerprint = [self._official_rows()]
+        for col in ["timestamp", "user_id", "pixel_x", "pixel_y"]:
+            fingerprint.append(int(self._column(col).sum(dtype=np.int64)))
+        return tuple(fingerprint)
+
+    def _encoded(self):
+        # True if the official data is kept as EncodedOfficial
+        return isinstance(self.official, EncodedOfficial)
+
+    def _official_rows(self):
+        # number of official rows
+        return len(self.official) if self._encoded() else len(self.official.index)
+
+    def _column(self, name):
+        # one column of the official data as numpy array (decoded if the official data is encoded)
+        if self._encoded():
+            return self.official.column(name)
+        return self.official[name].values
+
+    def _column_at(self, name, positions):
+        # the values of one column of the official data at the given row positions
+        if self._encoded():
+            return self.official.values(name, positions)
+        return self.official[name].values[positions]
+
+    def _load_or_build(self, filename, build, valid=None):
+        # load a derived structure from a pickle file in the working dir, or build and dump it if the file is missing
+        # or was built from other data (its fingerprint attribute / valid(obj) decides)
+        # only the attributes are pickled, so the file can be loaded no matter if this file runs as __main__ or not
+        fingerprint = self._official_fingerprint()
+        try:
+            dump = pickle.load(open(os.path.join(self.cwd, filename), "rb"))
+            obj = globals()[dump["class"]].__new__(globals()[dump["class"]])
+            obj.__dict__.update(dump["state"])
+            if getattr(obj, "fingerprint", None) == fingerprint and (valid is None or valid(obj)):
+                logger.info(f"{filename} loaded!")
+                return obj
+            logger.warning(f"{filename} is outdated ... rebuild!")
+        except Exception as e:
+            logger.warning(f"Unable to load {filename} ({e}).. initialize!")
+        if self._partitioned():
+            raise ValueError(f"{filename} can't be built in out-of-core mode, build it once with outofcore = false")
+        obj = build(fingerprint)
+        if self.live_stats["rows_compacted"]:
+            # the pickle files stay those of the base data loaded at startup
+            return obj
+        logger.info(f"dump to {filename} ...")
+        pickle.dump({"class": type(obj).__name__, "state": obj.__dict__}, open(os.path.join(self.cwd, filename), "wb"),
+                    protocol=4)
+        return obj
+
+    @instrumented("load_tile_index")
+    def load_tile_index(self):
+        # load the spatial tile index from pickle file or build it from the official data
+        def build(fingerprint):
+            logger.info(f"Build tile index with {self.tilesize}x{self.tilesize} tiles ...")
+            return TileIndex(self._column("pixel_x"), self._column("pixel_y"),
+                             self._column("timestamp"), self.tilesize, fingerprint)
+
+        self.tile_index = self._load_or_build("tileindex.p", build, lambda index: index.tilesize == self.tilesize)
+        return True
+
+    def _get_tile_index(self):
+        # return the tile index, loading it on first use (None if disabled in the config)
+        if not self.use_tile_index:
+            return None
+        if self.tile_index is None:
+            with self.index_lock:
+                if self.tile_index is None:
+                    self.load_tile_index()
+        return self.tile_index
+
+    @instrumented("load_user_index")
+    def load_user_index(self):
+        # load the user index from pickle file or build it from the official data
+        def build(fingerprint):
+            logger.info("Build user index ...")
+            return UserIndex(self._column("user_id"), fingerprint)
+
+        self.user_index = self._load_or_build("userindex.p", build)
+        return True
+
+    def _get_user_index(self):
+        # return the user index, loading it on first use (None if disabled in the config)
+        if not self.use_user_index:
+            return None
+        if self.user_index is None:
+            with self.index_lock:
+                if self.user_index is None:
+                    self.load_user_index()
+        return self.user_index
+
+    @instrumented("load_pixel_heat")
+    def load_pixel_heat(self):
+        # load the per-pixel summed-area tables from pickle file or build them from the official data
+        def build(fingerprint):
+            logger.info("Build per-pixel edit count tables ...")
+            return PixelHeat(self._column("pixel_x"), self._column("pixel_y"),
+                             self._column("timestamp"), fingerprint)
+
+        self.pixel_heat = self._load_or_build("heat.p", build)
+        return True
+
+    def _get_pixel_heat(self):
+        # return the per-pixel summed-area tables, loading them on first use
+        if self.pixel_heat is None:
+            with self.index_lock:
+                if self.pixel_heat is None:
+                    self.load_pixel_heat()
+        return self.pixel_heat
+
+    @instrumented("load_activity_cube")
+    def load_activity_cube(self):
+        # load the time x color x tile activity cube from pickle file or build it from the official data
+        def build(fingerprint):
+            logger.info(f"Build activity cube with {self.cube_tilesize}x{self.cube_tilesize} tiles and "
+                        f"{self.cube_minutes} minute buckets ...")
+            return ActivityCube(self._column("pixel_x"), self._column("pixel_y"), self._column("pixel_color"),
+                                self._column("timestamp"), self.cube_tilesize, self.cube_minutes, fingerprint)
+
+        self.activity_cube = self._load_or_build("activity.p", build, lambda cube: cube.tilesize == self.cube_tilesize
+                                                 and cube.bucket_ms == self.cube_minutes * 60000)
+        return True
+
+    def _get_activity_cube(self):
+        # return the activity cube, loading it on first use
+        if self.activity_cube is None:
+            with self.index_lock:
+                if self.activity_cube is None:
+                    self.load_activity_cube()
+        return self.activity_cube
+
+    @instrumented("load_space_time_grid")
+    def load_space_time_grid(self):
+        # load the space-time cell index from pickle file or build it from the official data
+        def build(fingerprint):
+            logger.info(f"Build space-time grid with {self.neighbor_cellsize}x{self.neighbor_cellsize} pixel, "
+                        f"{self.neighbor_seconds} second cells ...")
+            return SpaceTimeGrid(self._column("pixel_x"), self._column("pixel_y"), self._column("timestamp"),
+                                 self.neighbor_cellsize, self.neighbor_seconds, fingerprint)
+
+        self.space_time_grid = self._load_or_build("spacetime.p", build,
+                                                   lambda grid: grid.cellsize == self.neighbor_cellsize
+                                                   and grid.bucket_ms == self.neighbor_seconds * 1000)
+        return True
+
+    def _get_space_time_grid(self):
+        # return the space-time grid, loading it on first use
+        if self._partitioned():
+            raise ValueError("The space-time grid refers to row positions of the official data in memory, not "
+                             "available in out-of-core mode")
+        if self.space_time_grid is None:
+            with self.index_lock:
+                if self.space_time_grid is None:
+                    self.load_space_time_grid()
+        return self.space_time_grid
+
+    @instrumented("load_user_sketches")
+    def load_user_sketches(self):
+        # load the distinct user sketches per tile from pickle file or build them from the official data
+        def build(fingerprint):
+            logger.info(f"Build distinct user sketches for {self.tilesize}x{self.tilesize} tiles ...")
+            return UserSketches(self._column("pixel_x"), self._column("pixel_y"),
+                                self._column("user_id"), self.tilesize, self.sketch_error, fingerprint)
+
+        self.user_sketches = self._load_or_build(
+            "sketches.p", build,
+            lambda sketches: sketches.tilesize == self.tilesize and sketches.error == self.sketch_error)
+        return True
+
+    def _get_user_sketches(self):
+        # return the distinct user sketches, loading them on first use
+        if self.user_sketches is None:
+            with self.index_lock:
+                if self.user_sketches is None:
+                    self.load_user_sketches()
+        return self.user_sketches
+
+    @instrumented("load_user_aggregates")
+    def load_user_aggregates(self):
+        # load the per-user aggregate table from pickle file or build it in one pass over the official data
+        def build(fingerprint):
+            logger.info("Build per-user aggregates ...")
+            index = self._tile_index_or_build()
+            return UserAggregates(self._column("user_id"), self._column("timestamp"), self._column("pixel_color"),
+                                  index, fingerprint)
+
+        self.user_aggregates = self._load_or_build("useraggregates.p", build)
+        return True
+
+    def _get_user_aggregates(self):
+        # return the per-user aggregate table, loading it on first use
+        if self.user_aggregates is None:
+            with self.index_lock:
+                if self.user_aggregates is None:
+                    self.load_user_aggregates()
+        return self.user_aggregates
+
+    @instrumented("load_user_regularity")
+    def load_user_regularity(self, processes=None):
+        # load the per-user interval statistics from pickle file or build them in one pass over the official data
+        # grouped by user id, split into user id ranges of about equal rows computed by forked worker processes
+        def build(fingerprint):
+            global _worker_data
+            logger.info("Build per-user interval statistics ...")
+            if self.user_index is None:
+                self.load_user_index()
+            offsets = self.user_index.offsets
+            nusers = len(offsets) - 1
+            chunks = max(1, min(nusers, 8 * (processes or os.cpu_count() or 1)))
+            bounds = np.unique(np.searchsorted(offsets, np.linspace(0, offsets[-1], chunks + 1), side="right") - 1)
+            bounds[-1] = nusers
+            tasks = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+            _worker_data = self
+            try:
+                try:
+                    pool = multiprocessing.get_context("fork").Pool(processes)
+                    results = pool.imap_unordered(_regularity_worker, tasks)
+                except ValueError:
+                    # no fork on this platform, compute in this process
+                    pool = None
+                    results = map(_regularity_worker, tasks)
+                parts = list(tqdm(results, total=len(tasks), desc="Measuring intervals", unit="chunks",
+                                  disable=not self.progress))
+                if pool is not None:
+                    pool.close()
+                    pool.join()
+            finally:
+                _worker_data = None
+            return UserRegularity(parts, nusers, self.cooldown * 1000, self.cooldown_tolerance * 1000,
+                                  self.session_gap * 60000, self.bot_min_edits, fingerprint)
+
+        self.user_regularity = self._load_or_build(
+            "regularity.p", build, lambda regularity: (regularity.cooldown, regularity.tolerance, regularity.gap,
+                                                       regularity.min_edits) ==
+            (self.cooldown * 1000, self.cooldown_tolerance * 1000, self.session_gap * 60000, self.bot_min_edits))
+        return True
+
+    def _get_user_regularity(self):
+        # return the per-user interval statistics, loading them on first use
+        if self.user_regularity is None:
+            with self.index_lock:
+                if self.user_regularity is None:
+                    self.load_user_regularity()
+        return self.user_regularity
+
+    @instrumented("load_edit_links")
+    def load_edit_links(self):
+        # load the previous/next edit columns from pickle file or build them from the official data
+        def build(fingerprint):
+            logger.info("Build previous/next edit links ...")
+            index = self._tile_index_or_build()
+            return EditLinks(index, fingerprint)
+
+        self.edit_links = self._load_or_build("editlinks.p", build)
+        return True
+
+    def _get_edit_links(self):
+        # return the previous/next edit columns, loading them on first use
+        if self._partitioned():
+            raise ValueError("The previous/next edit columns refer to row positions of the official data in memory, "
+                             "not available in out-of-core mode")
+        if self.edit_links is None:
+            with self.index_lock:
+                if self.edit_links is None:
+                    self.load_edit_links()
+        return self.edit_links
+
+    def load_pixel_history(self):
+        # load the timestamps in the order of the tile index from pickle file or build them from the official data
+        def build(fingerprint):
+            logger.info("Build pixel histories ...")
+            return PixelHistory(self._tile_index_or_build(), self._column("timestamp"), fingerprint)
+
+        self.pixel_history = self._load_or_build("pixelhistory.p", build,
+                                                 lambda history: history.tilesize == self.tilesize)
+        return True
+
+    def _get_pixel_history(self):
+        # return the pixel histories, loading them on first use
+        if self._partitioned():
+            raise ValueError("The pixel histories need the official data in memory, not available in out-of-core mode")
+        if self.pixel_history is None:
+            with self.index_lock:
+                if self.pixel_history is None:
+                    self.load_pixel_history()
+        return self.pixel_history
+
+    def _tile_index_or_build(self):
+        # the tile index, or a temporary one if it's disabled in the config
+        index = self._get_tile_index()
+        if index is None:
+            index = TileIndex(self._column("pixel_x"), self._column("pixel_y"), self._column("timestamp"),
+                              self.tilesize)
+        return index
+
+    @instrumented("load_edit_survival")
+    def load_edit_survival(self):
+        # load the survival time of every edit from pickle file or compute it from the edit links
+        def build(fingerprint):
+            logger.info("Compute pixel survival times ...")
+            return EditSurvival(self._column("timestamp"), self._get_edit_links().next_edit, fingerprint)
+
+        self.edit_survival = self._load_or_build("survival.p", build)
+        return True
+
+    def _get_edit_survival(self):
+        # return the survival times, loading them on first use
+        if self._partitioned():
+            raise ValueError("The survival times refer to row positions of the official data in memory, not "
+                             "available in out-of-core mode")
+        if self.edit_survival is None:
+            with self.index_lock:
+                if self.edit_survival is None:
+                    self.load_edit_survival()
+        return self.edit_survival
+
+    def _uid_positions(self, uid):
+        # row positions of all official rows of one or multiple user id(s)
+        uids = uid if isinstance(uid, list) else [uid]
+        index = self._get_user_index()
+        if index is not None:
+            positions = np.sort(index.positions(uids))
+            self.metrics.add_rows("row_fetching", len(positions), len(positions))
+            return positions
+        if self._encoded():
+            positions = self.official.select(user_ids=uids)
+        else:
+            positions = np.flatnonzero(np.isin(self.official.user_id.values, uids))
+        self.metrics.add_rows("row_fetching", self._official_rows(), len(positions))
+        return positions
+
+    def _time_range(self, ts_from=None, ts_to=None):
+        # start and end row position of the time window if the official timestamps are sorted, else None
+        ts = self.official.timestamp.values
+        if self.timestamps_sorted is None:
+            with self.index_lock:
+                if self.timestamps_sorted is None:
+                    # chunk-wise, so the check doesn't need a copy of the whole column
+                    chunk = 1 << 24
+                    self.timestamps_sorted = not any((ts[i + 1:i + chunk + 1] < ts[i:i + chunk][:len(ts) - i - 1]).any()
+                                                     for i in range(0, max(len(ts) - 1, 0), chunk))
+        if not self.timestamps_sorted:
+            return None
+        lo = 0 if ts_from is None else int(np.searchsorted(ts, ts_from, side="left"))
+        hi = len(ts) if ts_to is None else int(np.searchsorted(ts, ts_to, side="left"))
+        return lo, max(lo, hi)
+
+    def _plan(self, q):
+        # choose the access path with the fewest candidate rows for the Query q
+        # returns dict with the chosen "path", its "rows", the row counts of all considered paths as "costs" and a
+        # function "positions" returning the candidate row positions
+        paths = {}
+        if self._partitioned():
+            conditions = self._partition_conditions(q)
+            rows = sum(self.partitions.partitions[i]["rows"] for i in self.partitions.candidates(**conditions))
+            return {"path": "partitions", "rows": rows, "costs": {"partitions": rows}, "positions": None}
+
+        tile_index = self._get_tile_index()
+        pixels = q.pixel_list()
+        if tile_index is not None and pixels is not None:
+            slots = [int(tile_index.slot(px, py)) for px, py in pixels
+                     if 0 <= px < canvas_size and 0 <= py < canvas_size]
+            starts, ends = tile_index.offsets[slots], tile_index.offsets[np.asarray(slots, dtype=np.int64) + 1]
+            paths["pixel index"] = (int((ends - starts).sum()),
+                                    lambda: tile_index.order[ranges_to_positions(starts, ends)])
+        elif tile_index is not None and (q.x is not None or q.y is not None):
+            xa, xb = q.x or (0, canvas_size - 1)
+            ya, yb = q.y or (0, canvas_size - 1)
+            starts, ends = tile_index.rectangle_ranges(xa, ya, xb, yb)
+            paths["tile index"] = (int((ends - starts).sum()),
+                                   lambda: tile_index.order[ranges_to_positions(starts, ends)])
+
+        user_index = self._get_user_index() if q.users is not None else None
+        if user_index is not None:
+            paths["user index"] = (user_index.count(q.users), lambda: user_index.positions(q.users))
+
+        if self._encoded():
+            # block-wise scan of the encoded columns, skipping the blocks outside of the time window
+            blocks = np.ones(self.official.blocks, dtype=bool)
+            if q.ts_from is not None:
+                blocks &= self.official.ts_max >= q.ts_from
+            if q.ts_to is not None:
+                blocks &= self.official.ts_min < q.ts_to
+            rows = min(int(blocks.sum()) << self.official.block_bits, self._official_rows())
+            xa, xb = q.x or (None, None)
+            ya, yb = q.y or (None, None)
+            paths["encoded scan"] = (rows, lambda: self.official.select(xa, ya, xb, yb, q.ts_from, q.ts_to,
+                                                                        None if q.users is None else q.users.tolist()))
+        else:
+            if q.ts_from is not None or q.ts_to is not None:
+                window = self._time_range(q.ts_from, q.ts_to)
+                if window is not None:
+                    paths["time range"] = (window[1] - window[0], lambda: np.arange(*window, dtype=np.int64))
+            paths["full scan"] = (self._official_rows(), lambda: None)
+        path = min(paths, key=lambda name: paths[name][0])
+        return {"path": path, "rows": paths[path][0], "costs": {name: cost[0] for name, cost in paths.items()},
+                "positions": paths[path][1]}
+
+    def _query_memory(self, q):
+        # estimated peak memory of running the Query q in bytes, from the candidate rows of its plan
+        return self._plan(q)["rows"] * MemoryScheduler.row_bytes
+
+    def _image_memory(self):
+        # estimated peak memory of generating one image in bytes: the canvas, its darkened copy and the sample
+        # (RGBA), and the scaled up image
+        return (3 * canvas_size ** 2 + image_size ** 2) * 4
+
+    def _partition_conditions(self, q):
+        # the conditions of Query q OfficialPartitions.read() can push down
+        conditions = {"ts_from": q.ts_from, "ts_to": q.ts_to,
+                      "user_ids": None if q.users is None else q.users.tolist()}
+        xs = [px for px, py in q.pixels] if q.pixels is not None else None
+        ys = [py for px, py in q.pixels] if q.pixels is not None else None
+        for name, bounds, values in [("x", q.x, xs), ("y", q.y, ys)]:
+            low, high = bounds if bounds else (None, None)
+            if values:
+                low = min(values) if low is None else max(low, min(values))
+                high = max(values) if high is None else min(high, max(values))
+            conditions[f"{name}a"], conditions[f"{name}b"] = low, high
+        return conditions
+
+    def _filter(self, positions, q):
+        # keep the row positions matching all conditions of Query q, evaluated vectorized on the candidate rows only
+        # (positions None: all rows)
+        columns = {}
+
+        def column(name):
+            if name not in columns:
+                values = self._column(name) if positions is None else self._column_at(name, positions)
+                columns[name] = values.astype(np.int64, copy=False)
+            return columns[name]
+
+        keep = q.mask(column, self._official_rows() if positions is None else len(positions))
+        return np.flatnonzero(keep) if positions is None else positions[keep]
+
+    def _run_query(self, q, stage="query"):
+        # execute Query q and return the matching rows in their original order, in live mode followed by the matching
+        # rows of the delta segment
+        if self.live is None:
+            return self._run_base_query(q, stage)
+
+        def merged():
+            df = self._run_base_query(q, stage)
+            view = self.live.snapshot()
+            positions = LiveSegment.select(view, q)
+            if not len(positions):
+                return df
+            return pd.concat([df, LiveSegment.frame(view, positions, df.dtypes, self._official_rows())])
+
+        return self.live.consistent(merged)
+
+    def _run_base_query(self, q, stage="query"):
+        # execute Query q on the base data and return the matching rows in their original order
+        plan = self._plan(q)
+        if plan["path"] == "partitions":
+            df = self._read_partitions(stage, **self._partition_conditions(q))
+            if q.colors is not None:
+                df = df[df.pixel_color.isin(q.colors)]
+            if q.pixels is not None:
+                keys = np.array([px << 16 | py for px, py in q.pixels], dtype=np.int64)
+                df = df[np.isin(df.pixel_x.values.astype(np.int64) << 16 | df.pixel_y.values, keys)]
+            return df
+        positions = plan["positions"]()
+        positions = self._filter(None if positions is None else np.asarray(positions, dtype=np.int64), q)
+        self.metrics.add_rows(stage, plan["rows"], len(positions))
+        return self._take(positions)
+
+    @instrumented("query")
+    def query(self, q=None, **conditions):
+        # rows of the official data matching a Query, or the conditions of one as keyword arguments
+        # example: data.query(x=(100, 200), y=(100, 200), ts_to=whiteout_short, colors=[7])
+        return self._run_query(q if q is not None else Query(**conditions))
+
+    def explain(self, q=None, **conditions):
+        # describe how query() would find the rows: chosen access path, rows it reads and remaining filters
+        q = q if q is not None else Query(**conditions)
+        plan = self._plan(q)
+        costs = ", ".join(f"{name} {rows:,} rows" for name, rows in sorted(plan["costs"].items(),
+                                                                           key=lambda item: item[1]))
+        lines = [repr(q),
+                 f"access path: {plan['path']} ({plan['rows']:,} rows)",
+                 f"considered: {costs}",
+                 f"filters on the candidate rows: {' and '.join(q.conditions()) or 'none'}"]
+        if self.live is not None:
+            lines.append(f"live delta segment: {self.live.rows:,} rows, searched by its pixel/user keys")
+        return "\n".join(lines)
+
+    def _take(self, positions):
+        # official rows at the given positions, in original order
+        if self._encoded():
+            return self.official.take(np.sort(positions))
+        return self.official.iloc[np.sort(positions)]
+
+    def _arrow_schema(self, columns):
+        # Arrow schema of the given official columns, with their dtypes in memory (or in the partitions)
+        import pyarrow as pa
+
+        if self._partitioned():
+            dtypes = [np.dtype(OfficialPartitions.columns[col]) for col in columns]
+        else:
+            dtypes = [self._column_at(col, np.empty(0, dtype=np.int64)).dtype for col in columns]
+        return pa.schema([(col, pa.from_numpy_dtype(dtype)) for col, dtype in zip(columns, dtypes)])
+
+    def _column_slice(self, name, first, end):
+        # one column of the official data at the row positions first <= position < end, as view of the column unless
+        # the official data is encoded
+        if self._encoded():
+            return self.official.values(name, np.arange(first, end))
+        return self.official[name].values[first:end]
+
+    def get_column_slice(self, first=0, end=None, columns=None):
+        # the official rows at positions first <= position < end as Arrow RecordBatch, which shares the memory of the
+        # official columns (decoded if the official data is encoded)
+        import pyarrow as pa
+
+        if self._partitioned():
+            raise ValueError("Row positions need the official data in memory, use query_batches() in out-of-core mode")
+        columns = columns or list(OfficialPartitions.columns)
+        end = self._official_rows() if end is None else min(end, self._official_rows())
+        first = min(max(first, 0), end)
+        return pa.RecordBatch.from_arrays([pa.array(self._column_slice(col, first, end)) for col in columns],
+                                          schema=self._arrow_schema(columns))
+
+    def query_batches(self, q=None, columns=None, batch_rows=None, **conditions):
+        # the official rows matching a Query (or the conditions of one as keyword arguments) as Arrow RecordBatches of
+        # up to batch_rows rows (default: exportbatchrows), without building a DataFrame like query() does
+        # the rows are in their original order, in out-of-core mode partition by partition
+        # without conditions (or only a time window if the timestamps are sorted) the batches are column slices sharing
+        # the memory of the official data, otherwise every batch gathers its rows once
+        import pyarrow as pa
+
+        q = q if q is not None else Query(**conditions)
+        columns = columns or list(OfficialPartitions.columns)
+        batch_rows = batch_rows or self.export_batch_rows
+        schema = self._arrow_schema(columns)
+        if self._partitioned():
+            # the columns the partitions can't filter by are filtered on the batches
+            needed = columns + [col for col, values in [("pixel_color", q.colors), ("pixel_x", q.pixels),
+                                                        ("pixel_y", q.pixels)]
+                                if values is not None and col not in columns]
+            batches, scanned = self.partitions.batches(needed, batch_rows, **self._partition_conditions(q))
+            returned = 0
+            for batch in batches:
+                keep = np.ones(batch.num_rows, dtype=bool)
+                if q.colors is not None:
+                    keep &= np.isin(batch.column("pixel_color").to_numpy(), q.colors)
+                if q.pixels is not None:
+                    keys = np.array([px << 16 | py for px, py in q.pixels], dtype=np.int64)
+                    keep &= np.isin(batch.column("pixel_x").to_numpy().astype(np.int64) << 16 |
+                                    batch.column("pixel_y").to_numpy(), keys)
+                if not keep.all():
+                    batch = batch.filter(pa.array(keep))
+                if batch.num_rows:
+                    returned += batch.num_rows
+                    yield pa.RecordBatch.from_arrays([batch.column(col) for col in columns], schema=schema)
+            self.metrics.add_rows("export", scanned, returned)
+            return
+
+        plan = self._plan(q)
+        window = None
+        if not q.conditions():
+            window = (0, self._official_rows())
+        elif plan["path"] == "time range" and len(q.conditions()) == (q.ts_from is not None) + (q.ts_to is not None):
+            window = self._time_range(q.ts_from, q.ts_to)
+        if window is not None:
+            self.metrics.add_rows("export", window[1] - window[0], window[1] - window[0])
+            for first in range(window[0], window[1], batch_rows):
+                end = min(first + batch_rows, window[1])
+                yield pa.RecordBatch.from_arrays([pa.array(self._column_slice(col, first, end)) for col in columns],
+                                                 schema=schema)
         else:
-            return self.official[(self.official["user_id"] == uid)].sort_values(by="timestamp") if uid else \
-                pd.DataFrame()
+            positions = plan["positions"]()
+            positions = np.sort(self._filter(None if positions is None else np.asarray(positions, dtype=np.int64), q))
+            self.metrics.add_rows("export", plan["rows"], len(positions))
+            for first in range(0, len(positions), batch_rows):
+                rows = positions[first:first + batch_rows]
+                yield pa.RecordBatch.from_arrays([pa.array(self._column_at(col, rows)) for col in columns],
+                                                 schema=schema)
+
+        if self.live is not None:
+            # the rows of the live delta segment follow (a compaction while the batches are consumed can repeat or
+            # skip rows, use query() for a consistent result)
+            view = self.live.snapshot()
+            positions = LiveSegment.select(view, q)
+            for first in range(0, len(positions), batch_rows):
+                rows = positions[first:first + batch_rows]
+                yield pa.RecordBatch.from_arrays([pa.array(view["columns"][col][rows], type=field.type)
+                                                  for col, field in zip(columns, schema)], schema=schema)
+
+    @instrumented("export")
+    def export_query(self, sink, q=None, columns=None, batch_rows=None, ipc="stream", **conditions):
+        # write the official rows matching a Query (or the conditions of one as keyword arguments) batch by batch to
+        # sink (file path or writable binary file object) in the Arrow IPC stream or file format, so only one batch of
+        # the result is in memory at a time
+        # returns the number of rows written
+        # example: data.export_query("whiteout.arrows", ts_from=whiteout_short)
+        import pyarrow as pa
+
+        if ipc not in ["stream", "file"]:
+            raise ValueError(f"Unknown Arrow IPC format {ipc}, use stream or file")
+        columns = columns or list(OfficialPartitions.columns)
+        new_writer = pa.ipc.new_stream if ipc == "stream" else pa.ipc.new_file
+        out = pa.OSFile(sink, "wb") if isinstance(sink, str) else sink
+        rows = 0
+        try:
+            with new_writer(out, self._arrow_schema(columns)) as writer:
+                for batch in self.query_batches(q, columns, batch_rows, **conditions):
+                    writer.write_batch(batch)
+                    rows += batch.num_rows
+        finally:
+            if isinstance(sink, str):
+                out.close()
+        return rows
+
+    @instrumented("row_fetching")
+    def _get_rows_by_uid(self, uid=None, ts_from=None, ts_to=None):
+        # returns dataframe of official data rows for one or multiple user ids, sorted by timestamp
+        # optionally restricted to the time window ts_from <= timestamp < ts_to (ms after start)
+        if not uid:
+            return pd.DataFrame()
+        query = Query(users=uid, ts_from=ts_from, ts_to=ts_to)
+        return self._run_query(query, "row_fetching").sort_values(by="timestamp")
 
+    @instrumented("query_timestamp")
     def get_rows_by_ts(self, ts=None):
         # returns dataframe of rows matched by timestamp
-        return self.official[(self.official["timestamp"] == ts)] if ts else pd.DataFrame()
+        if not ts:
+            return pd.DataFrame()
+        return self._run_query(Query(ts_from=ts, ts_to=ts + 1), "query_timestamp")
 
+    @instrumented("query_coordinates")
     def get_rows_by_coords(self, x=None, y=None):
         # returns dataframe of rows matched by coordinates
-        if x is not None and y is not None:
-            return self.official[(self.official["pixel_x"] == x) & (self.official["pixel_y"] == y)]
-        elif x is not None:
-            return self.official[(self.official["pixel_x"] == x)]
-        elif y is not None:
-            return self.official[(self.official["pixel_y"] == y)]
-        else:
+        if x is None and y is None:
             return pd.DataFrame()
+        return self._run_query(Query(x=x, y=y), "query_coordinates")
 
     def _check_rectangle(self, a, b):
         # verify rectangle format: two tuples of upper left and lower right coordinates
@@ -356,15 +3192,15 @@ class PlaceData():
             return False
         return True
 
-    def get_rows_by_rectangle(self, a=None, b=None):
+    @instrumented("query_rectangle")
+    def get_rows_by_rectangle(self, a=None, b=None, ts_from=None, ts_to=None):
         # returns dataframe of all rows within a rectangle, defined by tuples of upper left, lower right coordinates
+        # optionally restricted to the time window ts_from <= timestamp < ts_to (ms after start)
         if not self._check_rectangle(a, b):
             return []
         xa, ya = a
         xb, yb = b
-        query = f"pixel_x >= {xa} and pixel_x <= {xb} and pixel_y >= {ya} and pixel_y <= {yb}"
-        df = self.official.query(query)
-        return df
+        return self._run_query(Query(x=(xa, xb), y=(ya, yb), ts_from=ts_from, ts_to=ts_to), "query_rectangle")
 
     def get_last_edit(self, x=None, y=None):
         # returns dataframe containing 1 row, which is the last edit of the given pixel (or empty if invalid input)
@@ -391,46 +3227,201 @@ class PlaceData():
             return pd.DataFrame()
 
 
+    @instrumented("colors_at")
+    def get_colors_at(self, xs=None, ys=None, ts=None):
+        # color of the pixels xs[i], ys[i] at the times ts[i] in ms after start (NumPy arrays or scalars, broadcast
+        # against each other), i.e. the last edit at or before ts[i], found by binary searches in the pixel histories
+        # returns DataFrame with pixel_color, user_id and timestamp of those edits in the order of the points, -1 if
+        # the pixel wasn't edited yet (still white) or is outside of the canvas
+        # example: data.get_colors_at(np.arange(2000), 500, whiteout_short - 1) - one line of the canvas
+        xs, ys, ts = [a.ravel() for a in np.broadcast_arrays(np.asarray(xs, dtype=np.int64),
+                                                             np.asarray(ys, dtype=np.int64),
+                                                             np.asarray(ts, dtype=np.int64))]
+        if self.live is not None:
+            return self.live.consistent(lambda: self._colors_at(xs, ys, ts))
+        return self._colors_at(xs, ys, ts)
+
+    def _colors_at(self, xs, ys, ts):
+        # see get_colors_at(), in live mode the later of the last edits in the base data and the delta segment
+        history = self._get_pixel_history()
+        index = self._tile_index_or_build()
+        inside = np.flatnonzero((xs >= 0) & (xs < canvas_size) & (ys >= 0) & (ys < canvas_size))
+        slots = index.slot(xs[inside], ys[inside])
+        last = history.search(index, slots, ts[inside]) - 1
+        edited = last >= index.offsets[slots]
+        rows = index.order[last[edited]]
+        points = inside[edited]
+        colors = {}
+        for col in ["pixel_color", "user_id", "timestamp"]:
+            values = self._column_at(col, rows)
+            colors[col] = np.full(len(xs), -1, dtype=values.dtype)
+            colors[col][points] = values
+        if self.live is not None:
+            view = self.live.snapshot()
+            delta = np.full(len(xs), -1, dtype=np.int64)
+            delta[inside] = LiveSegment.last_edits(view, xs[inside], ys[inside], ts[inside])
+            newer = delta >= 0
+            newer[newer] = view["columns"]["timestamp"][delta[newer]] >= colors["timestamp"][newer]
+            for col in colors:
+                values = view["columns"][col][delta[newer]]
+                colors[col] = colors[col].astype(LiveSegment.fitting_dtype(colors[col].dtype, values), copy=False)
+                colors[col][newer] = values
+        self.metrics.add_rows("colors_at", len(xs), len(points))
+        return pd.DataFrame(colors)
+
     def get_last_edit_before_whiteout(self, x=None, y=None):
         # returns dataframe containing 1 row, which is the last edit of the pixel before the whiteout started
         # (or empty if invalid input)
         if x is None or y is None:
             logger.warning(f"get_last_edit_before_whiteout: Invalid input! (x: {x}, y: {y})")
             return pd.DataFrame()
-        df = self.get_rows_by_coords(x, y)
-        query = f"timestamp < {whiteout_short}"
-        before_whiteout = df.query(query).sort_values(by="timestamp")
-        return before_whiteout.iloc[-1:]
+        before_whiteout = self._run_query(Query(x=x, y=y, ts_to=whiteout_short), "query_coordinates")
+        return before_whiteout.sort_values(by="timestamp").iloc[-1:]
 
     def get_unique_users_on_pixel(self, x=None, y=None):
         # returns list of unique user_ids who interacted with the given pixel
         if x is None or y is None:
             return []
+        index = self._get_tile_index()
+        if index is not None:
+            return pd.unique(self._column_at("user_id", np.sort(index.pixel_positions(x, y))))
         df = self.get_rows_by_coords(x, y)
         try:
             return df.user_id.unique()
         except Exception:
             return []
 
-    def get_unique_users_in_rectangle(self, a=None, b=None):
+    def get_unique_users_in_rectangle(self, a=None, b=None, ts_from=None, ts_to=None):
         # returns list of unique user_ids who interacted with any of the pixels in the given rectangle
         if not self._check_rectangle(a, b):
             return []
         try:
-            return self.get_rows_by_rectangle(a, b).user_id.unique()
+            return self.get_rows_by_rectangle(a, b, ts_from, ts_to).user_id.unique()
         except Exception:
             return []
 
+    @instrumented("query_unique_user_count")
+    def get_unique_user_count_in_rectangle(self, a=None, b=None, exact=False):
+        # returns the (approximate) number of distinct users who edited any pixel of the given rectangle
+        # merges the per-tile sketches of all fully covered tiles with the exact users of the partially covered
+        # ones, relative error is about sketcherror from the config (exact=True: count all users exactly)
+        if not self._check_rectangle(a, b):
+            return 0
+        index = self._get_tile_index()
+        if exact or index is None:
+            return len(self.get_unique_users_in_rectangle(a, b))
+        sketches = self._get_user_sketches()
+        xa, ya = max(a[0], 0), max(a[1], 0)
+        xb, yb = min(b[0], canvas_size - 1), min(b[1], canvas_size - 1)
+        if xa > xb or ya > yb:
+            return 0
+
+        # tiles within the rectangle, as far as they are on the canvas
+        t = self.tilesize
+        tiles = np.arange(sketches.tiles_per_row)
+        full_x = (tiles * t >= xa) & (np.minimum(tiles * t + t - 1, canvas_size - 1) <= xb)
+        full_y = (tiles * t >= ya) & (np.minimum(tiles * t + t - 1, canvas_size - 1) <= yb)
+        full = full_y[:, None] & full_x[None, :]
+        edge = index.order[ranges_to_positions(*index.rectangle_ranges(xa, ya, xb, yb, skip=full))]
+        self.metrics.add_rows("query_unique_user_count", len(edge), len(edge))
+        return sketches.count(np.flatnonzero(full.ravel()), self._column_at("user_id", edge))
+
+    def get_unique_user_count_on_pixel(self, x=None, y=None):
+        # returns the exact number of distinct users who edited the given pixel
+        return len(self.get_unique_users_on_pixel(x, y))
+
+    def get_edit_count_in_rectangle(self, a=None, b=None, kind="all"):
+        # returns the number of edits within a rectangle in constant time
+        # kind: "all", "pre_whiteout" (before the whiteout started) or "whiteout" (during the whiteout)
+        if not self._check_rectangle(a, b):
+            return 0
+        if kind not in PixelHeat.kinds:
+            raise ValueError(f"Invalid kind {kind}! Valid kinds: {PixelHeat.kinds}")
+        xa, ya = a
+        xb, yb = b
+        return self._get_pixel_heat().count(xa, ya, xb, yb, kind)
+
+    def _activity_selection(self, a, b, colors):
+        # tiles and colors for the activity methods, None if the rectangle is invalid
+        cube = self._get_activity_cube()
+        if a is None and b is None:
+            tiles = cube.tiles()
+        elif self._check_rectangle(a, b):
+            tiles = cube.tiles(a[0], a[1], b[0], b[1])
+        else:
+            return None
+        if colors is not None:
+            colors = np.unique(np.asarray(colors, dtype=np.int64).ravel())
+            if len(colors) and (colors.min() < 0 or colors.max() >= cube.colors):
+                raise ValueError(f"Invalid colors {colors.tolist()}! Valid colors: 0 to {cube.colors - 1}")
+        return tiles, colors
+
+    @instrumented("query_activity")
+    def get_activity(self, a=None, b=None, ts_from=None, ts_to=None, colors=None):
+        # number of edits within a time window (ms after start, rounded outwards to whole cubeminutes buckets) with
+        # the given color(s), in the tiles of cubetilesize x cubetilesize pixels touching the rectangle given by
+        # tuples of upper left and lower right coordinates (whole canvas if omitted), answered from the activity cube
+        selection = self._activity_selection(a, b, colors)
+        if selection is None:
+            return 0
+        return self._get_activity_cube().count(*selection, ts_from, ts_to)
+
+    @instrumented("query_activity")
+    def get_activity_curve(self, a=None, b=None, ts_from=None, ts_to=None, colors=None, minutes=None,
+                           cumulative=False):
+        # edits per time step like get_activity() as pandas Series indexed by the start of each step (UTC), e.g. to
+        # plot the activity of the whole event or an area: data.get_activity_curve(colors=[7]).plot()
+        # minutes: length of the steps (rounded to a multiple of cubeminutes), cumulative: running total instead
+        selection = self._activity_selection(a, b, colors)
+        if selection is None:
+            return pd.Series(dtype=np.int64, name="edits")
+        cube = self._get_activity_cube()
+        first, counts = cube.curve(*selection, ts_from, ts_to)
+        step = max(1, round((minutes or self.cube_minutes) / self.cube_minutes))
+        if step > 1:
+            counts = np.add.reduceat(counts, np.arange(0, len(counts), step)) if len(counts) else counts
+        if cumulative:
+            counts = np.cumsum(counts)
+        index = pd.to_datetime(start + (first + np.arange(len(counts)) * step) * cube.bucket_ms, unit="ms")
+        return pd.Series(counts, index=index, name="edits")
+
+    def get_edit_count_on_pixel(self, x=None, y=None, kind="all"):
+        # returns the number of edits of a single pixel in constant time
+        if x is None or y is None:
+            return 0
+        return self.get_edit_count_in_rectangle((x, y), (x, y), kind)
+
+    @instrumented("query_expression")
     def get_rows_by_expression(self, expression=None):
         # just an alias to df.query() for the official data
         # example: "pixel_x == 1 and pixel_y == 2"
         # use double quotes as outer quotes!
-        return self.official.query(expression)
+        # this always scans all rows (in out-of-core mode: reads all partitions), prefer query() which can use the
+        # indexes
+        if self._partitioned():
+            df = self.official.query(expression).compute()
+            self.metrics.add_rows("query_expression", self.partitions.rows, len(df.index))
+            return df
+        if self._encoded():
+            # decode and query block by block
+            frames = [self.official.frame(block).query(expression) for block in range(self.official.blocks)]
+            df = pd.concat(frames) if frames else pd.DataFrame(columns=EncodedOfficial.columns)
+            self.metrics.add_rows("query_expression", self._official_rows(), len(df.index))
+            return df
+        df = self.official.query(expression)
+        self.metrics.add_rows("query_expression", len(self.official.index), len(df.index))
+        return df
 
+    @instrumented("unofficial_row_fetching")
     def get_unofficial_rows_by_uid(self, uid):
         # returns dataframe of all rows by the given uid from the unofficial data
-        return self.unofficial[(self.unofficial["user_id"] == uid)] if uid else pd.DataFrame()
+        if not uid:
+            return pd.DataFrame()
+        df = self.unofficial[(self.unofficial["user_id"] == uid)]
+        self.metrics.add_rows("unofficial_row_fetching", len(self.unofficial.index), len(df.index))
+        return df
 
+    @instrumented("uid_matching")
     def get_official_uid_by_username(self, username):
         # wrapper around _get_official_uid to handle username(s) and caching
         if not isinstance(username, list):
@@ -441,7 +3432,8 @@ class PlaceData():
             if cache:
                 ouid.append(cache)
             else:
-                ret = self._get_official_uid(self.get_unofficial_uid(user))
+                uuid = self.get_unofficial_uid(user)
+                ret = uuid is not None and self._get_official_uid(uuid)
                 if ret:
                     ouid.append(ret)
                     self.cache.set(user, "ouid", ret)
@@ -452,43 +3444,38 @@ class PlaceData():
         else:
             return False
 
+    @instrumented("official_uid_search")
     def _get_official_uid(self, uid, find_all=False):
         # determine user id in the compressed official dataset given a user id from the unofficial data
         matches = []
         udf = self.get_unofficial_rows_by_uid(uid)
-        with ThreadPoolExecutor(max_workers=self.uidworkers) as executor:
-            # more than two workers caused 24GB RAM to run full sometimes
+        if "ambiguous" in udf.columns:
+            # records with resolved coordinates first: each of them is a single pixel lookup
+            udf = udf.sort_values("ambiguous", kind="stable")
+        with self.scheduler.pool(self.uidworkers) as executor:
             jobs = []
             results = []
-            loop = True
-            i = 0
-            while loop and i < 25:
+            for i in range(min(25, len(udf.index))):
                 # 25 samples seem to be enough to be sure
-                try:
-                    dataset = udf.iloc[i]
-                    tslow = int(dataset.timestamp / 1000) * 1000
-                    tshigh = tslow + 1000
-
-                    # coordinates of the canvas expansions are inconsistent in the unofficial data, meaning
-                    # if the coordinate is below 1000, it could actually have been x + 1000
-                    query = f"timestamp >= {tslow} and timestamp < {tshigh} and "
-                    if dataset.pixel_x < 1000:
-                        query += f"(pixel_x == {dataset.pixel_x} or pixel_x == {dataset.pixel_x + 1000}) and "
-                    else:
-                        query += f"pixel_x == {dataset.pixel_x} and "
-                    if dataset.pixel_y < 1000:
-                        query += f"(pixel_y == {dataset.pixel_y} or pixel_y == {dataset.pixel_y + 1000})"
-                    else:
-                        query += f"pixel_y == {dataset.pixel_y}"
-                    logger.debug(f"string to query: {query}")
-                    jobs.append(executor.submit(self.get_rows_by_expression, query))
-                    i += 1
-                except Exception as e:
-                    logger.warning(f"Error searching official dataset for pixels by {uid}: {e}")
-                    loop = False
+                dataset = udf.iloc[i]
+                tslow = int(dataset.timestamp / 1000) * 1000
+                tshigh = tslow + 1000
+
+                # coordinates of the canvas expansions are inconsistent in the unofficial data, meaning
+                # if the coordinate is below 1000, it could actually have been x + 1000
+                # (unless it was resolved at ingest)
+                ambiguous = dataset.ambiguous if "ambiguous" in udf.columns else 3
+                xs = [dataset.pixel_x, dataset.pixel_x + 1000] if ambiguous & 1 and dataset.pixel_x < 1000 \
+                    else [dataset.pixel_x]
+                ys = [dataset.pixel_y, dataset.pixel_y + 1000] if ambiguous & 2 and dataset.pixel_y < 1000 \
+                    else [dataset.pixel_y]
+                query = Query(pixels=[(x, y) for x in xs for y in ys], ts_from=tslow, ts_to=tshigh)
+                logger.debug(f"query: {query}")
+                jobs.append(executor.submit(self._run_query, query, "query_expression",
+                                            estimate=self._query_memory(query)))
 
             for job in tqdm(futures.as_completed(jobs), total=len(jobs), desc="Determining official user hash...",
-                            leave=False):
+                            leave=False, disable=not self.progress):
                 match = job.result()
                 results.append(match)
 
@@ -510,6 +3497,264 @@ class PlaceData():
         else:
             return False
 
+    @instrumented("overwrites")
+    def get_overwrites_by_username(self, username=None, before_whiteout=False):
+        # who overwrote the pixels of the user(s), who restored them afterwards and whose pixels the user(s)
+        # overwrote, aggregated per other user with the number of edits and the median time in seconds between them
+        # before_whiteout: only count overwrites placed before the whiteout started
+        # returns dict of counts and DataFrames "attackers", "defenders" and "victims"
+        ouid = self.get_official_uid_by_username(self.strip_username(username))
+        if ouid is False:
+            return {}
+        uids = ouid if isinstance(ouid, list) else [ouid]
+        links = self._get_edit_links()
+        user_id = functools.partial(self._column_at, "user_id")
+        color = functools.partial(self._column_at, "pixel_color")
+        ts = lambda positions: self._column_at("timestamp", positions).astype(np.int64)
+        own = self._uid_positions(ouid)
+
+        def by_user(users, delay):
+            df = pd.DataFrame({"user_id": users, "seconds": delay / 1000})
+            df = df.groupby("user_id").seconds.agg(["size", "median"])
+            df.columns = ["edits", "median_seconds"]
+            return df.sort_values(by="edits", ascending=False)
+
+        # edits of the user(s) overwritten by someone else
+        after = links.next_edit[own].astype(np.int64)
+        hit = after >= 0
+        own_hit, after = own[hit], after[hit]
+        foreign = ~np.isin(user_id(after), uids)
+        if before_whiteout:
+            foreign &= ts(after) < whiteout_short
+        own_hit, after = own_hit[foreign], after[foreign]
+        attackers = by_user(user_id(after), ts(after) - ts(own_hit))
+
+        # the next edit after an attack that restored the color of the user(s)
+        restore = links.next_edit[after].astype(np.int64)
+        restored = restore >= 0
+        restored[restored] &= color(restore[restored]) == color(own_hit[restored])
+        if before_whiteout:
+            restored[restored] &= ts(restore[restored]) < whiteout_short
+        defenders = by_user(user_id(restore[restored]), ts(restore[restored]) - ts(after[restored]))
+
+        # edits of the user(s) which replaced an edit of someone else
+        before = links.prev_edit[own].astype(np.int64)
+        replaced = before >= 0
+        own_replacing, before = own[replaced], before[replaced]
+        foreign = ~np.isin(user_id(before), uids)
+        if before_whiteout:
+            foreign &= ts(own_replacing) < whiteout_short
+        own_replacing, before = own_replacing[foreign], before[foreign]
+        victims = by_user(user_id(before), ts(own_replacing) - ts(before))
+
+        return {"pixels": len(own),
+                "pixels_overwritten": len(after),
+                "pixels_restored": int(restored.sum()),
+                "pixels_overwriting": len(before),
+                "attackers": attackers,
+                "defenders": defenders,
+                "victims": victims}
+
+    @instrumented("survival")
+    def get_survival_by_username(self, username=None):
+        # survival time distribution (in seconds) of the edits of one or multiple username(s)
+        # edits placed during the whiteout that were never overwritten are ignored
+        # returns dict with count, median, mean, survivors (edits that lasted until the whiteout) and the longest-lived
+        # edit as DataFrame row, empty dict if the username can't be matched
+        ouid = self.get_official_uid_by_username(self.strip_username(username))
+        if ouid is False:
+            return {}
+        survival = self._get_edit_survival().survival
+        positions = self._uid_positions(ouid)
+        survival = survival[positions]
+        positions, survival = positions[survival >= 0], survival[survival >= 0]
+        if not len(survival):
+            return {"edits": 0}
+        ts = self._column_at("timestamp", positions)
+        longest = positions[np.argmax(survival)]
+        return {"edits": len(survival),
+                "median_seconds": float(np.median(survival)) / 1000,
+                "mean_seconds": float(survival.mean()) / 1000,
+                "longest_seconds": int(survival.max()) / 1000,
+                "survivors": int(((ts < whiteout_short) & (ts + survival == whiteout_short)).sum()),
+                "longest": self._take([longest])}
+
+    @instrumented("survival")
+    def get_survival_histogram(self, username=None, bins=None):
+        # number of edits per survival time bin for one or multiple username(s) or all edits if username is None
+        # bins: ascending bin edges in ms, left-inclusive with an open last bin (default: 0, 1m, 10m, 1h, 6h, 1d)
+        # returns Series indexed by the lower bin edges, False if the username can't be matched
+        survival = self._get_edit_survival()
+        if username is None:
+            return survival.histogram(bins=bins)
+        ouid = self.get_official_uid_by_username(self.strip_username(username))
+        if ouid is False:
+            return False
+        return survival.histogram(self._uid_positions(ouid), bins)
+
+    def _co_placements(self, positions, radius, window, batch=4096):
+        # edits within radius pixels (in x and y) and window seconds of the edits at the given row positions, joined
+        # through the space-time grid in vectorized batches of the given edits
+        # returns arrays of the position of the given edit, the position of the nearby edit and the ms between them
+        # (including pairs of edits of the same user)
+        grid = self._get_space_time_grid()
+        window_ms = int(window * 1000)
+        pairs = ([], [], [])
+        for first in range(0, len(positions), batch):
+            own = np.asarray(positions[first:first + batch], dtype=np.int64)
+            x, y, ts = (self._column_at(name, own).astype(np.int64) for name in ["pixel_x", "pixel_y", "timestamp"])
+            points, starts, ends = grid.neighbor_ranges(x, y, ts, radius, window_ms)
+            other = grid.order[ranges_to_positions(starts, ends)].astype(np.int64)
+            points = np.repeat(points, ends - starts)
+            delay = np.abs(self._column_at("timestamp", other).astype(np.int64) - ts[points])
+            keep = (np.abs(self._column_at("pixel_x", other).astype(np.int64) - x[points]) <= radius) & \
+                   (np.abs(self._column_at("pixel_y", other).astype(np.int64) - y[points]) <= radius) & \
+                   (delay <= window_ms)
+            for values, found in zip(pairs, [own[points[keep]], other[keep], delay[keep]]):
+                values.append(found)
+        self.metrics.add_rows("neighbors", len(positions), sum(len(found) for found in pairs[0]))
+        return tuple(np.concatenate(values) if values else np.empty(0, dtype=np.int64) for values in pairs)
+
+    def _neighbor_table(self, own_user, own, other, delay):
+        # aggregate co-placements per (own_user, user_id): edits (their edits near the own edits), near_edits (own
+        # edits they were near) and median_seconds (between the two edits), most edits first
+        df = pd.DataFrame({"own_user": own_user, "user_id": self._column_at("user_id", other), "own": own,
+                           "other": other, "seconds": delay / 1000})
+        grouped = df.groupby(["own_user", "user_id"])
+        result = pd.DataFrame({"edits": grouped.other.nunique(), "near_edits": grouped.own.nunique(),
+                               "median_seconds": grouped.seconds.median()})
+        return result.sort_values(by=["edits", "near_edits"], ascending=False)
+
+    def _neighbors(self, uids, radius, window):
+        # co-placements of the user id(s) with all other users, DataFrame indexed by user_id, see _neighbor_table()
+        # load the grid first, it raises in out-of-core mode where there are no row positions
+        self._get_space_time_grid()
+        own, other, delay = self._co_placements(self._uid_positions(uids), radius, window)
+        foreign = ~np.isin(self._column_at("user_id", other), uids)
+        table = self._neighbor_table(np.zeros(int(foreign.sum()), dtype=np.int64), own[foreign], other[foreign],
+                                     delay[foreign])
+        return table.droplevel("own_user")
+
+    def _neighbors_of_each(self, uids, radius, window, k):
+        # top k co-placements of each of the user ids separately, in one join over the edits of all of them
+        # returns DataFrame with columns user_id, neighbor, edits, near_edits and median_seconds
+        # load the grid first, it raises in out-of-core mode where there are no row positions
+        self._get_space_time_grid()
+        own, other, delay = self._co_placements(self._uid_positions(uids), radius, window)
+        own_user = self._column_at("user_id", own)
+        foreign = own_user != self._column_at("user_id", other)
+        table = self._neighbor_table(own_user[foreign], own[foreign], other[foreign], delay[foreign])
+        table = table.groupby(level="own_user", sort=False).head(k)
+        return table.rename_axis(["user_id", "neighbor"]).reset_index().sort_values(by="user_id", kind="stable")
+
+    @instrumented("neighbors")
+    def get_neighbors_by_username(self, username=None, radius=3, window=60, k=None):
+        # the users who most often placed pixels within radius pixels (in x and y) and window seconds of the
+        # user(s)' placements, see _neighbors() for the columns; k: only the top k users
+        # returns False if the username can't be matched to the official dataset
+        ouid = self.get_official_uid_by_username(self.strip_username(username))
+        if ouid is False:
+            return False
+        neighbors = self._neighbors(ouid if isinstance(ouid, list) else [ouid], radius, window)
+        return neighbors if k is None else neighbors.head(k)
+
+    def get_all_neighbors(self, radius=3, window=60, k=10, user_ids=None, processes=None, chunksize=256):
+        # offline job: the top k neighbors of every official user id (or the given ones), computed in a pool of
+        # forked worker processes sharing the data and the space-time grid, each joining the edits of chunksize
+        # users at once
+        # returns DataFrame with columns user_id, neighbor, edits, near_edits and median_seconds
+        global _worker_data
+        # load the data and indexes before forking, so the workers share them
+        self._get_space_time_grid()
+        self._get_user_index()
+        if user_ids is None:
+            user_ids = np.unique(self._column("user_id"))
+        user_ids = [int(uid) for uid in user_ids]
+        logger.info(f"Search the neighbors of {len(user_ids)} users ...")
+        _worker_data = self
+        progress, self.progress = self.progress, False
+        tasks = [(user_ids[i:i + chunksize], radius, window, k) for i in range(0, len(user_ids), chunksize)]
+        try:
+            try:
+                pool = multiprocessing.get_context("fork").Pool(processes)
+                results = pool.imap_unordered(_neighbor_worker, tasks)
+            except ValueError:
+                # no fork on this platform, compute in this process
+                pool = None
+                results = map(_neighbor_worker, tasks)
+            frames = [df for df in tqdm(results, total=len(tasks), desc="Searching neighbors", unit="chunks")
+                      if not df.empty]
+            if pool is not None:
+                pool.close()
+                pool.join()
+        finally:
+            self.progress = progress
+            _worker_data = None
+        if not frames:
+            return pd.DataFrame(columns=["user_id", "neighbor", "edits", "near_edits", "median_seconds"])
+        return pd.concat(frames).sort_values(by="user_id", kind="stable", ignore_index=True)
+
+    @instrumented("leaderboard")
+    def get_leaderboard(self, column="pixel_count", k=10):
+        # returns DataFrame of the top k users (by official user id) by one of the per-user aggregates:
+        # pixel_count, first_timestamp, last_timestamp, whiteout_count, first_pixel_count, surviving_pixel_count
+        # or a palette color index 0-31 / hex color for the users who placed the most pixels in that color
+        if isinstance(column, str) and column.upper() in self.hexmap.values():
+            column = {v: k for k, v in self.hexmap.items()}[column.upper()]
+        aggregates = self._get_user_aggregates()
+        top = aggregates.top(column, k)
+        if isinstance(column, int):
+            top = top.assign(color_count=aggregates.colors[top.index.values, column].astype(np.int32))
+        return top
+
+    def get_user_aggregates_by_username(self, username=None):
+        # returns the per-user aggregates of one or multiple username(s) as dict, including the color histogram
+        ouid = self.get_official_uid_by_username(self.strip_username(username))
+        if ouid is False:
+            return {}
+        aggregates = self._get_user_aggregates()
+        uids = ouid if isinstance(ouid, list) else [ouid]
+        rows = aggregates.table.iloc[uids]
+        colors = aggregates.colors[uids].sum(axis=0)
+        return {"pixel_count": int(rows.pixel_count.sum()),
+                "first_timestamp": int(rows.first_timestamp.min()) + start,
+                "last_timestamp": int(rows.last_timestamp.max()) + start,
+                "whiteout_count": int(rows.whiteout_count.sum()),
+                "first_pixel_count": int(rows.first_pixel_count.sum()),
+                "surviving_pixel_count": int(rows.surviving_pixel_count.sum()),
+                "colors": {self.hexmap[c]: int(n) for c, n in enumerate(colors) if n}}
+
+    @instrumented("regularity")
+    def get_regularity_by_username(self, username=None):
+        # inter-placement interval statistics of one or multiple username(s) as dict, see UserRegularity: the
+        # columns (flags as list of names) and the interval histogram keyed by the lower bin edges in seconds
+        # for multiple usernames the statistics of the account with the highest score, with all their flags
+        ouid = self.get_official_uid_by_username(self.strip_username(username))
+        if ouid is False:
+            return {}
+        regularity = self._get_user_regularity()
+        uids = [uid for uid in (ouid if isinstance(ouid, list) else [ouid]) if uid < len(regularity.table)]
+        if not uids:
+            return {}
+        rows = regularity.table.iloc[uids]
+        row = rows.iloc[int(np.argmax(rows.score.values))]
+        histogram = regularity.histogram[uids].sum(axis=0)
+        return {"edits": int(row.edits),
+                "median_interval": None if np.isnan(row.median_interval) else round(float(row.median_interval), 3),
+                "interval_cv": None if np.isnan(row.interval_cv) else round(float(row.interval_cv), 4),
+                "cooldown_share": round(float(row.cooldown_share), 4),
+                "active_hours": int(row.active_hours),
+                "longest_session": round(float(row.longest_session), 2),
+                "score": round(float(row.score), 4),
+                "flags": regularity.flag_list(np.bitwise_or.reduce(rows["flags"].values)),
+                "intervals": {str(edge / 1000): int(n) for edge, n in zip(regularity.bins, histogram)}}
+
+    def get_flagged_users(self, k=None, min_score=0.0, flagged=True):
+        # users with bot-like placement intervals by descending score, see UserRegularity.top()
+        # returns DataFrame indexed by user_id with the statistics and the flags as names
+        top = self._get_user_regularity().top(k, min_score, flagged)
+        return top.assign(flags=[self.user_regularity.flag_list(flags) for flags in top["flags"].values])
+
     def strip_username(self, username=None):
         # Sanitize usernames: remove slash-parts used on reddit and convert to lowercase
         if isinstance(username, str):
@@ -539,12 +3784,61 @@ class PlaceData():
         self.cache.set(username, "hash", _hash)
         return _hash
 
+    @instrumented("unofficial_uid_lookup")
+    def load_username_index(self):
+        # load the username index or build it from the unofficial users file if it's missing or outdated
+        users_file = os.path.join(self.unofficial_compressed, "users")
+        directory = os.path.join(self.cwd, "usernames")
+        try:
+            index = UsernameIndex(directory)
+            if index.source == UsernameIndex.source_of(users_file):
+                logger.info("username index loaded!")
+                self.username_index = index
+                return True
+            logger.warning("username index is outdated ... rebuild!")
+        except Exception as e:
+            logger.warning(f"Unable to load username index ({e}).. initialize!")
+        logger.info(f"Build username index from {users_file} ...")
+        self.username_index = UsernameIndex.build(users_file, directory)
+        return True
+
+    def _get_username_index(self):
+        # return the username index, loading it on first use
+        if self.username_index is None:
+            with self.index_lock:
+                if self.username_index is None:
+                    self.load_username_index()
+        return self.username_index
+
+    @instrumented("username_search")
+    def complete_username(self, prefix=None, k=10):
+        # up to k usernames starting with prefix (shortest first) for autocompletion, as list of (username, uid)
+        return self._get_username_index().complete(self.strip_username(prefix) or "", k)
+
+    @instrumented("username_search")
+    def suggest_usernames(self, username=None, max_distance=2, k=10):
+        # up to k usernames within max_distance typos (inserted, deleted or replaced characters) of username, as
+        # list of (username, uid, distance) ordered by distance
+        return self._get_username_index().suggest(self.strip_username(username) or "", max_distance, k)
+
+    def _did_you_mean(self, username):
+        # up to 5 suggestions for a username that isn't in the unofficial users file
+        if not isinstance(username, str) or self.get_unofficial_uid(username) is not None:
+            return []
+        return [name for name, uid, distance in self.suggest_usernames(username, k=5)]
+
     def get_unofficial_uid(self, username):
         # get the unofficial compressed user id for a given username
         # returns None if the username can't be found in the official dataset
         cache = self.cache.get(username, "uuid")
         if cache:
             return cache
+        if self.use_username_index:
+            uid = self._get_username_index().lookup(username)
+            if uid is not None:
+                logger.debug(f"found uid in username index: {uid}")
+                self.cache.set(username, "uuid", uid)
+            return uid
         with open(os.path.join(self.unofficial_compressed, "users"), "r") as f:
             for line in f:
                 line = line.lower()
@@ -555,6 +3849,7 @@ class PlaceData():
                     return uid
         return None
 
+    @instrumented("hash_lookup")
     def get_hash_by_official_uid(self, uid):
         # return the full reddit supplied hash value for a given compressed user id
         logger.debug(f"search hash for uid: {uid} in {os.path.join(self.official_compressed, 'users')}")
@@ -570,10 +3865,12 @@ class PlaceData():
                     return hash
         return None
 
+    @instrumented("final_pixel_search")
     def get_final_pixels_by_username(self, username):
         # wrapper to supply correct mode value to __internal_get_pixels
         return self.__internal_get_pixels(username, "final_before_whiteout")
 
+    @instrumented("first_pixel_search")
     def get_first_pixels_by_username(self, username):
         # wrapper to supply correct mode value to __internal_get_pixels
         return self.__internal_get_pixels(username, "first")
@@ -612,6 +3909,7 @@ class PlaceData():
         else:
             return pd.DataFrame()
 
+    @instrumented("pixel_lookup")
     def _pixel_thread(self, pixel_x, pixel_y, mode):
         # to be used in _pixels_threaded to determine the requested edit of a given pixel
         # returns DataFrame
@@ -642,19 +3940,21 @@ class PlaceData():
         if mode not in ["first", "final", "final_before_whiteout"]:
             return pd.DataFrame()
         ret_pixels = []
-        with ThreadPoolExecutor(max_workers=self.pixelworkers) as executor:
+        with self.scheduler.pool(self.pixelworkers) as executor:
             jobs = []
             results = []
             for index, row in pixels.iterrows():
-                jobs.append(executor.submit(self._pixel_thread, row.pixel_x, row.pixel_y, mode))
+                estimate = self._query_memory(Query(x=row.pixel_x, y=row.pixel_y))
+                jobs.append(executor.submit(self._pixel_thread, row.pixel_x, row.pixel_y, mode, estimate=estimate))
 
             for job in tqdm(futures.as_completed(jobs), total=len(jobs), desc=f"Searching {mode} pixels ...",
-                            leave=False):
+                            leave=False, disable=not self.progress):
                 edit = job.result()
                 results.append(edit)
 
             for edit in results:
-                if edit.iloc[0].user_id in official_uid:
+                # pixels only placed during the whiteout have no edit before it
+                if not edit.empty and edit.iloc[0].user_id in official_uid:
                     ret_pixels.append(edit)
 
         if len(ret_pixels) > 0:
@@ -667,6 +3967,7 @@ class PlaceData():
         else:
             return pd.DataFrame()
 
+    @instrumented("analyze_user")
     def analyze_user(self, username=None, json=False, list_pixels=False):
         # wrapper to get the text summary + all implemented pictures for one username or a list of usernames
         if username is None:
@@ -676,12 +3977,18 @@ class PlaceData():
         # get_(json_)summary returns bool depending on if username could be matched to official data or not
         if json:
             ret = self.get_json_summary(username)
+            if ret and self.use_render_queue:
+                # return right away, the images are rendered in the background
+                images = self.queue_images(username, "interactive", summary=ret)
+                ret["images"] = {name: image["url"] for name, image in images.items()}
+                ret["images_status"] = {name: image["status"] for name, image in images.items()}
+                return ret
             if ret:
-                ret["images"] = {}
-                ret["images"]["first_img"] = self.generate_first_pixels_dark(username)
-                ret["images"]["final_img"] = self.generate_final_pixels_dark(username)
-                ret["images"]["all_pixels_pre_whiteout_img"] = self.generate_all_pixels_dark_pre_whiteout(username)
-                ret["images"]["all_pixels_during_whiteout_img"] = self.generate_all_pixels_dark_during_whiteout(username)
+                # generate the images concurrently, as far as the memory budget allows
+                with self.scheduler.pool(self.imageworkers) as executor:
+                    jobs = {name: executor.submit(getattr(self, method), username, estimate=self._image_memory())
+                            for name, method, suffix in self.user_images}
+                ret["images"] = {name: job.result() for name, job in jobs.items()}
 
                 # drop non-existing images
                 new_images = {}
@@ -701,6 +4008,7 @@ class PlaceData():
                 self.generate_all_pixels_dark_pre_whiteout(username, True)
                 self.generate_all_pixels_dark_during_whiteout(username, True)
 
+    @instrumented("text_summary")
     def get_summary(self, username=None, list_pixels=False):
         # print copy-pasteable summary to console
         # return True if username could be found, else return False
@@ -716,6 +4024,9 @@ class PlaceData():
         official_uid = self.get_official_uid_by_username(username)
         if not official_uid:
             print(f"Unable to match {username} to the official dataset. No analysis possible. :(")
+            suggestions = self._did_you_mean(username)
+            if suggestions:
+                print(f"Did you mean: {', '.join(suggestions)}?")
             return False
         print(f"\nSummary for {self.printuser(username)}")
         print("=" * int(12 + len(self.printuser(username))))
@@ -740,9 +4051,9 @@ class PlaceData():
         last_timestring = datetime.fromtimestamp(int((last_pixel.timestamp + start) // 1000)).strftime("%Y-%m-%d "
                                                                                                        "%H:%M:%S")
         print(f"Your first pixel: {first_pixel.pixel_x},{first_pixel.pixel_y} placed at {first_timestring} GMT "
-              f"with color {self.colormap[first_pixel.pixel_color].name} ({self.hexmap[first_pixel.pixel_color]})")
+              f"with color {self.colornames[first_pixel.pixel_color]} ({self.hexmap[first_pixel.pixel_color]})")
         print(f"Your last pixel: {last_pixel.pixel_x},{last_pixel.pixel_y} placed at {last_timestring} GMT "
-              f"with color {self.colormap[last_pixel.pixel_color].name} ({self.hexmap[last_pixel.pixel_color]})")
+              f"with color {self.colornames[last_pixel.pixel_color]} ({self.hexmap[last_pixel.pixel_color]})")
 
         # pixels touched as first user
         first_pixels = self.get_first_pixels_by_username(username)
@@ -752,10 +4063,10 @@ class PlaceData():
                 timestring = datetime.fromtimestamp(int((pixel.timestamp + start) // 1000)).strftime("%Y-%m-%d "
                                                                                                      "%H:%M:%S")
                 print(f"Pixel {pixel.pixel_x},{pixel.pixel_y} set at {timestring} GMT, color "
-                      f"{self.colormap[pixel.pixel_color].name} ({self.hexmap[pixel.pixel_color]})")
+                      f"{self.colornames[pixel.pixel_color]} ({self.hexmap[pixel.pixel_color]})")
 
         # pixels during whiteout
-        during_whiteout = pixels.query(f"timestamp >= {whiteout_short} and pixel_color == 7")
+        during_whiteout = pixels[(pixels.timestamp >= whiteout_short) & (pixels.pixel_color == 7)]
         if not during_whiteout.empty:
             print(f"\nYou placed {len(during_whiteout.index)} pixels during the whiteout!")
             for index, pixel in during_whiteout.sort_values(by="timestamp").iterrows():
@@ -774,94 +4085,321 @@ class PlaceData():
                                                                                                      "%H:%M:%S")
                 survived = human_readable(relativedelta(seconds=(whiteout_short - pixel.timestamp) / 1000))
                 print(f"Pixel {pixel.pixel_x},{pixel.pixel_y} set at {timestring} GMT, color "
-                      f"{self.colormap[pixel.pixel_color].name} ({self.hexmap[pixel.pixel_color]}) - survived "
+                      f"{self.colornames[pixel.pixel_color]} ({self.hexmap[pixel.pixel_color]}) - survived "
                       f"{' '.join(survived)} until the whiteout!")
 
+        # survival of all pixels (needs the official data in memory)
+        survival = {} if self._partitioned() else self.get_survival_by_username(username)
+        if survival.get("edits"):
+            median = human_readable(relativedelta(seconds=int(survival["median_seconds"])))
+            longest = human_readable(relativedelta(seconds=int(survival["longest_seconds"])))
+            pixel = survival["longest"].iloc[0]
+            print(f"\nYour pixels survived {' '.join(median) or '0 seconds'} on median (until overwritten or the "
+                  f"whiteout). The longest-lived one was {pixel.pixel_x},{pixel.pixel_y} with "
+                  f"{' '.join(longest) or '0 seconds'}!")
+
+        # placement intervals
+        regularity = self._summary_regularity(username).get("regularity")
+        if regularity and regularity["median_interval"] is not None:
+            median = human_readable(relativedelta(seconds=int(regularity["median_interval"])))
+            print(f"\nYour median time between two pixels was {' '.join(median) or '0 seconds'}, "
+                  f"{regularity['cooldown_share']:.0%} of them right at the cooldown.")
+            if regularity["flags"]:
+                print(f"Your placements look automated ({', '.join(regularity['flags'])})!")
+
         # color ranking
         print()
         print("Ranking of the colors you used:")
         ranking = self.get_color_ranking_by_username(username)
         rank = 1
         for color, number in ranking.items():
-            print(f"Rank {rank}: {self.colormap[color].name} ({self.hexmap[color]}) used {number} times")
+            print(f"Rank {rank}: {self.colornames[color]} ({self.hexmap[color]}) used {number} times")
             rank += 1
         return True
 
+    @instrumented("json_summary")
     def get_json_summary(self, username=None):
-        # initialize and print hash
-        response = {}
+        # return the JSON summary for one or multiple username(s), served from the result store if precomputed
         username = self.strip_username(username)
-        response["username"] = self.printuser(username)
+        if isinstance(username, str):
+            stored = self.get_stored_summary(username)
+            if stored is not None:
+                return stored
+        return self._compute_json_summary(username)
+
+    def _get_result_store(self, create=False):
+        # return the result store, opening it on first use (None if it doesn't exist and create is False)
+        # lookups don't load the official data just to check the store was built from it, writing to it does
+        with self.index_lock:
+            if self.result_store is not None and create and self.result_store.fingerprint is None:
+                self.result_store.close()
+                self.result_store = None
+        if self.result_store is None and (create or os.path.isfile(os.path.join(self.result_dir, "index"))):
+            with self.index_lock:
+                if self.result_store is None:
+                    check = create or self._official is not None
+                    self.result_store = ResultStore(self.result_dir, self.result_shards,
+                                                    self._official_fingerprint() if check else None)
+        return self.result_store
+
+    @instrumented("stored_summary")
+    def get_stored_summary(self, username=None, ouid=None):
+        # return the precomputed JSON summary by username or official user id
+        # returns None if it wasn't precomputed, False if the username can't be matched to the official dataset
+        store = self._get_result_store()
+        if store is None:
+            return None
+        key = f"ouid:{ouid}" if ouid is not None else f"user:{self.strip_username(username)}"
+        return store.get(key)
 
+    def precompute_summaries(self, usernames=None, processes=None, chunksize=16, images=False):
+        # offline job: compute the JSON summary of every username in the unofficial dataset (or the given ones) in
+        # a pool of forked worker processes and write them to the result store in the configured resultstore dir
+        # already stored usernames are skipped, so an interrupted job continues where it stopped
+        # images=True: also queue their images in the render queue as batch jobs (see wait_for_images())
+        global _worker_data
+        store = self._get_result_store(create=True)
+        if usernames is None:
+            with open(os.path.join(self.unofficial_compressed, "users"), "r") as f:
+                usernames = json.load(f).keys()
+        usernames = [u for u in dict.fromkeys(self.strip_username(list(usernames))) if f"user:{u}" not in store]
+        logger.info(f"Precompute summaries of {len(usernames)} usernames ...")
+
+        # make sure the data and indexes are loaded before forking, so the workers share them
+        self.official
+        self.unofficial
+        self._get_tile_index()
+        if self.use_regularity and not self._partitioned():
+            self._get_user_regularity()
+        _worker_data = self
+        persist, progress = self.cache.persist, self.progress
+        self.cache.persist, self.progress = False, False
+        try:
+            try:
+                pool = multiprocessing.get_context("fork").Pool(processes)
+                results = pool.imap_unordered(_summary_worker, usernames, chunksize)
+            except ValueError:
+                # no fork on this platform, compute in this process
+                pool = None
+                results = map(_summary_worker, usernames)
+            stored = 0
+            for username, ouid, summary in tqdm(results, total=len(usernames), desc="Precomputing summaries"):
+                if summary is None:
+                    continue
+                keys = [f"user:{username}"]
+                if summary is not False:
+                    keys.append(f"ouid:{ouid}")
+                store.put(keys, summary)
+                stored += 1
+                if images and summary is not False:
+                    self.queue_images(username, "batch", summary=summary)
+            if pool is not None:
+                pool.close()
+                pool.join()
+        finally:
+            self.cache.persist, self.progress = persist, progress
+            _worker_data = None
+        logger.info(f"Stored {stored} summaries in {self.result_dir}")
+        return stored
+
+    def _compute_json_summary(self, username=None):
+        # compute the JSON summary section by section (see the _summary_* methods), False if the username can't be
+        # matched to the official dataset
+        username = self.strip_username(username)
         official_uid = self.get_official_uid_by_username(username)
         if not official_uid:
             logger.warning(f"Unable to match {username} to the official dataset. No analysis possible. :(")
             return False
         logger.debug(f"Official ID: {official_uid}")
 
-        response["hash"] = {}
+        response = {"username": self.printuser(username)}
+        response.update(self._summary_hashes(username, official_uid))
+        pixels = self._summary_pixels(username)
+        response.update({key: pixels[key] for key in ["pixels", "first_pixel", "last_pixel"]})
+        response.update(self._summary_first_pixels(username))
+        response["during_whiteout"] = pixels["during_whiteout"]
+        response.update(self._summary_final_pixels(username))
+        response["color_ranking"] = pixels["color_ranking"]
+        response.update(self._summary_regularity(username))
+        return response
+
+    def _summary_records(self, df):
+        # list of pixel dicts for the JSON summary: absolute timestamps, hex colors, without user_id and count
+        records = json.loads(df.to_json(orient="records"))
+        for pixel in records:
+            pixel["timestamp"] = pixel["timestamp"] + start
+            pixel["pixel_color"] = self.hexmap[pixel["pixel_color"]]
+            if "user_id" in pixel:
+                del pixel["user_id"]
+            if "count" in pixel:
+                del pixel["count"]
+        return records
+
+    def _summary_hashes(self, username, official_uid):
+        # JSON summary section "hash": the hash of every username
         if not isinstance(username, list):
-            uhash = self.get_hash_by_official_uid(official_uid)
-            response["hash"][username] = uhash
-        else:
-            for u in username:
-                uhash = self.get_hash_by_official_uid(self.get_official_uid_by_username(u))
-                response["hash"][u] = uhash
+            return {"hash": {username: self.get_hash_by_official_uid(official_uid)}}
+        return {"hash": {u: self.get_hash_by_official_uid(self.get_official_uid_by_username(u)) for u in username}}
 
-        # get and count all pixels
+    def _summary_pixels(self, username):
+        # JSON summary sections computed from all pixels of the user(s): "pixels", "first_pixel", "last_pixel",
+        # "during_whiteout" and "color_ranking"
         pixels = self.get_rows_by_username(username)
-        response["pixels"] = json.loads(pixels.to_json(orient="records"))
+        response = {"pixels": self._summary_records(pixels)}
 
         # first and last pixels - align formatting manually here because iloc is just a blank row
-        first_pixel = json.loads(pixels.iloc[0].to_json(orient="records"))
-        response["first_pixel"] = {"timestamp": first_pixel[0] + start,
-                                   "pixel_color": self.hexmap[first_pixel[2]],
-                                   "pixel_x": first_pixel[3],
-                                   "pixel_y": first_pixel[4]}
-        last_pixel = json.loads(pixels.iloc[-1].to_json(orient="records"))
-        response["last_pixel"] = {"timestamp": last_pixel[0] + start,
-                                   "pixel_color": self.hexmap[last_pixel[2]],
-                                   "pixel_x": last_pixel[3],
-                                   "pixel_y": last_pixel[4]}
-
-        # pixels touched as first user
-        response["first_pixels"] = json.loads(self.get_first_pixels_by_username(username).to_json(orient="records"))
+        for key, row in [("first_pixel", pixels.iloc[0]), ("last_pixel", pixels.iloc[-1])]:
+            pixel = json.loads(row.to_json(orient="records"))
+            response[key] = {"timestamp": pixel[0] + start,
+                             "pixel_color": self.hexmap[pixel[2]],
+                             "pixel_x": pixel[3],
+                             "pixel_y": pixel[4]}
 
         # pixels during whiteout
-        response["during_whiteout"] = json.loads(pixels.query(f"timestamp >= {whiteout_short} and pixel_color == 7")
-                                                       .to_json(orient="records"))
-
-        # pixels on the final canvas before whiteout started
-        response["pixels_on_final_canvas"] = json.loads(self.get_final_pixels_by_username(username)
-                                                        .to_json(orient="records"))
+        during_whiteout = pixels[(pixels.timestamp >= whiteout_short) & (pixels.pixel_color == 7)]
+        response["during_whiteout"] = self._summary_records(during_whiteout)
 
         # color ranking
-        ranking = self.get_color_ranking_by_username(username)
-        rank = 1
-        ranklist = []
-        for color, number in ranking.items():
-            elem = {"rank": rank,
-                    "color": self.hexmap[color],
-                    "number": number}
-            ranklist.append(elem)
-            rank += 1
-        response["color_ranking"] = ranklist
-
-        # cleanup
-        for elem in ["pixels", "first_pixels", "during_whiteout", "pixels_on_final_canvas"]:
-            new_list = []
-            for pixel in response[elem]:
-                pixel["timestamp"] = pixel["timestamp"] + start
-                pixel["pixel_color"] = self.hexmap[pixel["pixel_color"]]
-                if "user_id" in pixel:
-                    del pixel["user_id"]
-                if "count" in pixel:
-                    del pixel["count"]
-                new_list.append(pixel)
-            response[elem] = new_list
-
+        ranking = pixels["pixel_color"].value_counts()
+        response["color_ranking"] = [{"rank": rank, "color": self.hexmap[color], "number": int(number)}
+                                     for rank, (color, number) in enumerate(ranking.items(), 1)]
         return response
 
+    def _summary_regularity(self, username):
+        # JSON summary section "regularity": the placement interval statistics and bot flags, see
+        # get_regularity_by_username() (left out if disabled in the config or not built in out-of-core mode)
+        if not self.use_regularity:
+            return {}
+        try:
+            return {"regularity": self.get_regularity_by_username(username)}
+        except ValueError as e:
+            logger.warning(f"No placement interval statistics: {e}")
+            return {}
+
+    def _summary_first_pixels(self, username):
+        # JSON summary section "first_pixels": pixels touched as first user
+        return {"first_pixels": self._summary_records(self.get_first_pixels_by_username(username))}
+
+    def _summary_final_pixels(self, username):
+        # JSON summary section "pixels_on_final_canvas": pixels on the final canvas before whiteout started
+        return {"pixels_on_final_canvas": self._summary_records(self.get_final_pixels_by_username(username))}
+
+    async def analyze_user_stream(self, username=None, images=True):
+        # async generator variant of analyze_user(json=True): yields (key, value) for every section of the JSON
+        # summary as soon as it is ready, dict() of all of them equals the response of analyze_user(json=True)
+        # the sections are computed concurrently in worker threads, so the cheap ones don't wait for the first/final
+        # pixel search; the images come last, when the pixels they show are cached
+        # yields ("error", message) if the username can't be matched to the official dataset, then ("suggestions",
+        # [similar usernames]) if it isn't in the unofficial users file at all
+        # example: async for key, value in data.analyze_user_stream("Username"): ...
+        import asyncio
+
+        username = self.strip_username(username)
+        pool = self.scheduler.pool()
+        run = lambda fn, *args, estimate=0, **kwargs: asyncio.wrap_future(pool.submit(fn, *args, estimate=estimate,
+                                                                                      **kwargs))
+        try:
+            stored = await run(self.get_stored_summary, username) if isinstance(username, str) else None
+            if stored:
+                summary = stored
+                for key, value in summary.items():
+                    yield key, value
+            else:
+                summary = {"username": self.printuser(username)}
+                yield "username", summary["username"]
+                official_uid = stored is not False and await run(self.get_official_uid_by_username, username)
+                if not official_uid:
+                    logger.warning(f"Unable to match {username} to the official dataset. No analysis possible. :(")
+                    yield "error", f"Unable to match {self.printuser(username)} to the official dataset"
+                    suggestions = await run(self._did_you_mean, username)
+                    if suggestions:
+                        yield "suggestions", suggestions
+                    return
+                uids = official_uid if isinstance(official_uid, list) else [official_uid]
+                jobs = [run(self._summary_hashes, username, official_uid),
+                        run(self._summary_pixels, username, estimate=self._query_memory(Query(users=uids))),
+                        run(self._summary_first_pixels, username),
+                        run(self._summary_final_pixels, username),
+                        run(self._summary_regularity, username)]
+                for job in asyncio.as_completed(jobs):
+                    for key, value in (await job).items():
+                        summary[key] = value
+                        yield key, value
+
+            if not images:
+                return
+            if self.use_render_queue:
+                queued = await run(self.queue_images, username, "interactive", summary=summary)
+                yield "images", {name: image["url"] for name, image in queued.items()}
+                yield "images_status", {name: image["status"] for name, image in queued.items()}
+            else:
+                rendered = {name: run(getattr(self, method), username, estimate=self._image_memory())
+                            for name, method, suffix in self.user_images}
+                # drop non-existing images
+                rendered = {name: await job for name, job in rendered.items()}
+                yield "images", {name: image for name, image in rendered.items() if image is not False
+                                 and image is not None}
+        finally:
+            pool.shutdown(wait=False)
+
+    def _get_render_queue(self):
+        # return the render queue, starting it on first use
+        if self.render_queue is None:
+            with self.index_lock:
+                if self.render_queue is None:
+                    # the workers are forked, so load the data and indexes first to share them
+                    self.official
+                    self.unofficial
+                    self._get_tile_index()
+                    self._get_user_index()
+                    processes = self.renderworkers
+                    if self.scheduler.budget:
+                        processes = max(1, min(processes, self.scheduler.budget // self._image_memory()))
+                    self.render_queue = RenderQueue(self, processes)
+        return self.render_queue
+
+    def _image_link(self, filename):
+        # what the generate_* methods return for a generated image
+        return f"{self.imgurl}/{filename}" if self.imgurl else True
+
+    def queue_images(self, username=None, priority="interactive", force=False, summary=None):
+        # queue rendering the analyze_user images of the user(s) in the background, interactive before batch jobs
+        # summary: the JSON summary of the user(s), to leave out images without pixels
+        # returns dict of image name -> {"url": link as returned by the generate_* methods,
+        # "status": "ready" or "pending"}, see image_status()
+        username = self.strip_username(username)
+        if summary:
+            timestamps = [pixel["timestamp"] for pixel in summary["pixels"]]
+            has_pixels = {"first_img": bool(summary["first_pixels"]),
+                          "final_img": bool(summary["pixels_on_final_canvas"]),
+                          "all_pixels_pre_whiteout_img": any(ts < whiteout for ts in timestamps),
+                          "all_pixels_during_whiteout_img": any(ts >= whiteout for ts in timestamps)}
+        else:
+            has_pixels = {}
+        images = {}
+        for name, method, suffix in self.user_images:
+            if not has_pixels.get(name, True):
+                continue
+            filename = f"{self.printuser(username)}-{suffix}.png"
+            if not force and os.path.isfile(os.path.join(self.imgdir, filename)):
+                status = "ready"
+            else:
+                status = self._get_render_queue().submit(filename, method, username, priority, force)
+            images[name] = {"url": self._image_link(filename), "status": status}
+        return images
+
+    def image_status(self, filename):
+        # "pending" (queued or rendering), "ready", "empty" (no pixels to show), "failed" or "missing"
+        if self.render_queue is None:
+            return "ready" if os.path.isfile(os.path.join(self.imgdir, filename)) else "missing"
+        return self.render_queue.status(filename)
+
+    def wait_for_images(self, timeout=None):
+        # block until the render queue is empty, returns False if the timeout (seconds) passed before
+        if self.render_queue is None:
+            return True
+        return self.render_queue.wait(timeout)
+
     def generate_first_pixels_dark(self, username=None, summary=False, force=False):
         # highlight the pixels the user(s) touched first on a darkened canvas
         filename = f"{self.printuser(username)}-first.png"
@@ -916,9 +4454,8 @@ class PlaceData():
             sample = img.copy()
             enhancer = ImageEnhance.Brightness(img)
             img = enhancer.enhance(0.3)
-            query = f"timestamp < {whiteout_short}"
-            pixels = self.get_rows_by_username(username).query(query).value_counts(ascending=True) \
-                                                        .reset_index(name='count')
+            pixels = self.get_rows_by_username(username, ts_to=whiteout_short).value_counts(ascending=True) \
+                                                                              .reset_index(name='count')
             if pixels.empty:
                 return False
             logger.debug(pixels)
@@ -942,9 +4479,8 @@ class PlaceData():
             sample = img.copy()
             enhancer = ImageEnhance.Brightness(img)
             img = enhancer.enhance(0.3)
-            query = f"timestamp >= {whiteout_short}"
-            pixels = self.get_rows_by_username(username).query(query).value_counts(ascending=True) \
-                                                        .reset_index(name='count')
+            pixels = self.get_rows_by_username(username, ts_from=whiteout_short).value_counts(ascending=True) \
+                                                                                .reset_index(name='count')
             if pixels.empty:
                 return False
             logger.debug(pixels)
@@ -958,12 +4494,41 @@ class PlaceData():
             else:
                 return True
 
+    def generate_heatmap(self, kind="all", summary=False, force=False):
+        # color every pixel of the canvas by how often it was edited (log scale, black: never)
+        # kind: "all", "pre_whiteout" (before the whiteout started) or "whiteout" (during the whiteout)
+        if kind not in PixelHeat.kinds:
+            raise ValueError(f"Invalid kind {kind}! Valid kinds: {PixelHeat.kinds}")
+        filename = f"heatmap-{kind}.png"
+        if not os.path.isfile(os.path.join(self.imgdir, filename)) or force:
+            counts = self._get_pixel_heat().counts(kind)
+            if counts.max() == 0:
+                return False
+            heat = np.log1p(counts) / np.log1p(counts.max())
+            # inferno-like color ramp
+            stops = np.array([0, 0.25, 0.5, 0.75, 1])
+            ramp = np.array([ImageColor.getrgb(c) for c in ["#000004", "#57106E", "#BC3754", "#F98E09", "#FCFFA4"]])
+            rgba = np.full(counts.shape + (4,), 255, dtype=np.uint8)
+            for channel in range(3):
+                rgba[:, :, channel] = np.interp(heat, stops, ramp[:, channel]).astype(np.uint8)
+            img = Image.fromarray(rgba, "RGBA").resize((image_size, image_size), resample=Image.Resampling.NEAREST)
+            self._save_png(img, filename, summary)
+        if summary:
+            self.print_img_summary(f"Heatmap of {kind.replace('_', ' ')} edits: {{}}", filename)
+            return True
+        else:
+            if self.imgurl:
+                return f"{self.imgurl}/{filename}"
+            else:
+                return True
+
     def print_img_summary(self, text, filename):
         if self.imgurl:
             print(text.format(f"{self.imgurl}/{filename}"))
         else:
             print(text.format(f"{self.imgdir}/{filename}"))
 
+    @instrumented("image_rendering")
     def generate_image(self, sample_img, edit_img, pixels, highlight_color, highlight_radius, highlight_border,
                        filepath, summary=False):
         # common image generator
@@ -981,8 +4546,20 @@ class PlaceData():
             edit_img = self.draw_highlight(sample_img, edit_img, x, y, color, highlight_color, highlight_radius,
                                            highlight_border)
             edit_img.putpixel((x, y), color + (255,))
-        edit_img = edit_img.resize((16000, 16000), resample=Image.Resampling.NEAREST)
-        edit_img.save(os.path.join(self.imgdir, filepath), 'PNG')
+        edit_img = edit_img.resize((image_size, image_size), resample=Image.Resampling.NEAREST)
+        self._save_png(edit_img, filepath, summary)
+
+    @instrumented("png_encoding")
+    def _save_png(self, img, filepath, summary=False):
+        # save a generated image to the image dir
+        # write to a temporary file and rename it, so concurrent renders never leave a half written image
+        tmp = os.path.join(self.imgdir, f".{filepath}.{os.getpid()}-{threading.get_ident()}.tmp")
+        try:
+            img.save(tmp, 'PNG')
+            os.replace(tmp, os.path.join(self.imgdir, filepath))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
         if not summary:
             logger.info(f"Saved image to {filepath}!")
 
@@ -1016,6 +4593,274 @@ class PlaceData():
                         pass
         return edit_img
 
+    def start_live(self, source):
+        # live mode: read new official rows in the format of the compressed csv (timestamp,user_id,pixel_color,
+        # pixel_x,pixel_y - a header line may give another order) from source, a file path (followed at its end like
+        # tail -f, or a named pipe) or a readable text file object like sys.stdin or socket.makefile(), into a delta
+        # segment in memory (see LiveSegment)
+        # query(), the coordinate, rectangle, timestamp and user lookups, query_batches() and get_colors_at() see the
+        # new rows right away, merged with the base data; a background thread compacts the segment into the base data
+        # (see compact_live())
+        if self._partitioned() or self._encoded():
+            raise ValueError("Live mode needs the official data in memory as DataFrame (encoding = pandas, "
+                             "outofcore = false)")
+        if any(thread.is_alive() for thread in self.live_threads):
+            raise ValueError("Live mode is already running, stop it with stop_live() first")
+        self._live_segment()
+        self.live_stop.clear()
+        self.live_queue = queue.Queue()
+        self.live_threads = [threading.Thread(target=self._live_reader, args=(source,), name="live-reader",
+                                              daemon=True),
+                             threading.Thread(target=self._live_ingest, name="live-ingest", daemon=True),
+                             threading.Thread(target=self._live_compactor, name="live-compactor", daemon=True)]
+        for thread in self.live_threads:
+            thread.start()
+        logger.info(f"Live mode started, reading {source}")
+        return True
+
+    def stop_live(self, compact=True, timeout=10):
+        # stop reading the live source (the lines read so far are still ingested) and optionally compact the delta
+        # segment into the base data, returns live_status()
+        # a source without end (stdin, socket) only stops at its next line
+        self.live_stop.set()
+        for thread in self.live_threads:
+            thread.join(timeout)
+        if compact:
+            self.compact_live()
+        return self.live_status()
+
+    def _live_segment(self):
+        # return the delta segment, created on first use after loading the base data
+        if self.live is None:
+            self.official
+            with self.index_lock:
+                if self.live is None:
+                    self.live = LiveSegment()
+        return self.live
+
+    def append_live(self, rows):
+        # append official rows (DataFrame or dict of arrays with the official columns) to the delta segment, e.g. from
+        # a source start_live() can't read, returns the number of rows in the segment
+        if self._partitioned() or self._encoded():
+            raise ValueError("Live mode needs the official data in memory as DataFrame (encoding = pandas, "
+                             "outofcore = false)")
+        return self._live_segment().append({col: np.asarray(rows[col], dtype=np.int64).ravel()
+                                            for col in LiveSegment.columns})
+
+    def _live_reader(self, source):
+        # put the lines of the live source into self.live_queue, in chunks with the time they were read, and None at
+        # the end: a regular file is followed at its end until stop_live(), other sources end when they are closed
+        regular = isinstance(source, str) and os.path.isfile(source)
+        f = open(source) if isinstance(source, str) else source
+        partial = ""
+        try:
+            while not self.live_stop.is_set():
+                if not regular:
+                    line = f.readline()
+                    if not line:
+                        break
+                    self.live_queue.put((time.monotonic(), [line]))
+                    continue
+                lines = f.readlines(1 << 20)
+                if not lines:
+                    self.live_stop.wait(self.live_poll)
+                    continue
+                lines[0] = partial + lines[0]
+                # the last line may still be written
+                partial = "" if lines[-1].endswith("\n") else lines.pop()
+                if lines:
+                    self.live_queue.put((time.monotonic(), lines))
+        except Exception as e:
+            logger.warning(f"Live mode stopped reading {source}: {e}")
+        finally:
+            if isinstance(source, str):
+                f.close()
+            self.live_queue.put(None)
+
+    def _live_ingest(self):
+        # append the lines of self.live_queue to the delta segment, in batches of up to livebatch lines
+        fields = list(LiveSegment.columns)
+        done = False
+        while not done:
+            try:
+                item = self.live_queue.get(timeout=self.live_poll)
+            except queue.Empty:
+                if self.live_stop.is_set() and not self.live_threads[0].is_alive():
+                    break
+                continue
+            if item is None:
+                break
+            received, lines = item[0], list(item[1])
+            while len(lines) < self.live_batch:
+                try:
+                    item = self.live_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    done = True
+                    break
+                lines.extend(item[1])
+            try:
+                fields = self._live_append_lines(lines, fields, received)
+            except Exception as e:
+                logger.warning(f"Live mode skipped {len(lines)} lines: {e}")
+
+    @staticmethod
+    def _parse_live_lines(lines, fields):
+        # parse csv lines of integers into int64 arrays per official column, a header line sets the order of the fields
+        # returns the rows, the order of the fields and the number of malformed lines
+        values = []
+        malformed = 0
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            parts = line.split(",")
+            try:
+                values.append([int(part) for part in parts] if len(parts) == len(fields) else None)
+            except ValueError:
+                if sorted(part.strip() for part in parts) == sorted(LiveSegment.columns):
+                    fields = [part.strip() for part in parts]
+                    continue
+                values.append(None)
+            if values[-1] is None:
+                values.pop()
+                malformed += 1
+        table = np.array(values, dtype=np.int64).reshape(-1, len(fields))
+        return {col: table[:, fields.index(col)] for col in LiveSegment.columns}, fields, malformed
+
+    def _live_append_lines(self, lines, fields, received):
+        # parse and append a batch of lines read at time.monotonic() = received and update the lag statistics,
+        # returns the order of the fields for the next batch
+        rows, fields, malformed = self._parse_live_lines(lines, fields)
+        delta_rows = self.live.append(rows)
+        lag = time.monotonic() - received
+        stats = self.live_stats
+        stats["rows_ingested"] += len(rows["timestamp"])
+        stats["malformed_lines"] += malformed
+        stats["ingest_lag_seconds"] = lag
+        stats["max_ingest_lag_seconds"] = max(stats["max_ingest_lag_seconds"], lag)
+        if self.live.ts_max is not None:
+            # time since the newest placement, only meaningful while the event runs
+            stats["event_lag_seconds"] = (time.time() * 1000 - start - self.live.ts_max) / 1000
+        if malformed:
+            logger.warning(f"Live mode skipped {malformed} malformed lines")
+        if self.metrics.enabled:
+            self.metrics.observe("live_ingest", lag)
+            self.metrics.add_rows("live_ingest", len(lines), len(rows["timestamp"]))
+            self.metrics.set_gauge("live_ingest_lag_seconds", lag)
+            self.metrics.set_gauge("live_delta_rows", delta_rows)
+            if stats["event_lag_seconds"] is not None:
+                self.metrics.set_gauge("live_event_lag_seconds", stats["event_lag_seconds"])
+        return fields
+
+    def _live_compactor(self):
+        # compact the delta segment into the base data when it has livecompactrows rows or its first rows arrived
+        # livecompactseconds ago
+        since = time.monotonic()
+        while not self.live_stop.wait(self.live_poll):
+            rows = self.live.rows
+            if not rows:
+                since = time.monotonic()
+            elif rows >= self.live_compact_rows or time.monotonic() - since >= self.live_compact_seconds:
+                try:
+                    self.compact_live()
+                except Exception as e:
+                    logger.warning(f"Unable to compact the live delta segment ({e})")
+                since = time.monotonic()
+
+    @instrumented("live_compaction")
+    def compact_live(self):
+        # merge the rows of the delta segment into the base data: the official DataFrame is extended, the new rows are
+        # inserted into the tile index, the pixel histories and the user index in one pass each, all other derived
+        # structures are dropped and rebuilt on their next use (without dumping them, the pickle files stay those of
+        # the data loaded at startup)
+        # queries keep running meanwhile and see the swap atomically, see LiveSegment.consistent()
+        # returns the number of compacted rows
+        live = self.live
+        if live is None:
+            return 0
+        with self.live_compact_lock:
+            view = live.snapshot()
+            rows = view["rows"]
+            if not rows:
+                return 0
+            delta = view["columns"]
+            base = self.official
+            base_rows = len(base.index)
+            # the new rows keep the index they have in query results
+            official = pd.concat([base, LiveSegment.frame(view, np.arange(rows), base.dtypes, base_rows)])
+            fingerprint = self._official_fingerprint()
+            fingerprint = (fingerprint[0] + rows,) + tuple(
+                total + int(delta[col].sum()) for total, col in zip(fingerprint[1:], ["timestamp", "user_id",
+                                                                                     "pixel_x", "pixel_y"]))
+
+            tile_index = self._get_tile_index()
+            history = None
+            if tile_index is not None:
+                history = self._get_pixel_history()
+                slots = tile_index.slot(delta["pixel_x"], delta["pixel_y"])
+                by_key = np.argsort(slots << 32 | delta["timestamp"], kind="stable")
+                at = history.search(tile_index, slots[by_key], delta["timestamp"][by_key])
+                tile_index = tile_index.inserted(at, slots[by_key], base_rows + by_key)
+                history = history.inserted(at, delta["timestamp"][by_key])
+                tile_index.fingerprint = history.fingerprint = fingerprint
+            user_index = self._get_user_index()
+            if user_index is not None:
+                user_index = user_index.appended(delta["user_id"], base_rows)
+                user_index.fingerprint = fingerprint
+            ts = delta["timestamp"]
+            timestamps_sorted = (self.timestamps_sorted and view["ts_sorted"] and
+                                 (not base_rows or int(ts[0]) >= int(base.timestamp.values[-1]))) or None
+
+            with live.lock:
+                live.generation += 1
+                try:
+                    self._official = official
+                    self.tile_index = tile_index
+                    self.pixel_history = history
+                    self.user_index = user_index
+                    self.timestamps_sorted = timestamps_sorted
+                    for name in ["pixel_heat", "activity_cube", "space_time_grid", "user_sketches", "user_aggregates",
+                                 "user_regularity", "edit_links", "edit_survival"]:
+                        setattr(self, name, None)
+                    live.trim(rows)
+                finally:
+                    live.generation += 1
+            self.live_stats["rows_compacted"] += rows
+            self.live_stats["compactions"] += 1
+            self.metrics.set_gauge("live_delta_rows", live.rows)
+            if self.render_queue is not None:
+                # the render workers were forked with the data before the compaction
+                self.render_queue.refresh()
+        logger.info(f"Compacted {rows} live rows into the official data ({len(official.index)} rows)")
+        return rows
+
+    def live_status(self):
+        # state of live mode: whether the source is still read, the rows in the delta segment, the ingested and
+        # compacted rows, skipped malformed lines, the time between reading rows and them being queryable (last and max
+        # batch, in seconds) and the time since the newest placement
+        return {"running": bool(self.live_threads) and self.live_threads[0].is_alive(),
+                "delta_rows": 0 if self.live is None else self.live.rows,
+                **self.live_stats}
+
+    def stats(self):
+        # return the metrics recorded so far as dict (requires metrics = true in the config or enable_metrics())
+        # and the counters of the memory scheduler
+        stats = self.metrics.stats()
+        stats["scheduler"] = self.scheduler.stats()
+        return stats
+
+    def metrics_text(self):
+        # return the metrics recorded so far in the Prometheus text format
+        return self.metrics.prometheus()
+
+    def enable_metrics(self, enabled=True, reset=False):
+        # switch metrics recording on or off at runtime
+        if reset:
+            self.metrics.reset()
+        self.metrics.enabled = enabled
+
     def mix_rgba(self, col_a, col_b):
         # mix two RGBA colors into one
         # col_a, col_b: tuples of (R, G, B, A)
@@ -1027,7 +4872,46 @@ class PlaceData():
         return (r, g, b, a)
 
 
+def main(argv):
+    # command line interface for single lookups, e.g. python place-dataframes.py hash Username
+    parser = argparse.ArgumentParser(description="Look up r/place 2022 data of a username (without arguments: "
+                                     "initialize a PlaceData object for interactive use with python -i)")
+    parser.add_argument("--config", default="config.ini", help="config file (default: %(default)s)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show log messages")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for command, help in [("hash", "reddit username hash"),
+                          ("ouid", "user id in the compressed official dataset"),
+                          ("summary", "JSON summary (served from the result store if precomputed)"),
+                          ("complete", "usernames starting with the given prefix"),
+                          ("suggest", "usernames within two typos of the given one")]:
+        commands.add_parser(command, help=help).add_argument("username")
+    args = parser.parse_args(argv)
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    data = PlaceData(args.config)
+    data.progress = False
+    username = data.strip_username(args.username)
+    if args.command == "hash":
+        result = data.get_hash_by_username(username)
+    elif args.command == "ouid":
+        result = data.get_official_uid_by_username(username)
+    elif args.command == "complete":
+        result = [name for name, uid in data.complete_username(username)]
+    elif args.command == "suggest":
+        result = [name for name, uid, distance in data.suggest_usernames(username)]
+    else:
+        result = data.get_json_summary(username)
+    if not result:
+        print(f"Unable to find {username}", file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=2) if isinstance(result, (dict, list)) else result)
+    return 0
+
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(main(sys.argv[1:]))
     logger.info("initializing ...")
     data = PlaceData()
     logger.info("PlaceData object available as variable 'data'")